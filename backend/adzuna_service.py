@@ -1,10 +1,56 @@
 import os
 import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
 import requests
-from typing import List
+from datetime import datetime, timezone
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+import http_pool
 from models import CleanedJob
+from cache import make_cache
+from metrics import ADZUNA_REQUEST_SECONDS, ADZUNA_ERRORS, register_cache
+from semantic_search import ingest_soon
+from token_bucket import KeyedRateLimiter
+from tracing import span, trace_headers
 
-ADZUNA_BASE_URL = "https://api.adzuna.com/v1/api/jobs/in/search/1"
+logger = logging.getLogger(__name__)
+
+# The country segment (/jobs/in/) is swapped for each country searched
+ADZUNA_BASE_URL = os.getenv("ADZUNA_BASE_URL", "https://api.adzuna.com/v1/api/jobs/in/search/1")
+
+# Countries searched when a request names none, e.g. "in" or "in,gb,us"
+ADZUNA_COUNTRIES = os.getenv("ADZUNA_COUNTRIES", "in")
+
+# Country codes the Adzuna search API serves
+SUPPORTED_COUNTRIES = frozenset("at au be br ca ch de es fr gb in it mx nl nz pl sg us za".split())
+MAX_COUNTRIES = 8
+
+# Outbound budget per country; a search waits up to ADZUNA_RATE_WAIT seconds
+# for a token, then that country is left out of the results
+ADZUNA_RATE_PER_MINUTE = float(os.getenv("ADZUNA_RATE_PER_MINUTE", "25"))
+ADZUNA_BURST = float(os.getenv("ADZUNA_BURST", "5"))
+ADZUNA_RATE_WAIT = float(os.getenv("ADZUNA_RATE_WAIT", "2"))
+
+_country_limiter = KeyedRateLimiter(ADZUNA_RATE_PER_MINUTE, ADZUNA_BURST, max_keys=len(SUPPORTED_COUNTRIES))
+_COUNTRY_SEGMENT_RE = re.compile(r"/jobs/[a-z]{2}/")
+_PAGE_SEGMENT_RE = re.compile(r"/search/\d+")
+
+# fetch_jobs_since() reads up to this many date-sorted pages per country
+SINCE_MAX_PAGES = 5
+SINCE_PAGE_SIZE = 50  # Adzuna's maximum results_per_page
+
+# Identical searches within this window are served from the cache (shared by workers, see cache.py)
+JOBS_CACHE_TTL = int(os.getenv("JOBS_CACHE_TTL", "300"))
+
+class CachedJobs(NamedTuple):
+    jobs: List[CleanedJob]
+    digest: str  # content hash, used for ETags
+
+_jobs_cache = make_cache("jobs", JOBS_CACHE_TTL)
+register_cache("jobs", _jobs_cache)
 
 def _truncate_text(text: str, max_length: int = 300) -> str:
     if not text:
@@ -20,20 +66,48 @@ EXPERIENCE_MAP = {
     "senior": "senior",
 }
 
+def parse_countries(countries: Union[str, Sequence[str], None] = None) -> List[str]:
+    """Normalize "in, GB" or ["in", "gb"] to ["in", "gb"]. Empty means ADZUNA_COUNTRIES.
+
+    Raises ValueError for codes Adzuna does not serve.
+    """
+    if not countries:
+        countries = ADZUNA_COUNTRIES
+    if isinstance(countries, str):
+        countries = countries.split(",")
+    codes = list(dict.fromkeys(code.strip().lower() for code in countries if code.strip()))
+    unknown = [code for code in codes if code not in SUPPORTED_COUNTRIES]
+    if unknown:
+        raise ValueError(f"Unsupported country code(s): {', '.join(unknown)}. Supported: {', '.join(sorted(SUPPORTED_COUNTRIES))}")
+    if not codes:
+        raise ValueError("At least one country code is required")
+    if len(codes) > MAX_COUNTRIES:
+        raise ValueError(f"At most {MAX_COUNTRIES} countries can be searched at once")
+    return codes
+
+def _search_url(country: str, page: int = 1) -> str:
+    url = _COUNTRY_SEGMENT_RE.sub(f"/jobs/{country}/", ADZUNA_BASE_URL, count=1)
+    return _PAGE_SEGMENT_RE.sub(f"/search/{page}", url, count=1)
+
 def _fetch_jobs_sync(
     role: str,
     location: str = "",
     last_24: bool = False,
     experience_level: str = "",
+    country: str = "in",
+    max_days_old: Optional[int] = None,
+    sort_by: Optional[str] = None,
+    page: int = 1,
+    results_per_page: int = 10,
 ) -> List[CleanedJob]:
-    print(f"[Adzuna] Fetching jobs: role='{role}', location='{location}', last_24={last_24}, exp='{experience_level}'")
+    logger.info("[Adzuna] Fetching jobs: role='%s', location='%s', last_24=%s, exp='%s', country=%s", role, location, last_24, experience_level, country)
     
     app_id = os.getenv("ADZUNA_APP_ID")
     app_key = os.getenv("ADZUNA_APP_KEY")
     
     if not app_id or not app_key:
         error_msg = "ADZUNA_APP_ID and ADZUNA_APP_KEY must be set in .env"
-        print(f"[Adzuna] ERROR: {error_msg}")
+        logger.error("[Adzuna] ERROR: %s", error_msg)
         raise Exception(error_msg)
     
     # Build search query — optionally append experience keyword
@@ -46,24 +120,31 @@ def _fetch_jobs_sync(
         "app_id": app_id,
         "app_key": app_key,
         "what": search_query,
-        "results_per_page": 10,
+        "results_per_page": results_per_page,
     }
+    if sort_by:
+        params["sort_by"] = sort_by  # default: relevance
     
     if location:
         params["where"] = location
     
     if last_24:
         params["max_days_old"] = 1
+    elif max_days_old:
+        params["max_days_old"] = max_days_old
     
-    print(f"[Adzuna] Calling API: {ADZUNA_BASE_URL}")
+    url = _search_url(country, page)
+    logger.debug("[Adzuna] Calling API: %s", url)
     
+    start = time.perf_counter()
     try:
-        response = requests.get(ADZUNA_BASE_URL, params=params, timeout=15)
+        response = http_pool.session("adzuna").get(url, params=params, headers=trace_headers(), timeout=15)
         response.raise_for_status()
         data = response.json()
+        ADZUNA_REQUEST_SECONDS.observe(time.perf_counter() - start, country=country, outcome="ok")
         
         results = data.get("results", [])
-        print(f"[Adzuna] Received {len(results)} results from API")
+        logger.info("[Adzuna] Received %s results from API", len(results))
         
         jobs = []
         
@@ -97,34 +178,220 @@ def _fetch_jobs_sync(
                     description=_truncate_text(description, 300),
                     apply_link=str(apply_link),
                     created=created,
-                    id=str(job_id) if job_id else None
+                    id=str(job_id) if job_id else None,
+                    country=country,
                 )
                 jobs.append(job)
                 
             except Exception as e:
-                print(f"[Adzuna] Error parsing job {idx}: {str(e)}")
+                logger.error("[Adzuna] Error parsing job %s: %s", idx, e)
                 continue
         
-        print(f"[Adzuna] Successfully parsed {len(jobs)} jobs")
+        logger.info("[Adzuna] Successfully parsed %s jobs", len(jobs))
         return jobs
         
     except requests.RequestException as e:
+        ADZUNA_REQUEST_SECONDS.observe(time.perf_counter() - start, country=country, outcome="error")
+        ADZUNA_ERRORS.inc(kind="http")
         error_msg = f"Adzuna API request failed: {str(e)}"
-        print(f"[Adzuna] ERROR: {error_msg}")
+        logger.error("[Adzuna] ERROR: %s", error_msg)
         raise Exception(error_msg)
     except ValueError as e:
+        ADZUNA_REQUEST_SECONDS.observe(time.perf_counter() - start, country=country, outcome="error")
+        ADZUNA_ERRORS.inc(kind="invalid_json")
         error_msg = f"Adzuna API returned invalid JSON: {str(e)}"
-        print(f"[Adzuna] ERROR: {error_msg}")
+        logger.error("[Adzuna] ERROR: %s", error_msg)
         raise Exception(error_msg)
     except Exception as e:
+        ADZUNA_ERRORS.inc(kind="unexpected")
         error_msg = f"Unexpected Adzuna error: {str(e)}"
-        print(f"[Adzuna] ERROR: {error_msg}")
+        logger.error("[Adzuna] ERROR: %s", error_msg)
         raise Exception(error_msg)
 
+def _jobs_cache_key(role: str, location: str, last_24: bool, experience_level: str, country: str,
+                    max_days_old: Optional[int] = None) -> tuple:
+    return (role.strip().lower(), location.strip().lower(), bool(last_24), experience_level.strip().lower(), country,
+            max_days_old)
+
+def _jobs_digest(jobs: List[CleanedJob]) -> str:
+    payload = json.dumps([job.model_dump() for job in jobs], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def _combined_digest(digests: List[str]) -> str:
+    if len(digests) == 1:
+        return digests[0]
+    return hashlib.sha1("|".join(digests).encode()).hexdigest()
+
+def cached_jobs_digest(
+    role: str,
+    location: str = "",
+    last_24: bool = False,
+    experience_level: str = "",
+    countries: Union[str, Sequence[str], None] = None,
+) -> Optional[str]:
+    """Content hash of a cached search, or None. Never calls Adzuna."""
+    digests = []
+    for country in parse_countries(countries):
+        entry = _jobs_cache.peek(_jobs_cache_key(role, location, last_24, experience_level, country))
+        if entry is None:
+            return None
+        digests.append(entry.digest)
+    return _combined_digest(digests)
+
+# ── Multi-country search ────────────────────────────────
+
+def posted_at(job: CleanedJob) -> Optional[datetime]:
+    if not job.created:
+        return None
+    try:
+        created = datetime.fromisoformat(str(job.created).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return created if created.tzinfo else created.replace(tzinfo=timezone.utc)
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def _dedup_key(job: CleanedJob) -> tuple:
+    # The same posting listed in several countries gets a different id in each
+    return (_normalize(job.title), _normalize(job.company), _normalize(job.description))
+
+def merge_jobs(results: Iterable[List[CleanedJob]]) -> List[CleanedJob]:
+    """One list, newest first (undated jobs last), each posting once."""
+    jobs = [job for country_jobs in results for job in country_jobs]
+    oldest = datetime.min.replace(tzinfo=timezone.utc)
+    # Stable sort: jobs posted at the same time keep each country's relevance order
+    jobs.sort(key=lambda job: posted_at(job) or oldest, reverse=True)
+    merged, seen_ids, seen_keys = [], set(), set()
+    for job in jobs:
+        key = _dedup_key(job)
+        if (job.id and (job.country, job.id) in seen_ids) or key in seen_keys:
+            continue
+        seen_ids.add((job.country, job.id))
+        seen_keys.add(key)
+        merged.append(job)
+    return merged
+
+async def _country_token(country: str) -> None:
+    """Wait for the country's rate limiter, at most ADZUNA_RATE_WAIT seconds."""
+    waited = 0.0
+    while True:
+        allowed, wait = _country_limiter.take(country)
+        if allowed:
+            return
+        if waited + wait > ADZUNA_RATE_WAIT:
+            ADZUNA_ERRORS.inc(kind="rate_limited")
+            raise Exception(f"Adzuna rate limit reached for country '{country}'")
+        with span("adzuna-wait"):
+            await asyncio.sleep(wait)
+        waited += wait
+
+async def _fetch_country(country: str, role: str, location: str, last_24: bool, experience_level: str,
+                         max_days_old: Optional[int]) -> CachedJobs:
+    key = _jobs_cache_key(role, location, last_24, experience_level, country, max_days_old)
+    entry = _jobs_cache.get(key)
+    if entry is not None:
+        logger.debug("[Adzuna] Cache hit for %s", key)
+        return entry
+
+    await _country_token(country)
+    with span(f"adzuna-{country}"):
+        jobs = await asyncio.to_thread(_fetch_jobs_sync, role, location, last_24, experience_level, country, max_days_old)
+    entry = CachedJobs(jobs=jobs, digest=_jobs_digest(jobs))
+    _jobs_cache.set(key, entry)
+    # Fresh results only: cached ones were offered when they were fetched
+    ingest_soon(jobs)
+    return entry
+
 async def fetch_jobs(
     role: str,
     location: str = "",
     last_24: bool = False,
     experience_level: str = "",
+    countries: Union[str, Sequence[str], None] = None,
+    max_days_old: Optional[int] = None,
 ) -> List[CleanedJob]:
-    return await asyncio.to_thread(_fetch_jobs_sync, role, location, last_24, experience_level)
+    """Search every country concurrently; latency is that of the slowest one.
+
+    max_days_old limits the search to postings from the last N days.
+
+    With several countries the results are merged newest first and deduplicated.
+    A country that fails or is rate limited is left out; if all fail, the
+    first error is raised.
+    """
+    countries = parse_countries(countries)
+    results = await asyncio.gather(
+        *(_fetch_country(country, role, location, last_24, experience_level, max_days_old) for country in countries),
+        return_exceptions=True,
+    )
+    entries, errors = [], []
+    for country, result in zip(countries, results):
+        if isinstance(result, Exception):
+            logger.warning("[Adzuna] Search in '%s' failed: %s", country, result)
+            errors.append(result)
+        else:
+            entries.append(result)
+    if not entries:
+        raise errors[0]
+    if len(countries) == 1:
+        return list(entries[0].jobs)
+    jobs = merge_jobs(entry.jobs for entry in entries)
+    logger.info("[Adzuna] Merged %s jobs from %s countries", len(jobs), len(entries))
+    return jobs
+
+async def _fetch_country_since(country: str, role: str, location: str, experience_level: str,
+                               since: Optional[datetime], max_days_old: Optional[int]) -> Tuple[List[CleanedJob], bool]:
+    """Newest-first pages until one reaches `since`; complete is False if the pages ran out first."""
+    jobs = []
+    for page in range(1, SINCE_MAX_PAGES + 1):
+        await _country_token(country)
+        with span(f"adzuna-{country}"):
+            batch = await asyncio.to_thread(
+                _fetch_jobs_sync, role, location, False, experience_level, country, max_days_old,
+                "date", page, SINCE_PAGE_SIZE,
+            )
+        jobs.extend(batch)
+        if since is None or len(batch) < SINCE_PAGE_SIZE:
+            # First sync: the newest page is the starting point, nothing is missed
+            return jobs, True
+        if any(stamp is not None and stamp <= since for stamp in map(posted_at, batch)):
+            return jobs, True
+    logger.warning("[Adzuna] '%s' in '%s': more than %s pages since %s", role, country, SINCE_MAX_PAGES, since)
+    return jobs, False
+
+async def fetch_jobs_since(
+    role: str,
+    location: str,
+    experience_level: str,
+    countries: Union[str, Sequence[str], None],
+    since: Optional[datetime],
+    max_days_old: Optional[int] = None,
+) -> Tuple[List[CleanedJob], bool]:
+    """Every posting newer than `since`, for delta syncs (saved_searches.py).
+
+    Unlike fetch_jobs(), which returns one relevance-sorted page, each country
+    is read in date order, page by page, until a page reaches `since`. Not
+    cached. Returns (jobs, complete): complete is False when a country failed
+    or had more than SINCE_MAX_PAGES pages of newer postings, so postings
+    between `since` and the oldest one returned may be missing. With `since`
+    None (a first sync) only the newest page of each country is read.
+    """
+    countries = parse_countries(countries)
+    results = await asyncio.gather(
+        *(_fetch_country_since(country, role, location, experience_level, since, max_days_old) for country in countries),
+        return_exceptions=True,
+    )
+    fetched, complete, errors = [], True, []
+    for country, result in zip(countries, results):
+        if isinstance(result, Exception):
+            logger.warning("[Adzuna] Search in '%s' failed: %s", country, result)
+            errors.append(result)
+            complete = False
+        else:
+            fetched.append(result[0])
+            complete = complete and result[1]
+    if not fetched:
+        raise errors[0]
+    for jobs in fetched:
+        ingest_soon(jobs)
+    return merge_jobs(fetched), complete
@@ -4,20 +4,23 @@ Uses passlib for hashing, python-jose for JWT (JWS Compact Serialization).
 """
 
 import os
+import asyncio
+import logging
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from starlette.datastructures import Headers
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 
-from database import get_db, User
+from database import get_db, SessionLocal, User
+from tracing import span
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Auth"])
 
@@ -32,6 +35,7 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 10000  # Extended for debugging
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # ── Request / Response schemas ──────────────────────────
 
@@ -50,10 +54,12 @@ class TokenResponse(BaseModel):
 # ── Helpers ─────────────────────────────────────────────
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    with span("bcrypt"):
+        return pwd_context.hash(password)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    with span("bcrypt"):
+        return pwd_context.verify(plain, hashed)
 
 def create_access_token(email: str) -> str:
     """
@@ -69,39 +75,29 @@ def create_access_token(email: str) -> str:
     # jwt.encode from python-jose produces JWS Compact Serialization
     token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
     
-    print(f"[Auth] ✅ Created JWT token for: {email}")
-    print(f"[Auth] Using SECRET_KEY: {SECRET_KEY[:20]}...")
-    print(f"[Auth] Token preview: {token[:50]}...")
+    logger.info("[Auth] ✅ Created JWT token for: %s", email)
     
     return token
 
 # ── Dependency: get current user ────────────────────────
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-) -> User:
+def decode_token(token: str) -> str:
     """
-    Decode JWT token and return authenticated user.
+    Decode a JWT and return its subject (email) without touching the database.
     Raises 401 if token is invalid or expired.
     """
-    token = credentials.credentials
-    
-    print(f"\n[Auth] 🔍 Validating token...")
-    print(f"[Auth] Token received: {token[:50]}...")
-    print(f"[Auth] Using SECRET_KEY: {SECRET_KEY[:20]}...")
-    print(f"[Auth] Using ALGORITHM: {ALGORITHM}")
+    logger.debug("[Auth] 🔍 Validating token (%s)", ALGORITHM)
     
     try:
         # Decode JWT (JWS Compact Serialization)
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         
-        print(f"[Auth] ✅ Token decoded successfully")
-        print(f"[Auth] Email from token: {email}")
+        logger.debug("[Auth] ✅ Token decoded successfully")
+        logger.debug("[Auth] Email from token: %s", email)
         
         if email is None:
-            print(f"[Auth] ❌ FAIL: 'sub' claim is missing from token")
+            logger.warning("[Auth] ❌ FAIL: 'sub' claim is missing from token")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token - missing subject",
@@ -109,26 +105,86 @@ def get_current_user(
             )
             
     except JWTError as e:
-        print(f"[Auth] ❌ JWT decode error: {type(e).__name__}: {str(e)}")
+        logger.warning("[Auth] ❌ JWT decode error: %s: %s", type(e).__name__, e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Invalid or expired token: {str(e)}",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    return email
+
+def get_token_subject(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> str:
+    """Route dependency: subject of the bearer token (see decode_token)."""
+    return decode_token(credentials.credentials)
+
+def get_optional_subject(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> Optional[str]:
+    """
+    Subject of the bearer token if one was sent, else None (anonymous caller).
+    An invalid token is still a 401.
+    """
+    if credentials is None:
+        return None
+    return get_token_subject(credentials)
+
+def get_current_user(
+    email: str = Depends(get_token_subject),
+    db: Session = Depends(get_db),
+) -> User:
+    """
+    Return the authenticated user for a valid JWT.
+    Raises 401 if token is invalid or expired, or the user no longer exists.
+    """
     # Look up user by email
     user = db.query(User).filter(User.email == email).first()
     if user is None:
-        print(f"[Auth] ❌ FAIL: User '{email}' not found in database")
+        logger.warning("[Auth] ❌ FAIL: User '%s' not found in database", email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    print(f"[Auth] ✅ User authenticated: {user.email} (id={user.id})")
+    logger.debug("[Auth] ✅ User authenticated: %s (id=%s)", user.email, user.id)
     return user
 
+def require_admin(user: User = Depends(get_current_user)) -> str:
+    """
+    Route dependency: the caller must be an admin account (403 otherwise).
+    Admin is a flag on the user row, set with grant_admin.py: registering an
+    address never makes it an admin.
+    """
+    if not user.is_admin:
+        logger.warning("[Auth] ❌ Admin access denied for: %s", user.email)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user.email
+
+def _is_admin(email: str) -> bool:
+    db = SessionLocal()
+    try:
+        return bool(db.query(User.is_admin).filter(User.email == email).scalar())
+    finally:
+        db.close()
+
+async def is_admin_request(headers: Headers) -> bool:
+    """Whether the request carries a valid bearer token of an admin account. For middleware; never raises."""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        email = jwt.decode(token.strip(), SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return False
+    if not email:
+        return False
+    # Looked up on every call, not kept in the token, so revoking takes effect at once;
+    # in a worker thread, so the query does not block the event loop
+    return await asyncio.to_thread(_is_admin, email)
+
 # ── Routes ──────────────────────────────────────────────
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
@@ -144,7 +200,7 @@ async def register(req: RegisterRequest, db: Session = Depends(get_db)):
     db.add(user)
     db.commit()
     db.refresh(user)
-    print(f"[Auth] 📝 User registered: {user.email} (id={user.id})")
+    logger.info("[Auth] 📝 User registered: %s (id=%s)", user.email, user.id)
     return {"message": "User registered successfully"}
 
 
@@ -156,7 +212,7 @@ async def login(req: LoginRequest, db: Session = Depends(get_db)):
     """
     user = db.query(User).filter(User.email == req.email).first()
     if not user or not verify_password(req.password, user.hashed_password):
-        print(f"[Auth] ❌ Login failed for: {req.email}")
+        logger.warning("[Auth] ❌ Login failed for: %s", req.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
@@ -165,7 +221,7 @@ async def login(req: LoginRequest, db: Session = Depends(get_db)):
     # Create JWT token with email in "sub" claim
     access_token = create_access_token(user.email)
     
-    print(f"[Auth] ✅ Login successful: {user.email}")
+    logger.info("[Auth] ✅ Login successful: %s", user.email)
     
     # Return exact format required by frontend
     return TokenResponse(access_token=access_token, token_type="bearer")
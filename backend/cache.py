@@ -0,0 +1,284 @@
+"""
+TTL caches and small counters, in-process or shared between workers.
+
+With one worker everything lives in memory. When several uvicorn/gunicorn
+workers serve the app (see serve.py), each process would otherwise keep its
+own copy, so select a shared store. serve.py switches a multi-worker run to
+"sqlite" by itself; other multi-process launchers must set it:
+
+Environment:
+  CACHE_BACKEND  "memory" (default), "sqlite" or "redis"
+  CACHE_URL      sqlite: database file (default <tmp>/jobsearch-cache.db; a
+                 path on /dev/shm keeps it in shared memory);
+                 redis: redis://host:6379/0 (needs the `redis` package)
+
+Thread-safe: fetches run in worker threads via asyncio.to_thread.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").strip().lower()
+CACHE_URL = os.getenv("CACHE_URL", "")
+
+
+class TTLCache:
+    """Small LRU cache whose entries expire after ttl_seconds."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Like get(), but does not count towards hit/miss stats or LRU order."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# ── Stores ──────────────────────────────────────────────
+
+class MemoryStore:
+    """Per-process store for counters and flags; caches stay plain TTLCaches."""
+
+    shared = False
+
+    def __init__(self):
+        self._counters = {}
+        self._values = {}  # key -> (expires or None, value)
+        self._lock = threading.Lock()
+        self._instance_id = uuid.uuid4().hex[:8]
+
+    def instance_id(self) -> str:
+        """Changes whenever the store's contents start over (here: every process)."""
+        return self._instance_id
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self._counters[key] = self._counters.get(key, 0) + 1
+            return value
+
+    def get_int(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None or (entry[0] is not None and entry[0] < time.time()):
+            return None
+        return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        with self._lock:
+            self._values[key] = (time.time() + ttl if ttl is not None else None, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+
+class SQLiteStore:
+    """One SQLite file shared by every worker on the host. WAL lets readers run alongside a writer."""
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._sets = 0
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            conn.execute("INSERT OR IGNORE INTO cache (key, value, expires) VALUES ('instance_id', ?, NULL)", (uuid.uuid4().hex[:8],))
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def instance_id(self) -> str:
+        return str(self._conn().execute("SELECT value FROM cache WHERE key = 'instance_id'").fetchone()[0])
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires >= ?)", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        """Store a value; ttl=None keeps it until deleted."""
+        conn = self._conn()
+        expires = time.time() + ttl if ttl is not None else None
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", (key, value, expires))
+        self._sets += 1
+        if self._sets % 100 == 0:
+            conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix: str) -> None:
+        self._conn().execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def incr(self, key: str) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, 0, NULL)", (key,))
+            conn.execute("UPDATE cache SET value = value + 1 WHERE key = ?", (key,))
+            value = conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return int(value)
+
+    def get_int(self, key: str) -> int:
+        row = self._conn().execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else 0
+
+
+class RedisStore:
+    """Any Redis-compatible server (Redis, Valkey, KeyDB); also shares state across hosts."""
+
+    shared = True
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis needs the `redis` package: pip install redis") from e
+        self._redis = redis.Redis.from_url(url)
+        self._redis.set("jobsearch:instance_id", uuid.uuid4().hex[:8], nx=True)
+
+    def instance_id(self) -> str:
+        # Regenerated after a Redis restart, which also resets the counters
+        self._redis.set("jobsearch:instance_id", uuid.uuid4().hex[:8], nx=True)
+        return self._redis.get("jobsearch:instance_id").decode()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        self._redis.set(key, value, px=max(1, int(ttl * 1000)) if ttl is not None else None)
+
+    def delete(self, key: str) -> None:
+        self._redis.delete(key)
+
+    def delete_prefix(self, prefix: str) -> None:
+        for key in self._redis.scan_iter(match=prefix + "*"):
+            self._redis.delete(key)
+
+    def incr(self, key: str) -> int:
+        return int(self._redis.incr(key))
+
+    def get_int(self, key: str) -> int:
+        return int(self._redis.get(key) or 0)
+
+
+def _open_store():
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteStore(CACHE_URL or os.path.join(tempfile.gettempdir(), "jobsearch-cache.db"))
+    if CACHE_BACKEND == "redis":
+        return RedisStore(CACHE_URL or "redis://localhost:6379/0")
+    if CACHE_BACKEND != "memory":
+        logger.warning("[Cache] Unknown CACHE_BACKEND=%r, using memory", CACHE_BACKEND)
+    return MemoryStore()
+
+
+STORE = _open_store()
+
+
+# ── Shared caches ───────────────────────────────────────
+
+class SharedTTLCache:
+    """TTLCache interface on top of a shared store. Values are pickled; size is bounded by the TTL."""
+
+    def __init__(self, store, namespace: str, ttl_seconds: float):
+        self.store = store
+        self.prefix = f"cache:{namespace}:"
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: Hashable) -> str:
+        return self.prefix + repr(key)
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        try:
+            raw = self.store.get(self._key(key))
+            return pickle.loads(raw) if raw is not None else None
+        except Exception as e:
+            # A cache outage must not fail the request
+            logger.warning("[Cache] Read failed for %s: %s", self.prefix, e)
+            return None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self.peek(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        try:
+            self.store.set(self._key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), self.ttl_seconds)
+        except Exception as e:
+            logger.warning("[Cache] Write failed for %s: %s", self.prefix, e)
+
+    def clear(self) -> None:
+        self.store.delete_prefix(self.prefix)
+
+
+def make_cache(name: str, ttl_seconds: float, max_entries: int = 256):
+    """A TTL cache that is shared between workers when CACHE_BACKEND says so."""
+    if STORE.shared:
+        return SharedTTLCache(STORE, name, ttl_seconds)
+    return TTLCache(ttl_seconds, max_entries)
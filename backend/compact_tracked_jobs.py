@@ -0,0 +1,16 @@
+"""
+One-off maintenance: merge duplicate tracked jobs in users.db.
+Usage: python compact_tracked_jobs.py
+"""
+
+from database import SessionLocal, compact_tracked_jobs, init_db
+
+
+if __name__ == "__main__":
+    init_db()
+    db = SessionLocal()
+    try:
+        result = compact_tracked_jobs(db)
+        print(f"[DB] Backfilled {result['backfilled']} source ids, removed {result['deleted']} duplicate rows")
+    finally:
+        db.close()
@@ -0,0 +1,92 @@
+"""
+Response compression middleware: Brotli when the client accepts it and the
+`brotli` package is installed, otherwise GZip. Bodies below minimum_size
+are sent uncompressed. Accept-Encoding q-values are honoured: a coding with
+q=0 is never used, and of the two the higher q wins (Brotli on a tie).
+"""
+
+from typing import Dict
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Streamed formats must not be buffered by a compressor
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "application/x-ndjson", "image/*", "application/gzip")
+
+
+def accepted_codings(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}, e.g. "br;q=0, gzip" -> {"br": 0.0, "gzip": 1.0}."""
+    codings = {}
+    for item in header.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding.lower()] = q
+    return codings
+
+
+def _quality(codings: Dict[str, float], coding: str) -> float:
+    return codings.get(coding, codings.get("*", 0.0))
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4):
+        super().__init__(app, minimum_size, exclude_content_types=EXCLUDED_CONTENT_TYPES)
+        self._compressor = brotli.Compressor(quality=quality)
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self._compressor.process(body)
+        if more_body:
+            return data + self._compressor.flush()
+        return data + self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codings = accepted_codings(Headers(scope=scope).get("Accept-Encoding", ""))
+        br = _quality(codings, "br") if brotli is not None else 0.0
+        gzip = _quality(codings, "gzip")
+        if br > 0 and br >= gzip:
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif gzip > 0:
+            responder = GZipResponder(
+                self.app,
+                self.minimum_size,
+                compresslevel=self.gzip_level,
+                exclude_content_types=EXCLUDED_CONTENT_TYPES,
+            )
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size, exclude_content_types=EXCLUDED_CONTENT_TYPES)
+        await responder(scope, receive, send)
@@ -1,18 +1,63 @@
 """
 SQLAlchemy database setup — SQLite (users.db)
-ORM models: User, TrackedJobDB
+ORM models: User, TrackedJobDB, ResumeDigestDB, SavedSearchDB, SavedSearchJobDB,
+JobEmbeddingDB, ResumeEmbeddingDB
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
+import logging
+import os
+import re
+import time
+
+from sqlalchemy import create_engine, event, Boolean, Column, Float, Integer, LargeBinary, String, Text, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./users.db"
+from tracing import add_span
+
+logger = logging.getLogger(__name__)
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./users.db")
+
+_is_sqlite = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    # timeout is SQLite's busy_timeout: wait up to 15s for another worker's write lock
+    # instead of failing with "database is locked"
+    connect_args={"check_same_thread": False, "timeout": 15} if _is_sqlite else {},
 )
 
+
+if _is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL: readers never block the writer (or each other) across worker processes."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; safe with WAL
+        cursor.close()
+
+@event.listens_for(engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    # On the execution context, which lives for one statement: nothing is left
+    # behind on the pooled connection when the statement fails
+    context._query_start = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    """Time spent in queries shows up as the request's "db" span (see tracing.py)."""
+    add_span("db", time.perf_counter() - context._query_start)
+
+
+@event.listens_for(engine, "handle_error")
+def _query_failed(exception_context):
+    """Failed statements (e.g. an expected IntegrityError) count towards the span too."""
+    started = getattr(exception_context.execution_context, "_query_start", None)
+    if started is not None:
+        add_span("db", time.perf_counter() - started)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -26,10 +71,16 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    # Profiler and /admin/profiles; granted with grant_admin.py, never by registering
+    is_admin = Column(Boolean, nullable=False, default=False, server_default="0")
 
 
 class TrackedJobDB(Base):
     __tablename__ = "tracked_jobs"
+    __table_args__ = (
+        # Adzuna ids are per country. NULL source ids (manually added jobs) never collide in SQLite
+        Index("ux_tracked_jobs_user_posting", "user_id", "country", "source_job_id", unique=True),
+    )
 
     id = Column(String, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -39,11 +90,212 @@ class TrackedJobDB(Base):
     apply_link = Column(String, default="")
     status = Column(String, default="Applied")
     applied_date = Column(String, default="")
+    source_job_id = Column(String, nullable=True)  # Adzuna job id (CleanedJob.id)
+    # Adzuna country code (CleanedJob.country); "" for manual jobs and rows saved before it was kept
+    country = Column(String, nullable=False, default="", server_default="")
+
+
+class ResumeDigestDB(Base):
+    """LLM-made summary of a resume, reused in prompts instead of the full text (see resume_digest.py)."""
+    __tablename__ = "resume_digests"
+
+    resume_hash = Column(String, primary_key=True)
+    digest = Column(Text, nullable=False)  # JSON
+    created_at = Column(String, nullable=False)
+
+
+class SavedSearchDB(Base):
+    """A user's recurring /jobs query, synced in the background (see saved_search_routes.py)."""
+    __tablename__ = "saved_searches"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    role = Column(String, nullable=False)
+    location = Column(String, default="")
+    experience_level = Column(String, default="")
+    countries = Column(String, nullable=False)  # "in,gb"
+    resume_text = Column(Text, nullable=True)  # new postings are matched against it when set
+    watermark = Column(String, nullable=True)  # created time of the newest posting seen (UTC ISO)
+    last_synced_at = Column(String, nullable=True)
+    last_seen_id = Column(Integer, nullable=False, default=0)  # newest SavedSearchJobDB.id the user has seen
+    created_at = Column(String, nullable=False)
+
+
+class SavedSearchJobDB(Base):
+    """A posting found by a saved-search sync, with its match score."""
+    __tablename__ = "saved_search_jobs"
+    __table_args__ = (
+        Index("ux_saved_search_jobs_posting", "search_id", "country", "source_job_id", unique=True),
+        Index("ix_saved_search_jobs_search", "search_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)  # increasing: "new since last visit" is id > last_seen_id
+    search_id = Column(String, ForeignKey("saved_searches.id"), nullable=False)
+    source_job_id = Column(String, nullable=True)
+    country = Column(String, nullable=True)
+    title = Column(String, nullable=False)
+    company = Column(String, nullable=False)
+    location = Column(String, default="")
+    description = Column(Text, default="")
+    apply_link = Column(String, default="")
+    created = Column(String, nullable=True)
+    match_score = Column(Float, nullable=True)
+    reasoning = Column(Text, nullable=True)
+
+
+class JobEmbeddingDB(Base):
+    """Which job each row of an embedding matrix file holds (see semantic_search.py)."""
+    __tablename__ = "job_embeddings"
+    __table_args__ = (
+        Index("ux_job_embeddings_key", "matrix", "job_key", unique=True),
+    )
+
+    matrix = Column(String, primary_key=True)  # matrix name: embedding model and dimension
+    row = Column(Integer, primary_key=True)
+    job_key = Column(String, nullable=False)  # "<country>:<Adzuna id>"
+    job = Column(Text, nullable=False)  # CleanedJob JSON
+    created_at = Column(String, nullable=False)
+
+
+class ResumeEmbeddingDB(Base):
+    """Embedding of a resume for semantic search; the resume text itself is not kept."""
+    __tablename__ = "resume_embeddings"
+
+    resume_id = Column(String, primary_key=True)  # resume_digest.resume_hash()
+    model = Column(String, primary_key=True)
+    vector = Column(LargeBinary, nullable=False)  # float32, unit length
+    created_at = Column(String, nullable=False)
 
 
 # ── Create tables ───────────────────────────────────────
 
-Base.metadata.create_all(bind=engine)
+def _add_missing_columns():
+    """create_all() never alters existing tables, so add new columns by hand."""
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(tracked_jobs)")}
+        if "source_job_id" not in columns:
+            conn.exec_driver_sql("ALTER TABLE tracked_jobs ADD COLUMN source_job_id VARCHAR")
+        if "country" not in columns:
+            conn.exec_driver_sql("ALTER TABLE tracked_jobs ADD COLUMN country VARCHAR NOT NULL DEFAULT ''")
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(users)")}
+        if "is_admin" not in columns:
+            conn.exec_driver_sql("ALTER TABLE users ADD COLUMN is_admin BOOLEAN NOT NULL DEFAULT 0")
+
+
+# Whether ux_tracked_jobs_user_posting exists, as of the last _add_missing_indexes()
+_source_index = False
+
+
+def _add_missing_indexes(bind=engine):
+    """Create the dedupe index on databases that predate it."""
+    global _source_index
+    try:
+        with bind.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_tracked_jobs_user_posting "
+                "ON tracked_jobs (user_id, country, source_job_id)"
+            )
+            # Superseded: it treated Adzuna ids as unique across countries
+            conn.exec_driver_sql("DROP INDEX IF EXISTS ux_tracked_jobs_user_source")
+        _source_index = True
+    except Exception as e:
+        _source_index = False
+        logger.warning("[DB] Could not create unique tracked-job index (%s). "
+                       "Run `python compact_tracked_jobs.py` to merge duplicates.", e)
+
+
+def has_tracked_job_source_index() -> bool:
+    """
+    Whether the (user_id, country, source_job_id) unique index exists. It can be
+    missing on an old database with duplicates that were never compacted.
+    Checked at startup and after compaction, not per call; a compaction run
+    from another process is picked up when the app restarts.
+    """
+    return _source_index
+
+
+_initialized = False
+
+
+def init_db() -> None:
+    """
+    Create missing tables, columns and indexes. Runs at app startup (and once
+    in serve.py before the workers start), not on import, so importing the
+    models stays cheap. Safe to call again.
+    """
+    global _initialized
+    if _initialized:
+        return
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _add_missing_indexes()
+    _initialized = True
+
+
+# ── Maintenance ─────────────────────────────────────────
+
+# Adzuna links look like .../land/ad/5622184409?... or .../details/5623928523?...
+_ADZUNA_ID_RE = re.compile(r"adzuna\.[a-z.]+/(?:land/ad|details)/(\d+)")
+
+# Later in the list = further along; the survivor of a merge keeps this status
+STATUS_RANK = ["Applied", "Interview", "Rejected", "Offer"]
+
+
+def _status_rank(status: str) -> int:
+    return STATUS_RANK.index(status) if status in STATUS_RANK else -1
+
+
+def set_admin(db, email: str, is_admin: bool = True) -> bool:
+    """Grant or revoke admin rights for a registered account; False if there is none."""
+    user = db.query(User).filter(User.email == email).first()
+    if user is None:
+        return False
+    user.is_admin = is_admin
+    db.commit()
+    return True
+
+
+def compact_tracked_jobs(db) -> dict:
+    """
+    One-off cleanup for rows saved before tracked jobs were deduplicated.
+    Backfills source_job_id from Adzuna apply links, then merges rows that
+    point at the same posting for the same user, keeping the most advanced
+    status. Returns counts of backfilled and deleted rows.
+    """
+    rows = db.query(TrackedJobDB).order_by(TrackedJobDB.user_id).all()
+
+    groups = {}
+    for row in rows:
+        source_id = row.source_job_id
+        if not source_id and row.apply_link:
+            match = _ADZUNA_ID_RE.search(row.apply_link)
+            source_id = match.group(1) if match else None
+        if source_id:
+            key = (row.user_id, row.country or "", source_id)
+        else:
+            key = (row.user_id, row.title, row.company, row.location, row.apply_link)
+        groups.setdefault(key, (source_id, []))[1].append(row)
+
+    backfilled = deleted = 0
+    for source_id, group in groups.values():
+        survivor = max(group, key=lambda r: _status_rank(r.status))
+        for row in group:
+            if row is survivor:
+                continue
+            survivor.applied_date = survivor.applied_date or row.applied_date
+            survivor.location = survivor.location or row.location
+            db.delete(row)
+            deleted += 1
+        if len(group) > 1:
+            # Flush deletes first so the backfilled id cannot hit the unique index
+            db.flush()
+        if source_id and survivor.source_job_id != source_id:
+            survivor.source_job_id = source_id
+            backfilled += 1
+
+    db.commit()
+    _add_missing_indexes(db.get_bind())
+    return {"backfilled": backfilled, "deleted": deleted}
 
 
 # ── Dependency ──────────────────────────────────────────
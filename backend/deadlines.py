@@ -0,0 +1,91 @@
+"""
+Request deadlines and client-disconnect cancellation for the LLM routes.
+
+Each LLM route has a time budget; a client may ask for less with the
+X-Request-Timeout header (seconds). The deadline is published in a context
+variable, so every call made for the request (queue wait, Ollama HTTP
+timeout, retries, model fallbacks) uses what is left of it instead of its
+own fixed timeout. Once it passes, the request fails with 504.
+
+until_disconnected() runs a route's work and cancels it when the client goes
+away; llm_service then closes the Ollama connection, which stops generation.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import Header, HTTPException, Request
+
+T = TypeVar("T")
+
+# time.monotonic() by which the current request must be answered; None = no deadline
+deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=504, detail="The request ran out of time.")
+
+
+class ClientDisconnected(HTTPException):
+    def __init__(self):
+        # 499: nginx's "client closed request"; nobody reads it, but metrics and logs do
+        super().__init__(status_code=499, detail="Client closed request")
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, or None without one."""
+    at = deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def time_left(limit: float) -> float:
+    """`limit`, capped by the deadline. Raises DeadlineExceeded once it has passed."""
+    left = remaining()
+    if left is None:
+        return limit
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(limit, left)
+
+
+def request_deadline(budget_seconds: float):
+    """Route dependency: the deadline is budget_seconds from now, or sooner if the client asks."""
+
+    async def dependency(x_request_timeout: Optional[str] = Header(default=None)) -> float:
+        budget = budget_seconds
+        try:
+            if x_request_timeout:
+                budget = min(budget, max(0.0, float(x_request_timeout)))
+        except ValueError:
+            pass
+        # Async dependency: runs in the request's context, so the route sees the value
+        deadline.set(time.monotonic() + budget)
+        return budget
+
+    return dependency
+
+
+async def until_disconnected(request: Request, work: Awaitable[T]) -> T:
+    """Await `work`, cancelling it if the client disconnects first."""
+    task = asyncio.ensure_future(work)
+
+    async def disconnected() -> None:
+        # The body has been read, so the next ASGI message is the disconnect
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.ensure_future(disconnected())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            # Let the work unwind (and close its Ollama connection) before answering
+            await asyncio.wait({task})
+    if task.cancelled():
+        raise ClientDisconnected()
+    return task.result()
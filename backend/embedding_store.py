@@ -0,0 +1,116 @@
+"""
+Append-only float32 embedding matrix in a memory-mapped file.
+
+One file per (model, dimension): row i holds vector i, unit length, so a
+dot product is the cosine similarity. There is no header; the row count is
+the file size divided by the row size, so a reader never needs a lock and
+only ever sees whole rows. Appends take a file lock (fcntl, where
+available) so several worker processes can share one file; which job each
+row holds is kept in SQLite by the caller (see semantic_search.py).
+
+search() maps the file read-only and scores it in blocks of SEARCH_BLOCK
+rows, keeping a running top-K, so memory use stays at one block however
+large the matrix grows; the OS page cache keeps hot pages in RAM.
+
+Needs numpy.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency; semantic search is off without it
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within this process
+    fcntl = None
+
+# Rows scored per NumPy call: 32768 x 768 floats is a 96 MB block
+SEARCH_BLOCK = int(os.getenv("EMBEDDING_SEARCH_BLOCK", "32768"))
+
+
+def normalize(vectors) -> "np.ndarray":
+    """float32 rows scaled to unit length (zero rows stay zero)."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class EmbeddingMatrix:
+    def __init__(self, path: str, dim: int):
+        if np is None:
+            raise RuntimeError("Semantic search needs numpy: pip install numpy")
+        self.path = path
+        self.dim = dim
+        self.row_bytes = dim * 4
+        self._lock = threading.Lock()
+        self._mapped: Tuple[int, object] = (0, None)  # (rows, np.memmap) of the last search
+
+    def rows(self) -> int:
+        try:
+            return os.path.getsize(self.path) // self.row_bytes
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """Exclusive append lock, across threads and (with fcntl) processes."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, vectors) -> int:
+        """Append unit-length rows; returns the index of the first. Call inside locked()."""
+        vectors = normalize(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+        with open(self.path, "ab") as f:
+            size = f.tell()
+            if size % self.row_bytes:
+                # A write cut short by a crash: drop the partial row
+                f.truncate(size - size % self.row_bytes)
+                size -= size % self.row_bytes
+            f.write(vectors.tobytes())
+        return size // self.row_bytes
+
+    def _matrix(self, rows: int):
+        mapped_rows, matrix = self._mapped
+        if matrix is None or mapped_rows != rows:
+            matrix = np.memmap(self.path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            self._mapped = (rows, matrix)
+        return matrix
+
+    def search(self, query, k: int) -> List[Tuple[int, float]]:
+        """The k rows most similar to `query`, best first, as (row, cosine similarity)."""
+        rows = self.rows()
+        if rows == 0 or k <= 0:
+            return []
+        query = normalize(query)[0]
+        matrix = self._matrix(rows)
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, rows, SEARCH_BLOCK):
+            scores = matrix[start:start + SEARCH_BLOCK] @ query
+            if len(scores) > k:
+                top = np.argpartition(scores, -k)[-k:]
+            else:
+                top = np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_scores) > k:
+                keep = np.argpartition(best_scores, -k)[-k:]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        order = np.argsort(-best_scores, kind="stable")
+        return [(int(best_rows[i]), float(best_scores[i])) for i in order]
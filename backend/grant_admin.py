@@ -0,0 +1,23 @@
+"""
+Grant or revoke admin rights (the request profiler and /admin/profiles).
+The account must be registered first.
+Usage: python grant_admin.py ops@example.com [--revoke]
+"""
+
+import sys
+
+from database import SessionLocal, init_db, set_admin
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[2:] not in ([], ["--revoke"]):
+        sys.exit("Usage: python grant_admin.py EMAIL [--revoke]")
+    email, admin = sys.argv[1], "--revoke" not in sys.argv
+    init_db()
+    db = SessionLocal()
+    try:
+        if not set_admin(db, email, admin):
+            sys.exit(f"[DB] No registered account for {email}; register it first")
+        print(f"[DB] {'Granted' if admin else 'Revoked'} admin rights for {email}")
+    finally:
+        db.close()
@@ -0,0 +1,49 @@
+"""
+Pooled HTTP sessions for the upstream APIs (Ollama, Adzuna).
+
+A bare requests.get()/post() opens a new TCP connection per call; a shared
+Session keeps connections to each host alive, so repeat calls skip the
+connect (and TLS handshake, for Adzuna). Sessions are created on first use
+or by the app's startup (see startup.py), and closed on shutdown.
+
+Closing a streamed response before it is fully read still drops its
+connection instead of returning it to the pool, so cancelling an Ollama
+generation keeps working as before.
+
+Environment:
+  HTTP_POOL_SIZE   connections kept per upstream host (default 16)
+"""
+
+import os
+import threading
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def session(name: str) -> requests.Session:
+    """The pooled session for one upstream ("ollama", "adzuna")."""
+    pooled = _sessions.get(name)
+    if pooled is not None:
+        return pooled
+    with _lock:
+        if name not in _sessions:
+            pooled = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            pooled.mount("http://", adapter)
+            pooled.mount("https://", adapter)
+            _sessions[name] = pooled
+        return _sessions[name]
+
+
+def close_all() -> None:
+    with _lock:
+        for pooled in _sessions.values():
+            pooled.close()
+        _sessions.clear()
@@ -0,0 +1,206 @@
+"""
+Single-pass tolerant JSON extraction for LLM output.
+
+llama3 wraps JSON in markdown fences, prefixes it with prose, emits escapes
+JSON does not allow (\\_ , \\') and raw newlines inside strings, leaves
+trailing commas, and sometimes stops mid-object. extract_json() finds the
+first balanced object/array and repairs those issues in one O(n) scan, so
+the result can go straight to json.loads(). loads_tolerant() tries a plain
+slice between the outer brackets first, which covers fences and prose
+without running the scanner at all. ArrayItemStream does the same for a
+streamed array, one object at a time.
+"""
+
+import json
+import re
+from typing import Optional
+
+_VALID_ESCAPES = set('"\\/bfnrtu')
+_HEX4 = re.compile(r"[0-9a-fA-F]{4}")
+
+# Characters that change scanner state; everything else is copied in bulk
+_OUTSIDE_SPECIAL = re.compile(r'[\[\]{}",]')
+_INSIDE_SPECIAL = re.compile(r'["\\\x00-\x1f]')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+# strict=False accepts raw newlines/tabs inside strings. Built once: json.loads
+# with keyword arguments constructs a new decoder on every call
+_LENIENT = json.JSONDecoder(strict=False)
+
+
+def _strip_trailing_comma(out: list) -> None:
+    """Drop a dangling comma (and the whitespace after it) before a closer."""
+    i = len(out) - 1
+    while i >= 0 and out[i].strip() == "":
+        i -= 1
+    if i >= 0 and out[i].rstrip().endswith(","):
+        out[i] = out[i].rstrip()[:-1]
+        del out[i + 1:]
+
+
+def extract_json(text: str, expect_array: bool = False) -> Optional[str]:
+    """
+    Return the first complete JSON value in text as a repaired JSON string,
+    or None if there is no opening bracket. Truncated output is closed off.
+    """
+    opener = "[" if expect_array else "{"
+    start = text.find(opener)
+    if start < 0:
+        # Fall back to the other container type (e.g. a single object when a list was asked for)
+        start = text.find("{" if expect_array else "[")
+        if start < 0:
+            return None
+
+    out = []
+    stack = []
+    checkpoint = None  # (len(out), stack) after the last completed nested value
+    pos = start
+    n = len(text)
+    in_string = False
+
+    while pos < n:
+        if in_string:
+            m = _INSIDE_SPECIAL.search(text, pos)
+            if m is None:
+                out.append(text[pos:])
+                pos = n
+                break
+            out.append(text[pos:m.start()])
+            ch = m.group()
+            pos = m.end()
+            if ch == '"':
+                out.append('"')
+                in_string = False
+            elif ch == "\\":
+                nxt = text[pos] if pos < n else ""
+                if nxt == "u" and _HEX4.match(text, pos + 1):
+                    out.append(text[pos - 1:pos + 5])
+                    pos += 5
+                elif nxt in _VALID_ESCAPES and nxt != "u":
+                    out.append("\\" + nxt)
+                    pos += 1
+                # else: invalid escape, drop the backslash and keep the character
+            else:
+                out.append(_CONTROL_ESCAPES.get(ch, ""))
+            continue
+
+        m = _OUTSIDE_SPECIAL.search(text, pos)
+        if m is None:
+            out.append(text[pos:])
+            pos = n
+            break
+        out.append(text[pos:m.start()])
+        ch = m.group()
+        pos = m.end()
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "[{":
+            stack.append("]" if ch == "[" else "}")
+            out.append(ch)
+        elif ch in "]}":
+            _strip_trailing_comma(out)
+            # Emit the closer we expect, which also repairs mismatched brackets
+            out.append(stack.pop())
+            if not stack:
+                return "".join(out)
+            checkpoint = (len(out), list(stack))
+        else:
+            out.append(ch)
+
+    # Ran out of text: drop the unfinished tail and close whatever is still open
+    if checkpoint is not None:
+        del out[checkpoint[0]:]
+        stack = checkpoint[1]
+    elif in_string:
+        out.append('"')
+    _strip_trailing_comma(out)
+    while stack:
+        out.append(stack.pop())
+    return "".join(out)
+
+
+def loads_tolerant(text: str, expect_array: bool = False):
+    """
+    Parse LLM output that should contain JSON. Raises ValueError when nothing
+    usable can be recovered.
+    """
+    opener, closer = ("[", "]") if expect_array else ("{", "}")
+    start, end = text.find(opener), text.rfind(closer)
+    if 0 <= start < end:
+        try:
+            return _LENIENT.decode(text[start:end + 1])
+        except ValueError:
+            pass
+    candidate = extract_json(text, expect_array)
+    if candidate is None:
+        raise ValueError("no JSON object or array found")
+    return json.loads(candidate)
+
+
+class ArrayItemStream:
+    """
+    Incremental parser for a streamed JSON array of objects.
+
+    feed() takes text as it arrives and returns the objects whose closing
+    brace has been seen, so each item can be used before the array is
+    finished. Text before the first "[" is ignored; scalars in the array are
+    skipped; an unfinished object at the end of the stream is dropped.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._started = False
+        self._depth = 0          # nesting below the array itself
+        self._in_string = False
+        self._escaped = False
+        self._item = []          # text of the object being read
+
+    def feed(self, chunk: str) -> list:
+        items = []
+        if self.done:
+            return items
+        segment_start = 0 if self._depth else None
+        for i, ch in enumerate(chunk):
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    segment_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # End of the top-level array
+                    self.done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    self._item.append(chunk[segment_start:i + 1])
+                    segment_start = None
+                    item = self._finish_item()
+                    if item is not None:
+                        items.append(item)
+        if segment_start is not None and self._depth:
+            self._item.append(chunk[segment_start:])
+        return items
+
+    def _finish_item(self):
+        text = "".join(self._item)
+        self._item = []
+        try:
+            value = loads_tolerant(text)
+        except ValueError:
+            return None
+        return value if isinstance(value, dict) else None
@@ -1,121 +1,340 @@
 import requests
+import asyncio
+import hashlib
 import json
+import logging
 import os
-import re
-from models import AnalyzeResumeResponse, MatchJobResult, GenerateCoverLetterResponse, OptimizeResumeResponse
+import threading
+import time
+from contextlib import asynccontextmanager, closing
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from models import AnalyzeResumeResponse, MatchJobResult, GenerateCoverLetterResponse, OptimizeResumeResponse, SectionChange
 from fastapi import HTTPException
+from cache import make_cache
+import http_pool
+from deadlines import DeadlineExceeded, deadline, remaining, time_left
+from starlette.concurrency import iterate_in_threadpool
+from json_extract import ArrayItemStream, loads_tolerant
+from model_routes import ANALYSIS, MATCHING, COVER_LETTER, REWRITE, DIGEST, TASKS, DEFAULT_MODEL, MIN_QUALITY, models_for
+from ollama_pool import OllamaPool
+from prompts import (
+    Messages,
+    analysis_messages,
+    cover_letter_messages,
+    digest_messages,
+    format_digest,
+    match_messages,
+    rewrite_messages,
+    section_rewrite_messages,
+)
+from resume_digest import get_digest
+from resume_sections import assign_keywords, section_diff, split_sections
+from overload import AdaptiveLimiter, Rejected, charge_client
+from tracing import add_span, span, trace_headers
+from metrics import (
+    LLM_REQUEST_SECONDS,
+    LLM_JSON_PARSE,
+    LLM_JSON_REPAIR_SECONDS,
+    LLM_RETRIES,
+    LLM_REJECTED,
+    LLM_ROUTE_SECONDS,
+    LLM_ROUTE_QUALITY,
+    ollama_queue_wait,
+    record_ollama_stats,
+    register_cache,
+    register_llm_guard,
+)
+
+logger = logging.getLogger(__name__)
 
 # Ollama Configuration
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
-MODEL_NAME = "llama3"
+# OLLAMA_HOSTS="http://gpu1:11434,http://gpu2:11434" spreads load over several hosts;
+# otherwise the single host from OLLAMA_API_URL is used
+OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api/chat")
+OLLAMA_HOSTS = [h.strip() for h in os.getenv("OLLAMA_HOSTS", "").split(",") if h.strip()] or [OLLAMA_API_URL.rsplit("/api/", 1)[0]]
+# Chat API: a fixed system message per task (see prompts.py) that Ollama's prompt cache can reuse
+OLLAMA_CHAT_PATH = "/api/chat"
+# How long Ollama keeps the model, and with it the cached prefix, loaded (e.g. "30m"); Ollama's default if unset
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE")
+MODEL_NAME = DEFAULT_MODEL  # per-task models: see model_routes.py
 MAX_RETRIES = 2
+OLLAMA_TIMEOUT = 120  # seconds; a request deadline (deadlines.py) can shorten it
+
+# Structured answers (analysis, matching) for identical prompts are reused for this long.
+# Off by default: a repeated analysis then gets a fresh generation.
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "0"))
+_llm_cache = make_cache("llm", LLM_CACHE_TTL, max_entries=512)
+register_cache("llm", _llm_cache)
+
+# Prompts for these tasks carry the cached resume digest (resume_digest.py) instead of
+# resumes longer than RESUME_DIGEST_MIN_CHARS. ATS analysis is left out by default:
+# keyword coverage is judged more faithfully on the raw text.
+RESUME_DIGEST_TASKS = {t.strip() for t in os.getenv("RESUME_DIGEST_TASKS", "matching,cover_letter").split(",") if t.strip()}
+RESUME_DIGEST_MIN_CHARS = int(os.getenv("RESUME_DIGEST_MIN_CHARS", "1500"))
+
+# Task of the current LLM call, for per-task prompt-eval reporting
+llm_task: ContextVar[str] = ContextVar("llm_task", default="")
+
+# Per-host circuit breakers, health checks, prefix-sticky least-outstanding routing
+OLLAMA_POOL = OllamaPool(
+    OLLAMA_HOSTS,
+    sticky_prefix_chars=int(os.getenv("OLLAMA_STICKY_PREFIX_CHARS", "1024")),
+    sticky_slack=int(os.getenv("OLLAMA_STICKY_SLACK", "2")),
+    failure_threshold=int(os.getenv("OLLAMA_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("OLLAMA_BREAKER_RESET_SECONDS", "30")),
+    health_interval=float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10")),
+)
+
+# Overload protection: fail fast with 503 + Retry-After instead of queueing behind timeouts.
+# Concurrency settings are per host.
+OLLAMA_LIMITER = AdaptiveLimiter(
+    initial_limit=int(os.getenv("OLLAMA_INITIAL_CONCURRENCY", "2")) * len(OLLAMA_HOSTS),
+    max_limit=int(os.getenv("OLLAMA_MAX_CONCURRENCY", "8")) * len(OLLAMA_HOSTS),
+    max_queue=int(os.getenv("OLLAMA_MAX_QUEUE", "16")),
+    max_queue_per_client=int(os.getenv("OLLAMA_MAX_QUEUE_PER_CLIENT", "4")),
+    queue_timeout=float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "30")),
+    queue_wait_target=float(os.getenv("OLLAMA_QUEUE_WAIT_TARGET", "0.5")),
+)
+register_llm_guard(OLLAMA_LIMITER, OLLAMA_POOL)
 
 def safe_json_parse(text: str, expect_array: bool = False):
-    """Safely parse JSON with multiple fallback strategies."""
+    """Safely parse JSON, repairing fences, leading prose and bad escapes in one pass."""
+    data, ok = _parse_llm_json(text, expect_array)
+    if not ok:
+        logger.warning("[JSON Parse] Failed to parse, returning empty %s", "array" if expect_array else "object")
+        return [] if expect_array else {}
+    return data
+
+def _parse_llm_json(text: str, expect_array: bool):
+    """Returns (data, ok). Fast path is a plain json.loads; repair only runs on failure."""
+    start = time.perf_counter()
     try:
-        # Try direct parsing first
-        return json.loads(text)
+        data, outcome = json.loads(text), "direct"
     except json.JSONDecodeError as e:
-        print(f"[JSON Parse] Direct parse failed: {str(e)}")
-        
-        # Strategy 1: Remove markdown code blocks
-        cleaned = text.strip()
-        if cleaned.startswith("```json"):
-            cleaned = cleaned[7:]
-        elif cleaned.startswith("```"):
-            cleaned = cleaned[3:]
-        if cleaned.endswith("```"):
-            cleaned = cleaned[:-3]
-        cleaned = cleaned.strip()
-        
+        logger.debug("[JSON Parse] Direct parse failed: %s", e)
         try:
-            return json.loads(cleaned)
-        except json.JSONDecodeError as e:
-            print(f"[JSON Parse] Cleaned parse failed: {str(e)}")
-            print(f"[JSON Parse] First 500 chars: {cleaned[:500]}")
-            
-            # Strategy 2: Extract JSON using regex
-            if expect_array:
-                match = re.search(r'\[.*\]', cleaned, re.DOTALL)
-            else:
-                match = re.search(r'\{.*\}', cleaned, re.DOTALL)
-            
-            if match:
-                extracted = match.group()
-                print(f"[JSON Parse] Regex extracted {len(extracted)} chars")
-                
-                # Strategy 2.5: Sanitize escape characters
-                # Remove invalid escape sequences that LLM might add
-                sanitized = extracted
-                # Replace common invalid escapes with safe versions
-                # Keep valid escapes: \", \\, \/, \b, \f, \n, \r, \t, \uXXXX
-                # Remove others by replacing \X with just X
-                import re as regex_module
-                # Find all backslashes not followed by valid escape chars
-                sanitized = regex_module.sub(r'\\(?!["\\/bfnrtu])', '', sanitized)
-                
-                if sanitized != extracted:
-                    print(f"[JSON Parse] Sanitized escape characters")
-                
-                try:
-                    return json.loads(sanitized)
-                except json.JSONDecodeError as e:
-                    print(f"[JSON Parse] Sanitized parse failed: {str(e)}")
-                    # Last resort: try to fix common issues
-                    try:
-                        # Remove ALL backslashes that aren't escaping quotes
-                        desperate = sanitized.replace('\\', '')
-                        desperate = desperate.replace('""', '"')  # Fix double quotes
-                        return json.loads(desperate)
-                    except:
-                        print(f"[JSON Parse] Extracted parse failed: {str(e)}")
-                        print(f"[JSON Parse] Extracted first 500 chars: {extracted[:500]}")
-            else:
-                print(f"[JSON Parse] No JSON pattern found in text")
-            
-            # Strategy 3: Return safe defaults
-            if expect_array:
-                print("[JSON Parse] Failed to parse, returning empty array")
-                return []
-            else:
-                print("[JSON Parse] Failed to parse, returning empty object")
-                return {}
-
-def _call_ollama(prompt: str) -> str:
-    """Helper to call Ollama API."""
-    payload = {
-        "model": MODEL_NAME,
-        "prompt": prompt,
-        "stream": False
-    }
-    
-    try:
-        print(f"[Ollama] Sending request to {OLLAMA_API_URL}")
-        response = requests.post(OLLAMA_API_URL, json=payload, timeout=120)
-        response.raise_for_status()
-        
-        result = response.json()
-        return result.get("response", "")
-        
-    except requests.exceptions.ConnectionError:
-        print("[Ollama] ERROR: Could not connect to Ollama. Is it running?")
-        raise HTTPException(status_code=503, detail="Ollama is not running. Please start Ollama.")
-    except Exception as e:
-        print(f"[Ollama] ERROR: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+            data, outcome = loads_tolerant(text, expect_array), "repaired"
+        except ValueError as e:
+            logger.debug("[JSON Parse] Repair failed: %s; first 500 chars: %s", e, text[:500])
+            data, outcome = None, "failed"
+    if expect_array and isinstance(data, dict):
+        # {"matches": [...]} instead of a bare array
+        lists = [v for v in data.values() if isinstance(v, list)]
+        if len(lists) == 1:
+            data, outcome = lists[0], "repaired"
+    LLM_JSON_REPAIR_SECONDS.observe(time.perf_counter() - start)
+    add_span("json", time.perf_counter() - start)
+    LLM_JSON_PARSE.inc(outcome=outcome)
+    return data, outcome != "failed"
+
+def _chat_payload(messages: Messages, model: str, stream: bool) -> dict:
+    payload = {"model": model, "messages": messages, "stream": stream}
+    if OLLAMA_KEEP_ALIVE:
+        payload["keep_alive"] = OLLAMA_KEEP_ALIVE
+    return payload
+
+def _record_result(result: dict, wall: float, task: str, model: str) -> None:
+    """Metrics plus one log line per call; a low prompt_eval count means the prefix was cached."""
+    record_ollama_stats(result, wall, task)
+    add_span("ollama-queue", ollama_queue_wait(result, wall))
+    for name, field in (("load", "load_duration"), ("prompt-eval", "prompt_eval_duration"), ("generation", "eval_duration")):
+        if result.get(field):
+            add_span(name, result[field] / 1e9)
+    logger.info(
+        "[Ollama] %s on %s: prompt eval %s tokens in %.0f ms, %s tokens generated, %.2fs total",
+        task or "call", model, result.get("prompt_eval_count", "?"),
+        (result.get("prompt_eval_duration") or 0) / 1e6, result.get("eval_count", "?"), wall,
+    )
+
+def _call_ollama(
+    messages: Messages,
+    url: str = OLLAMA_API_URL,
+    model: str = MODEL_NAME,
+    task: str = "",
+    stop_at: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+) -> dict:
+    """Blocking Ollama chat call; returns the full result with Ollama's timing fields.
+
+    Reads Ollama's stream instead of one JSON body, so the call can be
+    abandoned between tokens (cancel, deadline) rather than running to the end.
+    """
+    parts, result = [], {}
+    with closing(_ollama_chunks(messages, url, model, task, stop_at, cancel)) as chunks:
+        for chunk in chunks:
+            parts.append((chunk.get("message") or {}).get("content") or "")
+            result = chunk
+    return {**result, "message": {"role": "assistant", "content": "".join(parts)}}
+
+def _load_model(url: str, model: str, timeout: float) -> float:
+    """Have one Ollama host load a model (a chat call without messages); returns the seconds it took."""
+    start = time.perf_counter()
+    response = http_pool.session("ollama").post(url, json=_chat_payload([], model, stream=False), timeout=timeout)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+async def warm_up_models(timeout: float = OLLAMA_TIMEOUT) -> Dict[str, Optional[float]]:
+    """
+    Load every routed model on every Ollama host, all at once, so the first
+    user request does not pay the model load. Maps "model@host" to the load
+    time, or None when the host could not load it.
+    """
+    models = sorted({model for task in TASKS for model in models_for(task)})
+    targets = [(backend.base_url, model) for backend in OLLAMA_POOL.backends for model in models]
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_load_model, host + OLLAMA_CHAT_PATH, model, timeout) for host, model in targets),
+        return_exceptions=True,
+    )
+    loaded = {}
+    for (host, model), result in zip(targets, results):
+        if isinstance(result, Exception):
+            logger.warning("[Ollama] Could not load %s on %s: %s", model, host, result)
+            result = None
+        loaded[f"{model}@{host}"] = result
+    return loaded
+
+def _post_embed(url: str, texts: List[str], model: str, timeout: float) -> requests.Response:
+    return http_pool.session("ollama").post(
+        url, json={"model": model, "input": texts, "truncate": True}, headers=trace_headers(), timeout=timeout,
+    )
+
+async def embed_texts(texts: List[str], model: str) -> List[List[float]]:
+    """Embeddings for a batch of texts (Ollama /api/embed), one call.
+
+    Admitted like every other Ollama call: a limiter slot in the current
+    client's fair-share queue, then a host from the pool, within the
+    request deadline. Raises HTTPException like the generation calls.
+    """
+    rejected = None
+    async with _ollama_slot([{"role": "user", "content": texts[0]}], model=model) as backend:
+        try:
+            response = await asyncio.to_thread(
+                _post_embed, backend.url("/api/embed"), texts, model, time_left(OLLAMA_TIMEOUT)
+            )
+        except requests.exceptions.ConnectionError:
+            raise HTTPException(status_code=503, detail="Ollama is not running. Please start Ollama.")
+        except requests.exceptions.Timeout:
+            if (remaining() or 1) <= 0:
+                raise DeadlineExceeded()
+            raise HTTPException(status_code=504, detail="Ollama did not respond in time.")
+        # 4xx (e.g. the model is not pulled) is not the host's fault: leave the slot cleanly
+        if 400 <= response.status_code < 500:
+            rejected = response
+        elif not response.ok:
+            raise HTTPException(status_code=502, detail=f"Embedding failed: HTTP {response.status_code}")
+    # Embedding latency says nothing about generation capacity, so no on_success()
+    if rejected is not None:
+        raise HTTPException(status_code=502, detail=f"Embedding failed: {rejected.status_code} {rejected.text[:200]}")
+    return response.json()["embeddings"]
+
+def _busy(rejected: Rejected) -> HTTPException:
+    LLM_REJECTED.inc(reason=rejected.reason)
+    logger.warning("[Ollama] Rejecting request: %s (retry after %ss)", rejected.reason, rejected.retry_after)
+    return HTTPException(
+        status_code=503,
+        detail="The AI service is busy. Please retry shortly.",
+        headers={"Retry-After": str(rejected.retry_after)},
+    )
 
-def _call_ollama_with_retry(prompt: str, max_retries: int = MAX_RETRIES) -> str:
-    """Call Ollama with retry mechanism for stability."""
+def check_llm_capacity() -> None:
+    """Raise 503 now if a new LLM call would be rejected anyway (used before streaming starts)."""
+    wait = OLLAMA_POOL.open_for()
+    if wait > 0:
+        raise _busy(Rejected("circuit_open", wait))
+    if OLLAMA_LIMITER.queued >= OLLAMA_LIMITER.max_queue:
+        raise _busy(Rejected("queue_full", OLLAMA_LIMITER.retry_after()))
+
+@asynccontextmanager
+async def _ollama_slot(messages: Messages, exclude=(), model: str = MODEL_NAME):
+    """Admission for one Ollama call: a concurrency slot, then a host from the pool.
+
+    Yields the backend. Server errors count against that host's circuit
+    breaker; timeouts and Ollama errors also shrink the concurrency limit.
+    The caller reports success to OLLAMA_LIMITER.on_success.
+    """
+    try:
+        with span("queue"):
+            await OLLAMA_LIMITER.acquire(timeout=time_left(OLLAMA_LIMITER.queue_timeout))
+    except Rejected as e:
+        if e.reason == "queue_timeout" and (remaining() or 1) <= 0:
+            raise DeadlineExceeded()
+        raise _busy(e)
+    try:
+        try:
+            backend = OLLAMA_POOL.acquire(messages, exclude, model)
+        except Rejected as e:
+            raise _busy(e)
+        ok = None
+        try:
+            yield backend
+            ok = True
+        except DeadlineExceeded:
+            raise  # the client's budget ran out, not the backend's fault
+        except HTTPException as e:
+            if e.status_code >= 500:
+                ok = False
+                if e.status_code != 503:  # unreachable host is not an overload signal
+                    OLLAMA_LIMITER.on_overload()
+            raise
+        finally:
+            OLLAMA_POOL.release(backend, ok)
+    finally:
+        OLLAMA_LIMITER.release()
+
+async def _run_llm(messages: Messages, model: str = MODEL_NAME) -> str:
+    """Single entry point for non-streamed generations.
+
+    The blocking HTTP call runs in a worker thread so one generation no
+    longer stalls every other request on the event loop. If a host is
+    unreachable the prompt fails over to the next one. If the caller is
+    cancelled (client gone), the worker thread drops the Ollama connection at
+    the next token, which stops the generation.
+    """
+    task = llm_task.get()
+    stop_at = deadline.get()
+    tried = []
+    while True:
+        backend = None
+        try:
+            async with _ollama_slot(messages, tried, model) as backend:
+                start = time.perf_counter()
+                cancel = threading.Event()
+                try:
+                    result = await asyncio.to_thread(
+                        _call_ollama, messages, backend.url(OLLAMA_CHAT_PATH), model, task, stop_at, cancel
+                    )
+                except asyncio.CancelledError:
+                    cancel.set()
+                    raise
+                wall = time.perf_counter() - start
+                OLLAMA_LIMITER.on_success(wall, ollama_queue_wait(result, wall))
+        except HTTPException as e:
+            # Connection failed, so nothing was generated: safe to try another host
+            if backend is not None and e.status_code == 503 and len(tried) + 1 < len(OLLAMA_POOL.backends):
+                tried.append(backend)
+                LLM_RETRIES.inc(stage="failover")
+                logger.warning("[Ollama] %s unreachable, failing over", backend.base_url)
+                continue
+            raise
+        return (result.get("message") or {}).get("content", "")
+
+async def _call_ollama_with_retry(messages: Messages, max_retries: int = MAX_RETRIES, model: str = MODEL_NAME) -> str:
+    """Call Ollama with retry mechanism for stability.
+
+    Unavailable (503) and timeout (504) are overload signals and are not
+    retried: retrying them only adds load to a backend that is already behind.
+    """
     last_error = None
     
     for attempt in range(max_retries):
         try:
             if attempt > 0:
-                print(f"[Ollama] Retry attempt {attempt + 1}/{max_retries}")
-            return _call_ollama(prompt)
+                LLM_RETRIES.inc(stage="transport")
+                logger.info("[Ollama] Retry attempt %s/%s", attempt + 1, max_retries)
+            return await _run_llm(messages, model)
         except HTTPException as e:
-            # Don't retry connection errors or service unavailable
-            if e.status_code in [503]:
+            if e.status_code in (503, 504):
                 raise
             last_error = e
         except Exception as e:
@@ -126,70 +345,195 @@ def _call_ollama_with_retry(prompt: str, max_retries: int = MAX_RETRIES) -> str:
         raise last_error
     return ""
 
-def call_llm_safe(prompt: str, expect_array: bool = False) -> dict:
-    """Safely call LLM with JSON parsing and cleanup on failure.
-    
-    Behavior:
-    1. Call LLM.
-    2. Try JSON parse.
-    3. If fail:
-       - Clean escape sequences.
-       - Retry once.
-    4. If still fail:
-       - Return {"error": "parse_failed"}
+def _ollama_chunks(
+    messages: Messages,
+    url: str,
+    model: str,
+    task: str = "",
+    stop_at: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Iterator[dict]:
+    """Yield Ollama's streamed chat chunks; the last one carries the timing fields.
+
+    Closing the generator closes the HTTP connection, which makes Ollama
+    stop generating. So does setting `cancel` or passing `stop_at`, a
+    time.monotonic() deadline (then DeadlineExceeded is raised).
     """
-    print("[Ollama] Calling LLM with safe JSON parsing...")
+    payload = _chat_payload(messages, model, stream=True)
     
-    # First attempt
+    start = time.perf_counter()
     try:
-        response_text = _call_ollama_with_retry(prompt)
-        data = safe_json_parse(response_text, expect_array=expect_array)
-        
-        if isinstance(data, dict) and "error" not in data:
-            print("[Ollama] JSON parsed successfully on first attempt")
-            return data
-        elif isinstance(data, list):
-            print(f"[Ollama] JSON parsed as array ({len(data)} items) on first attempt")
-            return data if expect_array else {"data": data}
-        
-        print("[Ollama] First parse returned invalid data, attempting cleanup...")
+        timeout = OLLAMA_TIMEOUT if stop_at is None else max(0.01, min(OLLAMA_TIMEOUT, stop_at - time.monotonic()))
+        logger.debug("[Ollama] Streaming request to %s", url)
+        with http_pool.session("ollama").post(url, json=payload, headers=trace_headers(), timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if cancel is not None and cancel.is_set():
+                    LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome="cancelled")
+                    logger.info("[Ollama] %s cancelled, closing the connection", task or "call")
+                    return
+                if stop_at is not None and time.monotonic() > stop_at:
+                    LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome="deadline")
+                    logger.warning("[Ollama] %s passed its deadline, closing the connection", task or "call")
+                    raise DeadlineExceeded()
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                yield chunk
+                if chunk.get("done"):
+                    wall = time.perf_counter() - start
+                    LLM_REQUEST_SECONDS.observe(wall, outcome="ok")
+                    _record_result(chunk, wall, task, model)
+                    return
+    except DeadlineExceeded:
+        raise
+    except requests.exceptions.ConnectionError:
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome="unavailable")
+        logger.error("[Ollama] ERROR: Could not connect to Ollama. Is it running?")
+        raise HTTPException(status_code=503, detail="Ollama is not running. Please start Ollama.")
+    except requests.exceptions.Timeout:
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome="timeout")
+        if stop_at is not None and time.monotonic() >= stop_at:
+            raise DeadlineExceeded()
+        logger.error("[Ollama] ERROR: Request timed out")
+        raise HTTPException(status_code=504, detail="Ollama did not respond in time.")
+    except GeneratorExit:
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome="closed")
+        raise
     except Exception as e:
-        print(f"[Ollama] First attempt failed: {str(e)}, attempting cleanup...")
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome="error")
+        logger.error("[Ollama] ERROR: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _stream_ollama(
+    messages: Messages,
+    url: str = OLLAMA_API_URL,
+    model: str = MODEL_NAME,
+    task: str = "",
+    stop_at: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Iterator[str]:
+    """Yield response text from Ollama as tokens are generated (see _ollama_chunks)."""
+    with closing(_ollama_chunks(messages, url, model, task, stop_at, cancel)) as chunks:
+        for chunk in chunks:
+            text = (chunk.get("message") or {}).get("content")
+            if text:
+                yield text
+
+# Fields a complete structured answer has, used to score quality per route
+TASK_FIELDS = {
+    ANALYSIS: ["ats_score", "missing_keywords", "strengths", "improvements"],
+    MATCHING: ["title", "company", "match_score", "reasoning"],
+    DIGEST: ["headline", "years_experience", "skills", "roles", "achievements"],
+}
+
+def _record_route(task: str, model: str, outcome: str, start: float) -> None:
+    LLM_ROUTE_SECONDS.observe(time.perf_counter() - start, task=task, model=model, outcome=outcome)
+
+def _response_quality(task: str, data) -> float:
+    fields = TASK_FIELDS.get(task, [])
+    if isinstance(data, list):
+        scores = [_calculate_confidence(item, fields) for item in data if isinstance(item, dict)]
+        return sum(scores) / len(scores) if scores else 0.0
+    return _calculate_confidence(data, fields)
+
+async def call_llm_safe(messages: Messages, expect_array: bool = False, task: Optional[str] = None) -> dict:
+    """Safely call LLM with JSON parsing and local repair on failure.
     
-    # Second attempt with cleanup
-    try:
-        response_text = _call_ollama_with_retry(prompt)
-        
-        # Clean the response
-        cleaned = response_text.strip()
-        if cleaned.startswith("```json"):
-            cleaned = cleaned[7:]
-        elif cleaned.startswith("```"):
-            cleaned = cleaned[3:]
-        if cleaned.endswith("```"):
-            cleaned = cleaned[:-3]
-        cleaned = cleaned.strip()
+    Behavior:
+    1. Call the task's primary model (transport errors are retried by _call_ollama_with_retry).
+    2. Parse JSON; on failure repair the same response locally
+       (fences, prose, bad escapes, trailing commas, truncation).
+    3. If the call fails, the JSON cannot be repaired, or its quality is
+       below LLM_MIN_QUALITY, try the task's next model, if any.
+    4. Otherwise return {"error": "llm_failed"} or {"error": "parse_failed"}.
+    With a single model per task a malformed response never costs a second
+    generation. A 503 (Ollama down or overloaded) is raised so the client
+    sees it and backs off, as is a 504 once the request deadline passes.
+    """
+    task = task or (MATCHING if expect_array else ANALYSIS)
+    llm_task.set(task)
+    models = models_for(task)
+    cache_key = None
+    if LLM_CACHE_TTL > 0:
+        cache_key = hashlib.sha256(json.dumps([task, models, expect_array, messages]).encode()).hexdigest()
+        cached = _llm_cache.get(cache_key)
+        if cached is not None:
+            logger.info("[Ollama] Cache hit for %s", task)
+            return cached
+    fallback = {"error": "llm_failed"}
+    
+    for i, model in enumerate(models):
+        if i > 0:
+            LLM_RETRIES.inc(stage="model_fallback")
+            logger.info("[Ollama] Falling back to %s for %s", model, task)
+        logger.info("[Ollama] Calling %s for %s with safe JSON parsing...", model, task)
+        start = time.perf_counter()
         
-        # Remove invalid escape sequences
-        import re as regex_module
-        sanitized = regex_module.sub(r'\\(?!["\\/bfnrtu])', '', cleaned)
+        try:
+            response_text = await _call_ollama_with_retry(messages, model=model)
+        except HTTPException as e:
+            _record_route(task, model, "error", start)
+            if e.status_code == 503 or isinstance(e, DeadlineExceeded):
+                raise
+            logger.warning("[Ollama] LLM call failed: %s", e.detail)
+            continue
+        except Exception as e:
+            _record_route(task, model, "error", start)
+            logger.warning("[Ollama] LLM call failed: %s", e)
+            continue
         
-        data = json.loads(sanitized)
+        data, ok = _parse_llm_json(response_text, expect_array)
+        if ok and isinstance(data, list) and not expect_array:
+            data = {"data": data}
+        if not ok or not isinstance(data, (dict, list)) or (isinstance(data, dict) and "error" in data):
+            _record_route(task, model, "parse_failed", start)
+            logger.warning("[Ollama] WARNING: %s returned unparseable JSON", model)
+            if "error" in fallback:
+                fallback = {"error": "parse_failed"}
+            continue
         
-        if isinstance(data, dict) and "error" not in data:
-            print("[Ollama] JSON parsed successfully after cleanup")
-            return data
-        elif isinstance(data, list):
-            print(f"[Ollama] JSON parsed as array ({len(data)} items) after cleanup")
-            return data if expect_array else {"data": data}
+        quality = _response_quality(task, data)
+        LLM_ROUTE_QUALITY.observe(quality, task=task, model=model)
+        if quality < MIN_QUALITY and i + 1 < len(models):
+            _record_route(task, model, "low_quality", start)
+            logger.info("[Ollama] %s answer quality %.2f below %.2f", model, quality, MIN_QUALITY)
+            fallback = data
+            continue
         
-        print("[Ollama] Cleanup parse returned invalid data")
-    except Exception as e:
-        print(f"[Ollama] Cleanup attempt also failed: {str(e)}")
+        _record_route(task, model, "ok", start)
+        logger.info("[Ollama] JSON parsed successfully (%s)", "array of %s" % len(data) if isinstance(data, list) else "object")
+        if cache_key is not None:
+            _llm_cache.set(cache_key, data)
+        return data
     
-    # Return error dict if both attempts fail
-    print("[Ollama] WARNING: Returning parse_failed error")
-    return {"error": "parse_failed"}
+    if "error" in fallback:
+        logger.warning("[Ollama] WARNING: Returning %s error", fallback["error"])
+    return fallback
+
+async def _generate_text(messages: Messages, task: str) -> str:
+    """Free-text generation routed by task; the next model is tried on failure or an empty answer."""
+    llm_task.set(task)
+    models = models_for(task)
+    for i, model in enumerate(models):
+        last = i + 1 == len(models)
+        if i > 0:
+            LLM_RETRIES.inc(stage="model_fallback")
+            logger.info("[Ollama] Falling back to %s for %s", model, task)
+        start = time.perf_counter()
+        try:
+            text = await _call_ollama_with_retry(messages, model=model)
+        except HTTPException as e:
+            _record_route(task, model, "error", start)
+            if e.status_code == 503 or isinstance(e, DeadlineExceeded) or last:
+                raise
+            logger.warning("[Ollama] %s failed for %s: %s", model, task, e.detail)
+            continue
+        if text.strip() or last:
+            _record_route(task, model, "ok" if text.strip() else "empty", start)
+            return text
+        _record_route(task, model, "empty", start)
+    return ""
 
 def _calculate_confidence(data: dict, expected_fields: list) -> float:
     """Calculate confidence score based on response completeness and quality."""
@@ -220,31 +564,51 @@ def _calculate_confidence(data: dict, expected_fields: list) -> float:
     confidence = 0.5 + (field_ratio * 0.3) + content_bonus
     return min(1.0, max(0.0, confidence))
 
-async def analyze_resume(resume_text: str, job_description: str) -> AnalyzeResumeResponse:
-    print("[Ollama] Starting resume analysis")
-    
-    prompt = f"""You are an ATS (Applicant Tracking System) expert. Analyze the resume against the job description.
-
-Resume:
-{resume_text}
-
-Job Description:
-{job_description}
-
-Provide a JSON response with exactly these fields:
-- ats_score: number between 0-100
-- missing_keywords: array of strings (specific keywords from job description not in resume)
-- strengths: array of strings (what matches well)
-- improvements: array of strings (specific actionable improvements)
+async def _generate_digest(resume_text: str) -> Optional[dict]:
+    with span("prompt"):
+        messages = digest_messages(resume_text)
+    data = await call_llm_safe(messages, expect_array=False, task=DIGEST)
+    if "error" in data:
+        logger.warning("[Ollama] Resume digest failed: %s", data["error"])
+        return None
+    return {
+        "headline": str(data.get("headline", "")),
+        "years_experience": data.get("years_experience") or 0,
+        **{key: [str(v) for v in data.get(key) or [] if v] for key in ("skills", "roles", "achievements", "education")},
+    }
 
-Return ONLY valid JSON, no markdown formatting."""
+async def _resume_for(task: str, resume_text: str) -> str:
+    """What a prompt for `task` gets as the resume: the cached digest when enabled, else the raw text."""
+    if task not in RESUME_DIGEST_TASKS or len(resume_text) < RESUME_DIGEST_MIN_CHARS:
+        return resume_text
+    try:
+        with span("digest"):
+            digest = await get_digest(resume_text, lambda: _generate_digest(resume_text))
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.warning("[Ollama] No resume digest (%s), using the full resume", getattr(e, "detail", e))
+        return resume_text
+    if not digest:
+        return resume_text
+    text = format_digest(digest)
+    logger.debug("[Ollama] Using resume digest for %s: %s -> %s chars", task, len(resume_text), len(text))
+    return text
+
+async def analyze_resume(resume_text: str, job_description: str, use_digest: bool = True) -> AnalyzeResumeResponse:
+    logger.info("[Ollama] Starting resume analysis")
+    if use_digest:
+        resume_text = await _resume_for(ANALYSIS, resume_text)
+    
+    with span("prompt"):
+        messages = analysis_messages(resume_text, job_description)
 
     # Use safe LLM wrapper for robust JSON parsing
-    data = call_llm_safe(prompt, expect_array=False)
+    data = await call_llm_safe(messages, expect_array=False, task=ANALYSIS)
     
     # Handle parse failure
     if "error" in data:
-        print(f"[Ollama] Resume analysis failed: {data['error']}")
+        logger.warning("[Ollama] Resume analysis failed: %s", data['error'])
         return AnalyzeResumeResponse(
             ats_score=0.0,
             missing_keywords=[],
@@ -258,7 +622,7 @@ Return ONLY valid JSON, no markdown formatting."""
         # Calculate confidence score
         expected_fields = ["ats_score", "missing_keywords", "strengths", "improvements"]
         confidence = _calculate_confidence(data, expected_fields)
-        print(f"[Ollama] Analysis confidence: {confidence:.2f}")
+        logger.info("[Ollama] Analysis confidence: %.2f", confidence)
         
         return AnalyzeResumeResponse(
             ats_score=float(data.get("ats_score", 0)),
@@ -268,7 +632,7 @@ Return ONLY valid JSON, no markdown formatting."""
             confidence=confidence
         )
     except Exception as e:
-        print(f"[Ollama] Error creating response: {str(e)}")
+        logger.error("[Ollama] Error creating response: %s", e)
         # Return safe defaults instead of crashing
         return AnalyzeResumeResponse(
             ats_score=0.0,
@@ -278,202 +642,219 @@ Return ONLY valid JSON, no markdown formatting."""
             confidence=0.0
         )
 
+def _to_match_result(item) -> Optional[MatchJobResult]:
+    """Build a MatchJobResult from one parsed array item, or None if it is unusable."""
+    try:
+        # Calculate confidence based on match quality
+        expected_fields = ["title", "company", "match_score", "reasoning"]
+        confidence = _calculate_confidence(item, expected_fields)
+        
+        # Adjust confidence based on reasoning length (longer = more confident)
+        reasoning = str(item.get("reasoning", ""))
+        if len(reasoning) > 50:
+            confidence = min(1.0, confidence + 0.1)
+        
+        return MatchJobResult(
+            title=str(item.get("title", "Unknown")),
+            company=str(item.get("company", "Unknown")),
+            match_score=float(item.get("match_score", 0)),
+            reasoning=reasoning,
+            confidence=confidence
+        )
+    except Exception as e:
+        logger.error("[Ollama] Error parsing job result: %s", e)
+        return None
+
 async def match_jobs(resume_text: str, jobs: list) -> list:
-    print(f"[Ollama] Matching {len(jobs)} jobs in one request")
-    
-    jobs_text = ""
-    for i, job in enumerate(jobs):
-        jobs_text += f"Job {i+1}:\nTitle: {job['title']}\nCompany: {job.get('company', 'Unknown')}\nDescription: {job['description']}\n\n"
-    
-    prompt = f"""You are a job matching expert. Analyze the resume against the following list of jobs and return ONLY a JSON array.
-
-Resume:
-{resume_text}
-
-Jobs List:
-{jobs_text}
-
-IMPORTANT: You MUST return ONLY a JSON array. No explanations, no markdown, no text before or after.
-
-For each job, create an object with these EXACT keys:
-- title: string (exact job title from list)
-- company: string (exact company name from list)
-- match_score: number (0-100)
-- reasoning: string (2-3 sentences, NO quotes inside, NO backslashes)
-
-JSON FORMATTING RULES:
-1. Return ONLY the JSON array, nothing else
-2. Start with [ and end with ]
-3. No markdown code blocks (no ```)
-4. No comments
-5. No trailing commas
-6. Use double quotes for strings
-7. Do NOT use backslash characters
-8. Do NOT escape quotes in reasoning text
-9. Keep reasoning simple and plain
-
-EXAMPLE FORMAT:
-[
-  {{
-    "title": "Software Engineer",
-    "company": "Tech Corp",
-    "match_score": 85,
-    "reasoning": "Strong match with required Python and React skills. Has 3 years experience."
-  }},
-  {{
-    "title": "Data Analyst",
-    "company": "Data Inc",
-    "match_score": 60,
-    "reasoning": "Some relevant skills but lacks SQL experience. Good analytical background."
-  }}
-]
-
-Return ONLY the JSON array for all {len(jobs)} jobs. Start your response with [ and end with ]."""
+    logger.info("[Ollama] Matching %s jobs in one request", len(jobs))
+    resume = await _resume_for(MATCHING, resume_text)
+    with span("prompt"):
+        messages = match_messages(resume, jobs)
 
     # Use safe LLM wrapper for robust JSON parsing
-    data = call_llm_safe(prompt, expect_array=True)
+    data = await call_llm_safe(messages, expect_array=True, task=MATCHING)
     
     # Handle parse failure
     if "error" in data:
-        print(f"[Ollama] Job matching failed: {data['error']}")
+        logger.warning("[Ollama] Job matching failed: %s", data['error'])
         return []
     
     if not isinstance(data, list):
-        print(f"[Ollama] Warning: Expected array but got {type(data)}")
+        logger.warning("[Ollama] Warning: Expected array but got %s", type(data))
         return []
     
-    results = []
-    for item in data:
-        try:
-            # Calculate confidence based on match quality
-            expected_fields = ["title", "company", "match_score", "reasoning"]
-            confidence = _calculate_confidence(item, expected_fields)
-            
-            # Adjust confidence based on reasoning length (longer = more confident)
-            reasoning = str(item.get("reasoning", ""))
-            if len(reasoning) > 50:
-                confidence = min(1.0, confidence + 0.1)
-            
-            results.append(MatchJobResult(
-                title=str(item.get("title", "Unknown")),
-                company=str(item.get("company", "Unknown")),
-                match_score=float(item.get("match_score", 0)),
-                reasoning=reasoning,
-                confidence=confidence
-            ))
-        except Exception as e:
-            print(f"[Ollama] Error parsing job result: {str(e)}")
-            continue
+    results = [r for r in map(_to_match_result, data) if r is not None]
     
-    print(f"[Ollama] Successfully parsed {len(results)} job matches with avg confidence: {sum(r.confidence for r in results) / len(results):.2f}" if results else "[Ollama] No results parsed")
+    if results:
+        logger.info("[Ollama] Successfully parsed %s job matches with avg confidence: %.2f", len(results), sum(r.confidence for r in results) / len(results))
+    else:
+        logger.info("[Ollama] No results parsed")
     return results
 
+async def match_jobs_stream(resume_text: str, jobs: list) -> AsyncIterator[MatchJobResult]:
+    """Like match_jobs, but yields each result as soon as the model closes its object."""
+    logger.info("[Ollama] Streaming matches for %s jobs", len(jobs))
+    parser = ArrayItemStream()
+    count = 0
+    resume = await _resume_for(MATCHING, resume_text)
+    with span("prompt"):
+        messages = match_messages(resume, jobs)
+    # No mid-stream fallback: results already sent cannot be replaced
+    model = models_for(MATCHING)[0]
+    scores = []
+    cancel = threading.Event()
+    async with _ollama_slot(messages, model=model) as backend:
+        start = time.perf_counter()
+        tokens = _stream_ollama(messages, backend.url(OLLAMA_CHAT_PATH), model, MATCHING, deadline.get(), cancel)
+        try:
+            # The HTTP read blocks, so each next() runs in the threadpool
+            async for text in iterate_in_threadpool(tokens):
+                for item in parser.feed(text):
+                    result = _to_match_result(item)
+                    if result is not None:
+                        count += 1
+                        scores.append(_calculate_confidence(item, TASK_FIELDS[MATCHING]))
+                        yield result
+                if parser.done:
+                    break
+        finally:
+            try:
+                tokens.close()
+            except ValueError:
+                # Still running in a worker thread (client went away mid-read):
+                # it stops at the next token
+                cancel.set()
+            logger.info("[Ollama] Streamed %s job matches", count)
+        OLLAMA_LIMITER.on_success(time.perf_counter() - start)
+        _record_route(MATCHING, model, "ok", start)
+        if scores:
+            LLM_ROUTE_QUALITY.observe(sum(scores) / len(scores), task=MATCHING, model=model)
+
 async def generate_cover_letter(resume_text: str, job_description: str, company: str) -> GenerateCoverLetterResponse:
-    print(f"[Ollama] Generating cover letter for {company}")
+    logger.info("[Ollama] Generating cover letter for %s", company)
     
-    prompt = f"""Write a professional cover letter based on this resume and job.
-
-Resume:
-{resume_text}
-
-Job Description:
-{job_description}
-
-Company: {company}
-
-Write a compelling, personalized cover letter in professional business format. Include:
-- Proper greeting
-- Strong opening paragraph
-- 2-3 body paragraphs highlighting relevant experience
-- Strong closing
-- Professional sign-off
-
-Return ONLY the cover letter text, no JSON or markdown formatting."""
+    resume = await _resume_for(COVER_LETTER, resume_text)
+    with span("prompt"):
+        messages = cover_letter_messages(resume, job_description, company)
 
-    response_text = _call_ollama(prompt)
+    response_text = await _generate_text(messages, COVER_LETTER)
     
-    print(f"[Ollama] Cover letter generated: {len(response_text)} chars")
+    logger.info("[Ollama] Cover letter generated: %s chars", len(response_text))
     
     return GenerateCoverLetterResponse(cover_letter=response_text.strip())
 
-async def optimize_resume(resume_text: str, job_description: str) -> OptimizeResumeResponse:
-    print("[Ollama] Starting resume optimization with keyword injection")
+def _clean_section(text: str) -> str:
+    """Drop the code fences models sometimes wrap a rewritten section in."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return text.strip()
+
+async def _optimize_sections(resume_text: str, job_description: str, keywords: List[str]) -> Tuple[str, List[SectionChange]]:
+    """Rewrite only the sections the missing keywords fit, concurrently; the rest is kept verbatim.
+
+    Wall time is that of the longest section rather than the whole resume.
+    Falls back to a whole-resume rewrite when no section can take a keyword
+    (e.g. a resume without recognisable headings).
+    """
+    sections = split_sections(resume_text)
+    assigned = assign_keywords(sections, keywords, job_description)
+    # One rewrite per assigned section, on top of the two analyses the route paid for
+    charge_client(len(assigned) or 1)
+    if not assigned:
+        logger.info("[Ollama] No resume section matches the missing keywords; rewriting the whole resume")
+        keywords_text = ", ".join(keywords) if keywords else "general job requirements"
+        with span("prompt"):
+            messages = rewrite_messages(resume_text, job_description, keywords_text)
+        return await _generate_text(messages, REWRITE), []
+
+    logger.info("[Ollama] Rewriting %s of %s resume sections concurrently", len(assigned), len(sections))
+    # More at once than the per-client queue holds would get this request's own calls rejected
+    gate = asyncio.Semaphore(max(1, OLLAMA_LIMITER.max_queue_per_client))
+
+    async def rewrite(i: int) -> str:
+        async with gate:
+            with span("prompt"):
+                messages = section_rewrite_messages(job_description, ", ".join(assigned[i]), sections[i].title, sections[i].body)
+            return await _generate_text(messages, REWRITE)
+
+    order = list(assigned)
+    results = await asyncio.gather(*(rewrite(i) for i in order), return_exceptions=True)
+    rewritten = {}
+    for i, result in zip(order, results):
+        if isinstance(result, DeadlineExceeded) or (isinstance(result, HTTPException) and result.status_code == 503):
+            raise result
+        if isinstance(result, BaseException):
+            logger.warning("[Ollama] Rewrite of %s failed, keeping it as written: %s", sections[i].title, result)
+            continue
+        text = _clean_section(result)
+        if text:
+            rewritten[i] = text
+
+    parts, changes = [], []
+    for i, section in enumerate(sections):
+        new_body = rewritten.get(i, section.body)
+        parts.append(new_body + section.trailing)
+        if section.kind == "heading":
+            continue
+        changed = new_body != section.body
+        changes.append(SectionChange(
+            section=section.title,
+            kind=section.kind,
+            changed=changed,
+            keywords=assigned.get(i, []),
+            diff=section_diff(section.body, new_body, section.title) if changed else "",
+        ))
+    return "".join(parts), changes
+
+async def optimize_resume(resume_text: str, job_description: str, mode: str = "full") -> OptimizeResumeResponse:
+    logger.info("[Ollama] Starting resume optimization with keyword injection (%s)", mode)
     
     # Step 1: Analyze current resume to identify missing keywords
-    print("[Ollama] Step 1: Analyzing current resume to identify gaps")
+    logger.info("[Ollama] Step 1: Analyzing current resume to identify gaps")
     try:
-        current_analysis = await analyze_resume(resume_text, job_description)
+        # Raw text: the rewrite targets keywords missing from the actual wording
+        current_analysis = await analyze_resume(resume_text, job_description, use_digest=False)
         missing_keywords = current_analysis.missing_keywords
         current_score = current_analysis.ats_score
-        print(f"[Ollama] Current score: {current_score}, Missing {len(missing_keywords)} keywords")
+        logger.info("[Ollama] Current score: %s, Missing %s keywords", current_score, len(missing_keywords))
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[Ollama] Analysis error: {str(e)}, proceeding with general optimization")
+        logger.warning("[Ollama] Analysis error: %s, proceeding with general optimization", e)
         missing_keywords = []
         current_score = 0
     
     # Step 2: Generate optimized resume with targeted keyword injection
     keywords_text = ", ".join(missing_keywords[:10]) if missing_keywords else "general job requirements"
+    sections = []
     
-    optimize_prompt = f"""You are an expert resume writer and ATS optimization specialist. Your task is to improve the following resume to better match the job description while maintaining complete honesty and factual accuracy.
-
-Resume:
-{resume_text}
-
-Job Description:
-{job_description}
-
-CRITICAL MISSING KEYWORDS TO INJECT:
-{keywords_text}
-
-OPTIMIZATION STRATEGY - KEYWORD INJECTION:
-1. Identify existing experiences where these keywords naturally fit
-2. Rewrite bullet points to incorporate missing keywords organically
-3. Add these keywords to skills section if not present (only if they can be reasonably inferred from experience)
-4. Enhance professional summary to include relevant keywords
-5. Use synonyms and related terms for variety
-6. Ensure keywords appear in context, not just as a list
-
-IMPORTANT RULES:
-1. DO NOT invent or fabricate any experience, skills, or qualifications
-2. Only enhance and reframe existing information
-3. Naturally incorporate missing keywords into existing experience descriptions
-4. Improve bullet points for clarity and impact using action verbs
-5. If a keyword cannot be honestly incorporated, skip it
-6. Maintain the original resume structure and formatting
-7. Keep the tone professional and authentic
-8. Use quantifiable achievements where they already exist
-
-OPTIMIZATION TASKS:
-- Analyze the job description for key requirements and keywords
-- Identify WHERE in the existing resume each missing keyword could fit
-- Rewrite those specific sections to naturally include the keywords
-- Improve bullet point clarity (use strong action verbs, be specific)
-- Enhance the professional summary to highlight relevant experience with keywords
-- Add technical skills section if missing (only with honest skills)
-- Ensure all improvements are based on existing information only
-
-EXAMPLE KEYWORD INJECTION:
-Before: "Developed web applications for clients"
-After: "Developed responsive web applications using React and Node.js, implementing RESTful APIs and modern JavaScript frameworks to deliver scalable client solutions"
-
-Return ONLY the complete optimized resume text. Do not include any explanations, markdown formatting, or JSON."""
-
-    optimized_text = _call_ollama_with_retry(optimize_prompt)
-    print(f"[Ollama] Optimized resume generated: {len(optimized_text)} chars")
+    if mode == "sections":
+        optimized_text, sections = await _optimize_sections(resume_text, job_description, missing_keywords[:10])
+    else:
+        charge_client(1)
+        with span("prompt"):
+            optimize_messages = rewrite_messages(resume_text, job_description, keywords_text)
+        optimized_text = await _generate_text(optimize_messages, REWRITE)
+    logger.info("[Ollama] Optimized resume generated: %s chars", len(optimized_text))
     
     # Step 3: Use real ATS analysis for new score
-    print("[Ollama] Step 3: Calculating new ATS score using analyze_resume")
+    logger.info("[Ollama] Step 3: Calculating new ATS score using analyze_resume")
     try:
-        analysis_result = await analyze_resume(optimized_text, job_description)
+        analysis_result = await analyze_resume(optimized_text, job_description, use_digest=False)
         new_score = analysis_result.ats_score
         improvement = new_score - current_score
-        print(f"[Ollama] New ATS score: {new_score} (improvement: {improvement:+.1f})")
+        logger.info("[Ollama] New ATS score: %s (improvement: %+.1f)", new_score, improvement)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"[Ollama] Score analysis error: {str(e)}, using default score of 75")
+        logger.warning("[Ollama] Score analysis error: %s, using default score of 75", e)
         new_score = 75.0
     
     return OptimizeResumeResponse(
         optimized_resume=optimized_text.strip(),
         original_score=current_score,
-        new_score=new_score
+        new_score=new_score,
+        sections=sections,
     )
@@ -1,12 +1,37 @@
-from fastapi import FastAPI, HTTPException
+# First, so the startup report covers every import below
+from startup import REPORT, lifespan
+
+import logging
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from typing import List, Optional
 from dotenv import load_dotenv
 
-from adzuna_service import fetch_jobs
-from llm_service import analyze_resume, match_jobs, generate_cover_letter, optimize_resume
+REPORT.mark("import:framework")
+
+# The only place .env is read. Before the local imports: modules read their
+# configuration at import time
+load_dotenv()
+
+from adzuna_service import fetch_jobs, cached_jobs_digest, parse_countries
+from http_cache import weak_etag, etag_matches, not_modified
+from compression import CompressionMiddleware
+from responses import ORJSONResponse, dump_models, ndjson_line, sse_event, NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE
+from logging_config import setup_logging
+from metrics import REGISTRY, MetricsMiddleware
+from tracing import TracingMiddleware
+from profiling import ProfilingMiddleware
+from llm_service import analyze_resume, match_jobs, match_jobs_stream, generate_cover_letter, optimize_resume, check_llm_capacity
+from rate_limit import limit_llm
+from deadlines import request_deadline, until_disconnected
 from tracker_routes import router as tracker_router
-from auth_routes import router as auth_router
+from auth_routes import router as auth_router, is_admin_request
+from profile_routes import router as profile_router
+from saved_search_routes import router as saved_search_router
+from ws_routes import router as ws_router
+import semantic_search
 from models import (
     CleanedJob,
     AnalyzeResumeRequest,
@@ -17,52 +42,119 @@ from models import (
     GenerateCoverLetterResponse,
     OptimizeResumeRequest,
     OptimizeResumeResponse,
+    ResumeEmbeddingRequest,
+    ResumeEmbeddingResponse,
+    SemanticJob,
 )
 
-load_dotenv()
+REPORT.mark("import:app")
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
+# Schema check, HTTP pools and warm-ups run in the lifespan, not on import (see startup.py)
 app = FastAPI(
     title="AI Job Search API",
     description="AI-powered job search, resume analysis, and cover letter generation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+ALLOWED_ORIGINS = [
+    "http://localhost:5173",
+    "http://localhost:5174",
+    "http://localhost:5175",
+    "http://localhost:3000",
+]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5173",
-        "http://localhost:5174",
-        "http://localhost:5175",
-        "http://localhost:3000",
-    ],
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # The frontend can show the trace ID when reporting a slow request
+    expose_headers=["Server-Timing", "X-Trace-Id", "X-Profile-Id"],
 )
 
+# Compress large payloads (job lists with full descriptions); small bodies pass through
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+# Wraps compression, so latency includes it
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in sampling profiles (admin X-Profile header or PROFILE_SAMPLE_RATE), see profiling.py
+app.add_middleware(ProfilingMiddleware, authorize=is_admin_request)
+
+# Outermost: trace ID and Server-Timing breakdown per request, see tracing.py
+app.add_middleware(TracingMiddleware, timing_allow_origins=ALLOWED_ORIGINS)
+
 # Register routers
 app.include_router(auth_router)
 app.include_router(tracker_router)
+app.include_router(saved_search_router)
+app.include_router(profile_router)
+app.include_router(ws_router)
 
 @app.get("/")
 async def root():
+    """Liveness: the worker is up, warm or not."""
     return {"status": "ok", "message": "AI Job Intelligence & Career Readiness Platform"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 503 until the startup warm-ups are done; the body has the startup time report."""
+    return ORJSONResponse(REPORT.as_dict(), status_code=200 if REPORT.ready else 503)
+
+# Per-client token bucket on the Ollama-backed routes; cost = generations per call
+LLM_RATE_LIMIT = Depends(limit_llm(cost=1))
+
+# Time budget per LLM route (one generation, or three for the optimizer); clients
+# may ask for less with X-Request-Timeout. Abandoned work is cancelled, see deadlines.py
+LLM_DEADLINE = Depends(request_deadline(150))
+OPTIMIZE_DEADLINE = Depends(request_deadline(360))
+
+# Browsers may reuse a search for this long, then revalidate with If-None-Match
+JOBS_CACHE_CONTROL = "public, max-age=60"
+
+def _jobs_etag(digest: str, posted_within: Optional[str]) -> str:
+    return weak_etag("jobs", digest, posted_within or "")
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/jobs", response_model=List[CleanedJob])
 async def get_jobs(
+    request: Request,
     role: str,
     location: str = "",
     last_24: bool = False,
     experience_level: str = "",
     posted_within: Optional[str] = None,  # ✅ "24h", "7d", or None
+    countries: str = "",  # Adzuna country codes, e.g. "in,gb,us"; default ADZUNA_COUNTRIES
 ):
-    print(f"[GET /jobs] role={role}, location={location}, last_24={last_24}, experience_level={experience_level}, posted_within={posted_within}")
+    logger.info("[GET /jobs] role=%s, location=%s, last_24=%s, experience_level=%s, posted_within=%s, countries=%s", role, location, last_24, experience_level, posted_within, countries)
+    try:
+        country_codes = parse_countries(countries)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # Conditional GET: answer from the job cache without calling Adzuna
+    digest = cached_jobs_digest(role, location, last_24, experience_level, country_codes)
+    if digest:
+        etag = _jobs_etag(digest, posted_within)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            logger.info("[GET /jobs] Not modified")
+            return not_modified(etag, JOBS_CACHE_CONTROL)
+
     try:
         from datetime import datetime, timedelta, timezone
         
         # Fetch jobs from Adzuna
-        jobs = await fetch_jobs(role, location, last_24, experience_level)
-        print(f"[GET /jobs] Fetched {len(jobs)} jobs from Adzuna")
+        jobs = await fetch_jobs(role, location, last_24, experience_level, country_codes)
+        logger.info("[GET /jobs] Fetched %s jobs from Adzuna", len(jobs))
         
         # 🔥 LinkedIn-style Last 24 Hours filtering (strict)
         if last_24:
@@ -70,8 +162,9 @@ async def get_jobs(
             cutoff = now - timedelta(hours=24)
             filtered_jobs = []
             jobs_without_dates = []
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
             
-            print(f"[GET /jobs] 🔥 Applying strict 24-hour filter (cutoff: {cutoff})")
+            logger.info("[GET /jobs] 🔥 Applying strict 24-hour filter (cutoff: %s)", cutoff)
             
             for job in jobs:
                 # Check if job has created field
@@ -92,23 +185,23 @@ async def get_jobs(
                         created_dt = created_dt.replace(tzinfo=timezone.utc)
                     
                     # Only include if posted in last 24 hours
-                    if created_dt >= cutoff:
+                    included = created_dt >= cutoff
+                    if included:
                         filtered_jobs.append(job)
-                        print(f"[GET /jobs] ✅ Job '{getattr(job, 'title', 'Unknown')}' posted {(now - created_dt).total_seconds() / 3600:.1f}h ago - INCLUDED")
-                    else:
-                        print(f"[GET /jobs] ❌ Job '{getattr(job, 'title', 'Unknown')}' posted {(now - created_dt).total_seconds() / 3600:.1f}h ago - EXCLUDED")
+                    if debug_enabled:
+                        logger.debug("[GET /jobs] Job '%s' posted %.1fh ago - %s", getattr(job, 'title', 'Unknown'), (now - created_dt).total_seconds() / 3600, "INCLUDED" if included else "EXCLUDED")
                 except (ValueError, AttributeError, TypeError) as e:
                     # Include jobs with invalid timestamps at the end
-                    print(f"[GET /jobs] Warning: Failed to parse created date: {e}")
+                    logger.warning("[GET /jobs] Warning: Failed to parse created date: %s", e)
                     jobs_without_dates.append(job)
             
             # Add jobs without dates at the end (lower priority)
             if jobs_without_dates:
-                print(f"[GET /jobs] ⚠️ {len(jobs_without_dates)} jobs have no timestamp - adding at end")
+                logger.warning("[GET /jobs] ⚠️ %s jobs have no timestamp - adding at end", len(jobs_without_dates))
                 filtered_jobs.extend(jobs_without_dates)
             
             jobs = filtered_jobs
-            print(f"[GET /jobs] After 24h filter: {len(jobs)} jobs remain ({len(jobs) - len(jobs_without_dates)} with valid timestamps)")
+            logger.info("[GET /jobs] After 24h filter: %s jobs remain (%s with valid timestamps)", len(jobs), len(jobs) - len(jobs_without_dates))
         
         # ✅ Filter by posted_within if specified (7d option)
         elif posted_within:
@@ -117,10 +210,10 @@ async def get_jobs(
             
             if posted_within == "24h":
                 cutoff = now - timedelta(hours=24)
-                print(f"[GET /jobs] Filtering for jobs posted in last 24 hours (cutoff: {cutoff})")
+                logger.info("[GET /jobs] Filtering for jobs posted in last 24 hours (cutoff: %s)", cutoff)
             elif posted_within == "7d":
                 cutoff = now - timedelta(days=7)
-                print(f"[GET /jobs] Filtering for jobs posted in last 7 days (cutoff: {cutoff})")
+                logger.info("[GET /jobs] Filtering for jobs posted in last 7 days (cutoff: %s)", cutoff)
             
             if cutoff:
                 filtered_jobs = []
@@ -139,87 +232,158 @@ async def get_jobs(
                             filtered_jobs.append(job)
                     except (ValueError, AttributeError) as e:
                         # Include jobs with invalid timestamps by default
-                        print(f"[GET /jobs] Warning: Failed to parse created date for job: {e}")
+                        logger.warning("[GET /jobs] Warning: Failed to parse created date for job: %s", e)
                         filtered_jobs.append(job)
                 
                 jobs = filtered_jobs
-                print(f"[GET /jobs] After filtering: {len(jobs)} jobs remain")
+                logger.info("[GET /jobs] After filtering: %s jobs remain", len(jobs))
         
-        print(f"[GET /jobs] Successfully returning {len(jobs)} jobs")
-        return jobs
+        headers = {}
+        digest = cached_jobs_digest(role, location, last_24, experience_level, country_codes)
+        if digest:
+            headers["ETag"] = _jobs_etag(digest, posted_within)
+            headers["Cache-Control"] = JOBS_CACHE_CONTROL
+
+        logger.info("[GET /jobs] Successfully returning %s jobs", len(jobs))
+        return ORJSONResponse(dump_models(jobs), headers=headers)
     except Exception as e:
-        print(f"[GET /jobs] Error: {str(e)}")
+        logger.error("[GET /jobs] Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/analyze-resume", response_model=AnalyzeResumeResponse)
-async def post_analyze_resume(request: AnalyzeResumeRequest):
-    print(f"[POST /analyze-resume] Starting analysis")
+@app.post("/resumes", response_model=ResumeEmbeddingResponse, dependencies=[LLM_RATE_LIMIT, LLM_DEADLINE])
+async def post_resume(request: ResumeEmbeddingRequest):
+    """Embed a resume for /jobs/semantic. Only the embedding is stored, not the text."""
+    if not semantic_search.available():
+        raise HTTPException(status_code=503, detail="Semantic search is not available (numpy is not installed)")
+    resume_id = await semantic_search.embed_resume(request.resume_text)
+    logger.info("[POST /resumes] Stored embedding for %s", resume_id[:12])
+    return ResumeEmbeddingResponse(resume_id=resume_id)
+
+@app.get("/jobs/semantic", response_model=List[SemanticJob])
+async def get_semantic_jobs(resume_id: str, limit: int = Query(20, ge=1, le=100)):
+    """Stored jobs (every posting /jobs has fetched) ranked by similarity to a resume from POST /resumes."""
+    hits = await semantic_search.search(resume_id, limit)
+    if hits is None:
+        raise HTTPException(status_code=404, detail="Unknown resume_id; POST the resume to /resumes first")
+    logger.info("[GET /jobs/semantic] Returning %s jobs", len(hits))
+    return ORJSONResponse([{**job.model_dump(mode="json"), "similarity": round(score, 4)} for job, score in hits])
+
+@app.post("/analyze-resume", response_model=AnalyzeResumeResponse, dependencies=[LLM_RATE_LIMIT, LLM_DEADLINE])
+async def post_analyze_resume(request: AnalyzeResumeRequest, http_request: Request):
+    logger.info("[POST /analyze-resume] Starting analysis")
     try:
-        result = await analyze_resume(request.resume_text, request.job_description)
-        print(f"[POST /analyze-resume] ATS Score: {result.ats_score}")
+        result = await until_disconnected(http_request, analyze_resume(request.resume_text, request.job_description))
+        logger.info("[POST /analyze-resume] ATS Score: %s", result.ats_score)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[POST /analyze-resume] Error: {str(e)}")
+        logger.error("[POST /analyze-resume] Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/match-jobs", response_model=List[MatchJobResult])
-async def post_match_jobs(request: MatchJobsRequest):
-    print(f"[POST /match-jobs] Matching {len(request.jobs)} jobs")
+@app.post("/match-jobs", response_model=List[MatchJobResult], dependencies=[LLM_RATE_LIMIT, LLM_DEADLINE])
+async def post_match_jobs(request: MatchJobsRequest, http_request: Request):
+    logger.info("[POST /match-jobs] Matching %s jobs", len(request.jobs))
     try:
         jobs_dicts = [{"title": job.title, "description": job.description, "company": job.company} for job in request.jobs]
-        results = await match_jobs(request.resume_text, jobs_dicts)
-        print(f"[POST /match-jobs] Matched {len(results)} jobs")
-        return results
+        results = await until_disconnected(http_request, match_jobs(request.resume_text, jobs_dicts))
+        logger.info("[POST /match-jobs] Matched %s jobs", len(results))
+        return ORJSONResponse(dump_models(results))
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[POST /match-jobs] Error: {str(e)}")
+        logger.error("[POST /match-jobs] Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/match-single-job", response_model=MatchJobResult)
-async def post_match_single_job(request: MatchJobsRequest):
+@app.post("/match-jobs/stream", dependencies=[LLM_RATE_LIMIT, LLM_DEADLINE])
+async def post_match_jobs_stream(request: MatchJobsRequest, accept: str = Header(default="")):
+    """
+    Stream match results as the model scores each job.
+    NDJSON (one MatchJobResult per line) by default; server-sent events
+    ("match" per result, then "done") when the client accepts text/event-stream.
+    A failure after the stream has started is sent as an "error" item.
+    If the client disconnects, Starlette cancels the body and the Ollama
+    stream is closed.
+    """
+    logger.info("[POST /match-jobs/stream] Matching %s jobs", len(request.jobs))
+    jobs_dicts = [{"title": job.title, "description": job.description, "company": job.company} for job in request.jobs]
+    use_sse = SSE_MEDIA_TYPE in accept
+    # Refuse while Ollama is overloaded, before the 200 status line is sent
+    check_llm_capacity()
+
+    async def body():
+        count = 0
+        try:
+            async for result in match_jobs_stream(request.resume_text, jobs_dicts):
+                count += 1
+                item = result.model_dump(mode="json")
+                yield sse_event("match", item) if use_sse else ndjson_line(item)
+        except Exception as e:
+            logger.error("[POST /match-jobs/stream] Error: %s", e)
+            error = {"error": getattr(e, "detail", str(e))}
+            yield sse_event("error", error) if use_sse else ndjson_line(error)
+            return
+        logger.info("[POST /match-jobs/stream] Streamed %s matches", count)
+        if use_sse:
+            yield sse_event("done", {"count": count})
+
+    return StreamingResponse(
+        body(),
+        media_type=SSE_MEDIA_TYPE if use_sse else NDJSON_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/match-single-job", response_model=MatchJobResult, dependencies=[LLM_RATE_LIMIT, LLM_DEADLINE])
+async def post_match_single_job(request: MatchJobsRequest, http_request: Request):
     """Match a single job against a resume with detailed analysis."""
-    print(f"[POST /match-single-job] Matching single job")
+    logger.info("[POST /match-single-job] Matching single job")
     if len(request.jobs) != 1:
         raise HTTPException(status_code=400, detail="This endpoint accepts exactly one job")
     
     try:
         job = request.jobs[0]
         jobs_dicts = [{"title": job.title, "description": job.description, "company": job.company}]
-        results = await match_jobs(request.resume_text, jobs_dicts)
+        results = await until_disconnected(http_request, match_jobs(request.resume_text, jobs_dicts))
         
         if not results:
             raise HTTPException(status_code=500, detail="Failed to match job")
         
-        print(f"[POST /match-single-job] Match score: {results[0].match_score}")
+        logger.info("[POST /match-single-job] Match score: %s", results[0].match_score)
         return results[0]
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[POST /match-single-job] Error: {str(e)}")
+        logger.error("[POST /match-single-job] Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/generate-cover-letter", response_model=GenerateCoverLetterResponse)
-async def post_generate_cover_letter(request: GenerateCoverLetterRequest):
-    print(f"[POST /generate-cover-letter] Generating for {request.company}")
+@app.post("/generate-cover-letter", response_model=GenerateCoverLetterResponse, dependencies=[LLM_RATE_LIMIT, LLM_DEADLINE])
+async def post_generate_cover_letter(request: GenerateCoverLetterRequest, http_request: Request):
+    logger.info("[POST /generate-cover-letter] Generating for %s", request.company)
     try:
-        result = await generate_cover_letter(
+        result = await until_disconnected(http_request, generate_cover_letter(
             request.resume_text,
             request.job_description,
             request.company
-        )
-        print(f"[POST /generate-cover-letter] Generated {len(result.cover_letter)} chars")
+        ))
+        logger.info("[POST /generate-cover-letter] Generated %s chars", len(result.cover_letter))
         return result
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[POST /generate-cover-letter] Error: {str(e)}")
+        logger.error("[POST /generate-cover-letter] Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/generate-optimized-resume", response_model=OptimizeResumeResponse)
-async def post_generate_optimized_resume(request: OptimizeResumeRequest):
-    print(f"[POST /generate-optimized-resume] Starting optimization")
+# Two analyses up front; optimize_resume charges the rewrites (one, or one per section) once it knows them
+@app.post("/generate-optimized-resume", response_model=OptimizeResumeResponse, dependencies=[Depends(limit_llm(cost=2)), OPTIMIZE_DEADLINE])
+async def post_generate_optimized_resume(request: OptimizeResumeRequest, http_request: Request):
+    logger.info("[POST /generate-optimized-resume] Starting optimization")
     try:
-        result = await optimize_resume(request.resume_text, request.job_description)
+        result = await until_disconnected(http_request, optimize_resume(request.resume_text, request.job_description, request.mode))
         score_delta = result.new_score - result.original_score
-        print(f"[POST /generate-optimized-resume] Optimized resume: {len(result.optimized_resume)} chars, Score: {result.original_score} → {result.new_score} (Δ{score_delta:+.1f})")
+        logger.info("[POST /generate-optimized-resume] Optimized resume: %s chars, Score: %s → %s (Δ%+.1f)", len(result.optimized_resume), result.original_score, result.new_score, score_delta)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[POST /generate-optimized-resume] Error: {str(e)}")
+        logger.error("[POST /generate-optimized-resume] Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,369 @@
+"""
+Prometheus-style metrics rendered in the text exposition format.
+Deliberately dependency-free: counters, gauges and histograms with labels,
+a process-wide registry, and an ASGI middleware for per-route latency.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 150, 200)
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> str:
+        return f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> str:
+        with self._lock:
+            items = list(self._values.items())
+        return "".join(f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}\n" for k, v in items)
+
+
+class Gauge(_Metric):
+    """Gauge backed by a callback, evaluated at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[Tuple[str, ...], float]], labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+
+    def render(self) -> str:
+        return "".join(
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}\n"
+            for k, v in self._callback().items()
+        )
+
+
+class CounterFunc(Gauge):
+    """Monotonic counter read from a callback at scrape time."""
+
+    kind = "counter"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def render(self) -> str:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}\n")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}\n")
+            lines.append(f"{self.name}_count{labels} {series[-1]}\n")
+        return "".join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "".join(m.header() + m.render() for m in self._metrics.values())
+
+
+REGISTRY = Registry()
+
+# ── HTTP ────────────────────────────────────────────────
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"],
+))
+
+# ── Adzuna ──────────────────────────────────────────────
+
+ADZUNA_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "adzuna_request_duration_seconds", "Adzuna search API call latency", ["country", "outcome"],
+))
+ADZUNA_ERRORS = REGISTRY.register(Counter(
+    "adzuna_errors_total", "Adzuna call failures by kind", ["kind"],
+))
+
+# ── LLM (Ollama) ────────────────────────────────────────
+
+LLM_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds", "Wall time of one Ollama HTTP call", ["outcome"],
+))
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "llm_queue_wait_seconds", "Time before Ollama started work (wall time minus Ollama total_duration)",
+))
+LLM_TTFT_SECONDS = REGISTRY.register(Histogram(
+    "llm_time_to_first_token_seconds", "Model load plus prompt evaluation time reported by Ollama",
+))
+LLM_PROMPT_EVAL_SECONDS = REGISTRY.register(Histogram(
+    "llm_prompt_eval_seconds", "Prompt evaluation time reported by Ollama", ["task"],
+))
+LLM_PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "llm_prompt_eval_tokens", "Prompt tokens Ollama evaluated per request; drops when the prefix cache hits",
+    ["task"], buckets=(16, 64, 128, 256, 512, 1024, 2048, 4096, 8192),
+))
+LLM_GENERATION_SECONDS = REGISTRY.register(Histogram(
+    "llm_generation_seconds", "Token generation time reported by Ollama (eval_duration)",
+))
+LLM_TOKENS_PER_SECOND = REGISTRY.register(Histogram(
+    "llm_tokens_per_second", "Generation speed, eval_count / eval_duration", buckets=RATE_BUCKETS,
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens_total", "Tokens processed by Ollama", ["kind"],
+))
+LLM_JSON_PARSE = REGISTRY.register(Counter(
+    "llm_json_parse_total", "safe_json_parse outcomes by the strategy that succeeded", ["outcome"],
+))
+LLM_JSON_REPAIR_SECONDS = REGISTRY.register(Histogram(
+    "llm_json_repair_seconds", "Time spent in safe_json_parse",
+))
+LLM_RETRIES = REGISTRY.register(Counter(
+    "llm_retries_total", "Extra Ollama generations caused by retries", ["stage"],
+))
+LLM_ROUTE_SECONDS = REGISTRY.register(Histogram(
+    "llm_route_duration_seconds", "Time per task and model, including transport retries", ["task", "model", "outcome"],
+))
+LLM_ROUTE_QUALITY = REGISTRY.register(Histogram(
+    "llm_route_quality", "Confidence of structured answers per task and model", ["task", "model"],
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+))
+LLM_REJECTED = REGISTRY.register(Counter(
+    "llm_rejected_total", "LLM calls refused with 503 before reaching Ollama", ["reason"],
+))
+LLM_RATE_LIMITED = REGISTRY.register(Counter(
+    "llm_rate_limited_total", "LLM route calls refused with 429 by the per-client token bucket", ["kind"],
+))
+
+# ── WebSocket channel ───────────────────────────────────
+
+WS_OPERATION_SECONDS = REGISTRY.register(Histogram(
+    "ws_operation_duration_seconds", "Time per operation run over a WebSocket channel", ["op", "outcome"],
+))
+
+
+def register_ws_channels(channels) -> None:
+    """Expose the number of open channels and the operations running on them."""
+    REGISTRY.register(Gauge(
+        "ws_channels", "Open authenticated WebSocket channels",
+        lambda: {(): len(channels)},
+    ))
+    REGISTRY.register(Gauge(
+        "ws_operations_in_flight", "Operations running over WebSocket channels",
+        lambda: {(): sum(channel.in_flight for channel in list(channels))},
+    ))
+
+
+def register_llm_guard(limiter, pool) -> None:
+    """Expose the adaptive limiter and the per-host state of the Ollama pool."""
+    REGISTRY.register(Gauge(
+        "llm_concurrency_limit", "Current adaptive limit on in-flight Ollama calls",
+        lambda: {(): limiter.limit},
+    ))
+    REGISTRY.register(Gauge(
+        "llm_inflight", "Ollama calls in flight or waiting for a slot",
+        lambda: {("running",): limiter.inflight, ("queued",): limiter.queued}, ["state"],
+    ))
+    REGISTRY.register(Gauge(
+        "llm_backend_outstanding", "In-flight calls per Ollama host",
+        lambda: {(b.base_url,): b.outstanding for b in pool.backends}, ["backend"],
+    ))
+    REGISTRY.register(Gauge(
+        "llm_backend_healthy", "1 if the host passed its last health check",
+        lambda: {(b.base_url,): int(b.healthy) for b in pool.backends}, ["backend"],
+    ))
+    REGISTRY.register(CounterFunc(
+        "llm_backend_requests_total", "Calls routed to each Ollama host, by result",
+        lambda: {
+            key: value
+            for b in pool.backends
+            for key, value in (((b.base_url, "ok"), b.requests - b.failures), ((b.base_url, "failed"), b.failures))
+        },
+        ["backend", "result"],
+    ))
+    REGISTRY.register(Gauge(
+        "llm_circuit_state", "1 for each host's current circuit breaker state",
+        lambda: {
+            (b.base_url, state): int(b.breaker.state == state)
+            for b in pool.backends
+            for state in ("closed", "open", "half_open")
+        },
+        ["backend", "state"],
+    ))
+
+
+# ── Caches ──────────────────────────────────────────────
+
+_caches: Dict[str, object] = {}
+
+
+def register_cache(name: str, cache) -> None:
+    """Expose hit/miss counters of an object with `hits` and `misses` attributes."""
+    _caches[name] = cache
+
+
+def _cache_requests() -> Dict[Tuple[str, ...], float]:
+    values = {}
+    for name, cache in _caches.items():
+        values[(name, "hit")] = cache.hits
+        values[(name, "miss")] = cache.misses
+    return values
+
+
+def _cache_hit_ratio() -> Dict[Tuple[str, ...], float]:
+    values = {}
+    for name, cache in _caches.items():
+        total = cache.hits + cache.misses
+        values[(name,)] = cache.hits / total if total else 0.0
+    return values
+
+
+REGISTRY.register(CounterFunc("cache_requests_total", "Cache lookups by result", _cache_requests, ["cache", "result"]))
+REGISTRY.register(Gauge("cache_hit_ratio", "Cache hits / lookups", _cache_hit_ratio, ["cache"]))
+
+
+# ── Helpers ─────────────────────────────────────────────
+
+def ollama_queue_wait(result: dict, wall_seconds: float) -> Optional[float]:
+    """Time the request spent waiting before Ollama started on it, if Ollama reported timings."""
+    total = result.get("total_duration")
+    return max(0.0, wall_seconds - total / 1e9) if total else None
+
+
+def record_ollama_stats(result: dict, wall_seconds: float, task: str = "") -> None:
+    """Record the timing fields Ollama returns with the final response (nanoseconds)."""
+    total = result.get("total_duration")
+    load = result.get("load_duration") or 0
+    prompt_eval = result.get("prompt_eval_duration") or 0
+    eval_duration = result.get("eval_duration") or 0
+    eval_count = result.get("eval_count") or 0
+
+    if total:
+        LLM_QUEUE_WAIT_SECONDS.observe(ollama_queue_wait(result, wall_seconds))
+        LLM_TTFT_SECONDS.observe((load + prompt_eval) / 1e9)
+    if prompt_eval:
+        LLM_PROMPT_EVAL_SECONDS.observe(prompt_eval / 1e9, task=task)
+    if "prompt_eval_count" in result:
+        LLM_PROMPT_TOKENS.observe(result["prompt_eval_count"], task=task)
+    if eval_duration:
+        LLM_GENERATION_SECONDS.observe(eval_duration / 1e9)
+        if eval_count:
+            LLM_TOKENS_PER_SECOND.observe(eval_count / (eval_duration / 1e9))
+    LLM_TOKENS.inc(result.get("prompt_eval_count") or 0, kind="prompt")
+    LLM_TOKENS.inc(eval_count, kind="generated")
+
+
+class MetricsMiddleware:
+    """Per-route latency histogram. Uses the route template, not the raw path."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route: Optional[str] = getattr(scope.get("route"), "path", None)
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route or "unmatched",
+                status=str(status["code"]),
+            )
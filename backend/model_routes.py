@@ -0,0 +1,47 @@
+"""
+Task-aware model routing: which Ollama model serves which kind of request.
+
+Short structured tasks (ATS analysis, job scoring, resume digests) can run
+on a small, fast model while long-form writing stays on the large one. Each task has
+an ordered list of models; the next one is tried when a model fails or
+its answer is below LLM_MIN_QUALITY.
+
+Environment:
+  OLLAMA_MODEL     default model for every task (default llama3)
+  LLM_MODELS       per-task routes, fallbacks separated by "|", e.g.
+                   "analysis=llama3.2:3b|llama3,matching=llama3.2:3b|llama3,cover_letter=llama3"
+  LLM_MIN_QUALITY  lowest acceptable confidence for structured tasks (default 0.85,
+                   i.e. at least half of the expected fields filled in)
+"""
+
+import os
+from typing import Dict, List
+
+ANALYSIS = "analysis"
+MATCHING = "matching"
+COVER_LETTER = "cover_letter"
+REWRITE = "rewrite"
+DIGEST = "digest"
+TASKS = (ANALYSIS, MATCHING, COVER_LETTER, REWRITE, DIGEST)
+
+DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+MIN_QUALITY = float(os.getenv("LLM_MIN_QUALITY", "0.85"))
+
+
+def parse_routes(spec: str, default_model: str = DEFAULT_MODEL) -> Dict[str, List[str]]:
+    routes = {task: [default_model] for task in TASKS}
+    for item in spec.split(","):
+        task, sep, models = item.partition("=")
+        task = task.strip()
+        chain = [m.strip() for m in models.split("|") if m.strip()]
+        if sep and task in routes and chain:
+            routes[task] = chain
+    return routes
+
+
+ROUTES = parse_routes(os.getenv("LLM_MODELS", ""))
+
+
+def models_for(task: str) -> List[str]:
+    """Models to try for a task, primary first."""
+    return ROUTES.get(task) or [DEFAULT_MODEL]
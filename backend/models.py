@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 class CleanedJob(BaseModel):
     title: str
@@ -9,6 +9,16 @@ class CleanedJob(BaseModel):
     apply_link: str
     created: Optional[str] = None  # Add created field for filtering
     id: Optional[str] = None  # Add id field for unique identification
+    country: Optional[str] = None  # Adzuna country code the job was found in
+
+class SemanticJob(CleanedJob):
+    similarity: float  # cosine similarity to the resume, -1..1
+
+class ResumeEmbeddingRequest(BaseModel):
+    resume_text: str = Field(..., min_length=1)
+
+class ResumeEmbeddingResponse(BaseModel):
+    resume_id: str
 
 class AnalyzeResumeRequest(BaseModel):
     resume_text: str = Field(..., min_length=1)
@@ -48,8 +58,18 @@ class GenerateCoverLetterResponse(BaseModel):
 class OptimizeResumeRequest(BaseModel):
     resume_text: str = Field(..., min_length=1)
     job_description: str = Field(..., min_length=1)
+    # "sections": rewrite only the sections the missing keywords fit, concurrently
+    mode: Literal["full", "sections"] = "full"
+
+class SectionChange(BaseModel):
+    section: str  # e.g. "Summary", "Experience 2: Data Analyst, Acme Corp"
+    kind: str  # summary, skills, experience, projects, ...
+    changed: bool
+    keywords: List[str] = Field(default_factory=list)  # keywords this section was asked to cover
+    diff: str = ""  # unified diff of the section; empty when unchanged
 
 class OptimizeResumeResponse(BaseModel):
     optimized_resume: str
     original_score: float = Field(..., ge=0, le=100)
     new_score: float = Field(..., ge=0, le=100)
+    sections: List[SectionChange] = Field(default_factory=list)  # only in "sections" mode
@@ -0,0 +1,168 @@
+"""
+Pool of Ollama hosts behind one API.
+
+Each call goes to a backend chosen by:
+  1. availability: circuit breaker closed (or ready for a half-open probe),
+     preferring hosts that passed their last health check;
+  2. prompt-prefix affinity: rendezvous hashing on the start of the prompt
+     (for chat messages: the system prompt plus the start of the user
+     message), so repeated prompts for the same resume/task land on the host
+     that already has that prefix in its KV cache;
+  3. least outstanding requests, whenever the sticky host is busier than the
+     least loaded one by more than `sticky_slack`.
+
+Callers report the outcome with release(); llm_service fails over to
+another host when one is unreachable.
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Union
+
+import requests
+
+import http_pool
+from overload import CircuitBreaker, Rejected
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaBackend:
+    def __init__(self, base_url: str, breaker: CircuitBreaker):
+        self.base_url = base_url.rstrip("/")
+        self.breaker = breaker
+        self.outstanding = 0
+        self.healthy = True
+        self.requests = 0
+        self.failures = 0
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def __repr__(self) -> str:
+        return f"OllamaBackend({self.base_url!r}, outstanding={self.outstanding}, healthy={self.healthy}, circuit={self.breaker.state})"
+
+
+class OllamaPool:
+    def __init__(
+        self,
+        base_urls: List[str],
+        sticky_prefix_chars: int = 1024,
+        sticky_slack: int = 2,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        health_interval: float = 10.0,
+    ):
+        self.backends = [OllamaBackend(url, CircuitBreaker(failure_threshold, reset_timeout)) for url in base_urls]
+        self.sticky_prefix_chars = sticky_prefix_chars
+        self.sticky_slack = sticky_slack
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self._health_stop = threading.Event()
+
+    # ── Selection ───────────────────────────────────────
+
+    def _ranked(self, affinity_key: bytes, exclude: Iterable[OllamaBackend]) -> List[OllamaBackend]:
+        candidates = [b for b in self.backends if b not in exclude and b.breaker.open_for() == 0]
+        # Health is a preference: if every check failed, still let the breakers decide
+        healthy = [b for b in candidates if b.healthy]
+        candidates = healthy or candidates
+        if len(candidates) <= 1:
+            return candidates
+        by_affinity = sorted(
+            candidates,
+            key=lambda b: hashlib.blake2b(affinity_key + b.base_url.encode(), digest_size=8).digest(),
+            reverse=True,
+        )
+        least = min(b.outstanding for b in candidates)
+        if by_affinity[0].outstanding - least > self.sticky_slack:
+            by_affinity.sort(key=lambda b: b.outstanding)  # stable: affinity breaks ties
+        return by_affinity
+
+    def _affinity_key(self, prompt: Union[str, List[Dict[str, str]]], model: str) -> bytes:
+        # KV cache is per model, so the model is part of the key
+        digest = hashlib.blake2b(model.encode(), digest_size=8)
+        if isinstance(prompt, str):
+            prompt = [{"content": prompt}]
+        # The system prompt is the same for every call of a task; hash all of it
+        # so the user message still decides where the call goes
+        for message in prompt[:-1]:
+            digest.update(b"\n" + message["content"].encode())
+        if prompt:
+            digest.update(b"\n" + prompt[-1]["content"][:self.sticky_prefix_chars].encode())
+        return digest.digest()
+
+    def acquire(self, prompt: Union[str, List[Dict[str, str]]], exclude: Iterable[OllamaBackend] = (), model: str = "") -> OllamaBackend:
+        """Pick a backend for a prompt or chat messages and count the call against it.
+
+        Raises Rejected when none is available.
+        """
+        self._ensure_health_checks()
+        affinity_key = self._affinity_key(prompt, model)
+        with self._lock:
+            for backend in self._ranked(affinity_key, list(exclude)):
+                try:
+                    backend.breaker.before_call()
+                except Rejected:
+                    continue  # half-open, probe already in flight
+                backend.outstanding += 1
+                backend.requests += 1
+                return backend
+        raise Rejected("circuit_open", self.open_for() or 1)
+
+    def release(self, backend: OllamaBackend, ok: Optional[bool]) -> None:
+        """ok=True success, False backend failure, None not the backend's fault (cancelled, 4xx)."""
+        with self._lock:
+            backend.outstanding -= 1
+        if ok:
+            backend.breaker.record_success()
+        elif ok is None:
+            backend.breaker.release()
+        else:
+            backend.failures += 1
+            backend.breaker.record_failure()
+            if backend.breaker.state == "open":
+                logger.warning("[Ollama] %s failing, circuit open for %.0fs", backend.base_url, backend.breaker.reset_timeout)
+
+    def open_for(self) -> float:
+        """0 if some backend can take a call, else seconds until the first one may."""
+        waits = [b.breaker.open_for() for b in self.backends]
+        return 0.0 if 0 in waits else min(waits)
+
+    # ── Health checks ───────────────────────────────────
+
+    def check_health(self, timeout: float = 2.0) -> None:
+        for backend in self.backends:
+            try:
+                healthy = http_pool.session("ollama").get(backend.url("/api/tags"), timeout=timeout).ok
+            except requests.RequestException:
+                healthy = False
+            if healthy != backend.healthy:
+                logger.info("[Ollama] %s is now %s", backend.base_url, "healthy" if healthy else "unhealthy")
+            backend.healthy = healthy
+
+    def _ensure_health_checks(self) -> None:
+        if self._health_thread is not None or self.health_interval <= 0 or len(self.backends) < 2:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(
+                    target=self._health_loop, args=(self._health_stop,), name="ollama-health", daemon=True
+                )
+                self._health_thread.start()
+
+    def _health_loop(self, stop: threading.Event) -> None:
+        while not stop.is_set():
+            self.check_health()
+            stop.wait(self.health_interval)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the health-check thread (app shutdown); the next acquire() starts a new one."""
+        with self._lock:
+            thread, self._health_thread = self._health_thread, None
+            stop, self._health_stop = self._health_stop, threading.Event()
+        stop.set()
+        if thread is not None:
+            thread.join(timeout)
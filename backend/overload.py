@@ -0,0 +1,237 @@
+"""
+Overload protection for the Ollama backend.
+
+CircuitBreaker stops sending work to a backend that keeps failing and lets
+a single probe through after a cool-down. AdaptiveLimiter caps in-flight
+generations with AIMD: the limit grows by 1/limit per healthy call and is
+cut by a factor when Ollama starts queueing internally or failing. Callers
+beyond the limit wait in a short bounded queue; everyone else is rejected
+at once with a Retry-After hint instead of piling up behind timeouts.
+
+The wait queue is fair-share: each client (user or IP, taken from the
+`client_key` context variable) has its own FIFO, and free slots go to the
+clients in weighted round-robin order. A heavy user therefore waits behind
+their own backlog, not in front of everyone else's.
+
+Both are thread-safe and not tied to one event loop.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+
+class Rejected(Exception):
+    """Work refused before reaching the backend."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+# ── Circuit breaker ─────────────────────────────────────
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raise Rejected while open; in half-open state admit one probe at a time."""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise Rejected("circuit_open", remaining)
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    raise Rejected("circuit_open", 1)
+                self._probing = True
+
+    def open_for(self) -> float:
+        """Seconds until the next probe is allowed; 0 when calls may proceed."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release(self) -> None:
+        """The admitted call never reached the backend (cancelled or rejected later)."""
+        with self._lock:
+            self._probing = False
+
+
+# ── Adaptive concurrency limit ──────────────────────────
+
+# Who the current LLM call is for, and their round-robin weight; set per request
+client_key: ContextVar[str] = ContextVar("llm_client_key", default="")
+client_weight: ContextVar[int] = ContextVar("llm_client_weight", default=1)
+# Bills extra rate-limit tokens to that client (set by rate_limit.limit_llm)
+client_charge: ContextVar[Optional[Callable[[int], None]]] = ContextVar("llm_client_charge", default=None)
+
+
+def charge_client(cost: int) -> None:
+    """Charge generations a request turns out to need beyond what its route paid up front."""
+    charge = client_charge.get()
+    if charge is not None and cost > 0:
+        charge(cost)
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial_limit: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 8,
+        max_queue: int = 16,
+        max_queue_per_client: int = 4,
+        queue_timeout: float = 30.0,
+        queue_wait_target: float = 0.5,
+        backoff: float = 0.75,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.queue_timeout = queue_timeout
+        self.queue_wait_target = queue_wait_target
+        self.backoff = backoff
+        self.inflight = 0
+        self.queued = 0
+        self._latency = None  # EWMA of call latency, for Retry-After
+        self._last_decrease = 0.0
+        self._waiters = OrderedDict()  # client -> deque of (loop, future); order is the round-robin
+        self._served = {}  # client -> grants in the current turn
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> float:
+        return self._latency or 5.0
+
+    async def acquire(self, key: str = None, weight: int = None, timeout: float = None) -> None:
+        """Take a slot, waiting in the client's queue for at most `timeout` (default queue_timeout)."""
+        key = client_key.get() if key is None else key
+        weight = client_weight.get() if weight is None else weight
+        with self._lock:
+            if self.inflight < int(self.limit) and not self.queued:
+                self.inflight += 1
+                return
+            if self.queued >= self.max_queue:
+                raise Rejected("queue_full", self.retry_after())
+            queue = self._waiters.get(key)
+            if queue is not None and len(queue) >= self.max_queue_per_client:
+                raise Rejected("client_queue_full", self.retry_after())
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future(), max(1, weight))
+            self._waiters.setdefault(key, deque()).append(waiter)
+            self.queued += 1
+
+        try:
+            done, _ = await asyncio.wait({waiter[1]}, timeout=self.queue_timeout if timeout is None else timeout)
+        except asyncio.CancelledError:
+            if not self._forget(key, waiter):
+                self.release()
+            raise
+        if not done and self._forget(key, waiter):
+            raise Rejected("queue_timeout", self.retry_after())
+
+    def _forget(self, key: str, waiter) -> bool:
+        """Remove a waiter that gave up. False if it was already granted a slot."""
+        with self._lock:
+            queue = self._waiters.get(key)
+            if queue is None or waiter not in queue:
+                return False
+            queue.remove(waiter)
+            self.queued -= 1
+            if not queue:
+                del self._waiters[key]
+                self._served.pop(key, None)
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.inflight -= 1
+            self._grant()
+
+    def _next_waiter(self):
+        # Weighted round-robin: the client at the front gets up to `weight` slots, then goes to the back
+        key, queue = next(iter(self._waiters.items()))
+        waiter = queue.popleft()
+        self.queued -= 1
+        served = self._served.get(key, 0) + 1
+        if not queue:
+            del self._waiters[key]
+            self._served.pop(key, None)
+        elif served >= waiter[2]:
+            self._served[key] = 0
+            self._waiters.move_to_end(key)
+        else:
+            self._served[key] = served
+        return waiter
+
+    def _grant(self) -> None:
+        # Called with the lock held
+        while self.queued and self.inflight < int(self.limit):
+            loop, future, _ = self._next_waiter()
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+                self.inflight += 1
+            except RuntimeError:
+                pass  # loop already closed; nobody is waiting any more
+
+    def on_success(self, latency: float, queue_wait: float = None) -> None:
+        """Additive increase, unless the backend reports it queued the request."""
+        with self._lock:
+            self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+            if queue_wait is not None and queue_wait > self.queue_wait_target:
+                self._decrease()
+            elif self.inflight >= int(self.limit):
+                # Only grow when the current limit is actually being used
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self._grant()
+
+    def on_overload(self) -> None:
+        """Multiplicative decrease after a timeout or backend failure."""
+        with self._lock:
+            self._decrease()
+
+    def _decrease(self) -> None:
+        # Calls that overlapped the same overload episode count once
+        now = time.monotonic()
+        if now - self._last_decrease < (self._latency or 1.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
@@ -0,0 +1,36 @@
+"""
+Admin endpoints for captured request profiles (see profiling.py).
+Endpoints: GET /admin/profiles, GET /admin/profiles/{name}
+"""
+
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from auth_routes import require_admin
+from profiling import list_profiles, profile_path
+
+router = APIRouter(prefix="/admin/profiles", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+class ProfileInfo(BaseModel):
+    name: str
+    size: int  # bytes
+    created: str
+
+
+@router.get("", response_model=List[ProfileInfo])
+async def get_profiles():
+    """Captured profiles, newest first."""
+    return list_profiles()
+
+
+@router.get("/{name}")
+async def download_profile(name: str):
+    """One profile in folded-stack format, e.g. for `flamegraph.pl` or speedscope.app."""
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {name} not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=name)
@@ -0,0 +1,212 @@
+"""
+On-demand sampling profiler for individual production requests.
+
+A profiled request starts a thread that snapshots every thread's Python
+stack (sys._current_frames) every PROFILE_INTERVAL_MS while the request
+runs. Idle stacks (event loop waiting in select, pool threads waiting for
+work) are dropped. The result is written to PROFILE_DIR in the folded
+format ("thread;outer;inner count" per line) that flamegraph.pl,
+speedscope and inferno read directly.
+
+A request is profiled when an admin account (see grant_admin.py) sends
+`X-Profile: 1` (checked by the `authorize` callback, see
+auth_routes.is_admin_request), or at random with
+PROFILE_SAMPLE_RATE. One profile runs at a time; other requests pass
+through. Unprofiled requests cost one header lookup and, with a sample
+rate, one random() call.
+
+Samples cover the whole process, not only the profiled request: on a busy
+worker, concurrent requests show up too, which is what finding hotspots
+under real traffic needs. The thread name is the root frame, so the event
+loop (MainThread) and worker threads (bcrypt, Adzuna, Ollama reads) can be
+told apart.
+
+Environment:
+  PROFILE_DIR          where profiles are written (default <tmp>/jobsearch-profiles)
+  PROFILE_SAMPLE_RATE  fraction of requests profiled without the header (default 0)
+  PROFILE_INTERVAL_MS  sampling interval (default 5)
+  PROFILE_MAX_FILES    newest profiles kept (default 200)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from tracing import current_trace
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "jobsearch-profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+# Profile files are named by the middleware; anything else is not served
+PROFILE_NAME_RE = re.compile(r"^[0-9TZ-]+-[A-Z]+-[a-z0-9_-]*-[A-Za-z0-9._-]+\.folded$")
+
+# (file name, function) of frames a waiting thread sits in
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # concurrent.futures pool thread between tasks
+    ("handlers.py", "dequeue"),  # the logging QueueListener
+}
+
+_active = threading.Lock()
+
+
+# ── Sampling ────────────────────────────────────────────
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES
+
+
+class Sampler:
+    """Collects folded stacks of every other thread until stopped."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> "Sampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == me or _is_idle(frame):
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                labels: List[str] = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(labels))] += 1
+
+
+def folded(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+# ── Storage ─────────────────────────────────────────────
+
+def _profile_name(scope: Scope) -> str:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    route = re.sub(r"[^a-z0-9]+", "_", scope["path"].lower()).strip("_")[:40]
+    trace = current_trace.get()
+    suffix = trace.trace_id if trace is not None else f"{random.getrandbits(32):08x}"
+    return f"{stamp}-{scope['method']}-{route}-{suffix}.folded"
+
+
+def _write(name: str, content: str) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, name), "w", encoding="utf-8") as f:
+        f.write(content)
+    # Names start with the timestamp; list_profiles() is newest first
+    for old in list_profiles()[PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, old["name"]))
+        except OSError:
+            pass
+
+
+def list_profiles() -> List[dict]:
+    """Stored profiles, newest first."""
+    try:
+        names = [name for name in os.listdir(PROFILE_DIR) if PROFILE_NAME_RE.match(name)]
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in sorted(names, reverse=True):
+        try:
+            stat = os.stat(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            continue
+        profiles.append({
+            "name": name,
+            "size": stat.st_size,
+            "created": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(timespec="seconds"),
+        })
+    return profiles
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Path of a stored profile, or None for unknown (or unsafe) names."""
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+# ── Middleware ──────────────────────────────────────────
+
+class ProfilingMiddleware:
+    """Profiles requests an admin asks for (X-Profile: 1) or a random PROFILE_SAMPLE_RATE share."""
+
+    def __init__(self, app: ASGIApp, authorize: Callable[[Headers], Awaitable[bool]], sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.authorize = authorize
+        self.sample_rate = sample_rate
+
+    async def _wanted(self, scope: Scope) -> bool:
+        headers = Headers(scope=scope)
+        if headers.get("x-profile"):
+            return await self.authorize(headers)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not await self._wanted(scope) or not _active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        name = _profile_name(scope)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = name
+            await send(message)
+
+        sampler = Sampler().start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stacks = sampler.stop()
+            _active.release()
+            try:
+                await asyncio.to_thread(_write, name, folded(stacks))
+                logger.info("[Profile] %s: %s samples over %.0f ms", name, sampler.samples, (time.perf_counter() - start) * 1000)
+            except OSError as e:
+                logger.warning("[Profile] Could not write %s: %s", name, e)
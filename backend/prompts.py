@@ -0,0 +1,227 @@
+"""
+Chat prompts for Ollama, split into a fixed system message per task and a
+user message holding only the variable text.
+
+The system message is byte-identical on every call, and the user message
+starts with the text most likely to repeat (the resume; for section
+rewrites, the job description), so the inference server's prompt (KV) cache
+can skip re-evaluating the instructions, and for repeat calls, that text as
+well. Keep anything that varies per request out of
+the *_SYSTEM strings.
+"""
+
+from typing import Dict, List
+
+Messages = List[Dict[str, str]]
+
+
+def chat(system: str, user: str) -> Messages:
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+
+# ── Resume analysis ─────────────────────────────────────
+
+ANALYSIS_SYSTEM = """You are an ATS (Applicant Tracking System) expert. Analyze the resume against the job description.
+
+Provide a JSON response with exactly these fields:
+- ats_score: number between 0-100
+- missing_keywords: array of strings (specific keywords from job description not in resume)
+- strengths: array of strings (what matches well)
+- improvements: array of strings (specific actionable improvements)
+
+Return ONLY valid JSON, no markdown formatting."""
+
+
+def analysis_messages(resume_text: str, job_description: str) -> Messages:
+    return chat(ANALYSIS_SYSTEM, f"""Resume:
+{resume_text}
+
+Job Description:
+{job_description}""")
+
+
+# ── Job matching ────────────────────────────────────────
+
+MATCH_SYSTEM = """You are a job matching expert. Analyze the resume against the list of jobs you are given and return ONLY a JSON array.
+
+IMPORTANT: You MUST return ONLY a JSON array. No explanations, no markdown, no text before or after.
+
+For each job, create an object with these EXACT keys:
+- title: string (exact job title from list)
+- company: string (exact company name from list)
+- match_score: number (0-100)
+- reasoning: string (2-3 sentences, NO quotes inside, NO backslashes)
+
+JSON FORMATTING RULES:
+1. Return ONLY the JSON array, nothing else
+2. Start with [ and end with ]
+3. No markdown code blocks (no ```)
+4. No comments
+5. No trailing commas
+6. Use double quotes for strings
+7. Do NOT use backslash characters
+8. Do NOT escape quotes in reasoning text
+9. Keep reasoning simple and plain
+
+EXAMPLE FORMAT:
+[
+  {
+    "title": "Software Engineer",
+    "company": "Tech Corp",
+    "match_score": 85,
+    "reasoning": "Strong match with required Python and React skills. Has 3 years experience."
+  },
+  {
+    "title": "Data Analyst",
+    "company": "Data Inc",
+    "match_score": 60,
+    "reasoning": "Some relevant skills but lacks SQL experience. Good analytical background."
+  }
+]"""
+
+
+def match_messages(resume_text: str, jobs: list) -> Messages:
+    jobs_text = ""
+    for i, job in enumerate(jobs):
+        jobs_text += f"Job {i+1}:\nTitle: {job['title']}\nCompany: {job.get('company', 'Unknown')}\nDescription: {job['description']}\n\n"
+    return chat(MATCH_SYSTEM, f"""Resume:
+{resume_text}
+
+Jobs List:
+{jobs_text}
+Return ONLY the JSON array for all {len(jobs)} jobs. Start your response with [ and end with ].""")
+
+
+# ── Cover letter ────────────────────────────────────────
+
+COVER_LETTER_SYSTEM = """Write a professional cover letter based on the resume and job you are given.
+
+Write a compelling, personalized cover letter in professional business format. Include:
+- Proper greeting
+- Strong opening paragraph
+- 2-3 body paragraphs highlighting relevant experience
+- Strong closing
+- Professional sign-off
+
+Return ONLY the cover letter text, no JSON or markdown formatting."""
+
+
+def cover_letter_messages(resume_text: str, job_description: str, company: str) -> Messages:
+    return chat(COVER_LETTER_SYSTEM, f"""Resume:
+{resume_text}
+
+Job Description:
+{job_description}
+
+Company: {company}""")
+
+
+# ── Resume rewrite ──────────────────────────────────────
+
+REWRITE_SYSTEM = """You are an expert resume writer and ATS optimization specialist. Your task is to improve the resume you are given to better match the job description while maintaining complete honesty and factual accuracy. You will also be given the CRITICAL MISSING KEYWORDS TO INJECT.
+
+OPTIMIZATION STRATEGY - KEYWORD INJECTION:
+1. Identify existing experiences where these keywords naturally fit
+2. Rewrite bullet points to incorporate missing keywords organically
+3. Add these keywords to skills section if not present (only if they can be reasonably inferred from experience)
+4. Enhance professional summary to include relevant keywords
+5. Use synonyms and related terms for variety
+6. Ensure keywords appear in context, not just as a list
+
+IMPORTANT RULES:
+1. DO NOT invent or fabricate any experience, skills, or qualifications
+2. Only enhance and reframe existing information
+3. Naturally incorporate missing keywords into existing experience descriptions
+4. Improve bullet points for clarity and impact using action verbs
+5. If a keyword cannot be honestly incorporated, skip it
+6. Maintain the original resume structure and formatting
+7. Keep the tone professional and authentic
+8. Use quantifiable achievements where they already exist
+
+OPTIMIZATION TASKS:
+- Analyze the job description for key requirements and keywords
+- Identify WHERE in the existing resume each missing keyword could fit
+- Rewrite those specific sections to naturally include the keywords
+- Improve bullet point clarity (use strong action verbs, be specific)
+- Enhance the professional summary to highlight relevant experience with keywords
+- Add technical skills section if missing (only with honest skills)
+- Ensure all improvements are based on existing information only
+
+EXAMPLE KEYWORD INJECTION:
+Before: "Developed web applications for clients"
+After: "Developed responsive web applications using React and Node.js, implementing RESTful APIs and modern JavaScript frameworks to deliver scalable client solutions"
+
+Return ONLY the complete optimized resume text. Do not include any explanations, markdown formatting, or JSON."""
+
+
+def rewrite_messages(resume_text: str, job_description: str, keywords_text: str) -> Messages:
+    return chat(REWRITE_SYSTEM, f"""Resume:
+{resume_text}
+
+Job Description:
+{job_description}
+
+CRITICAL MISSING KEYWORDS TO INJECT:
+{keywords_text}""")
+
+
+# ── Section rewrite ─────────────────────────────────────
+
+SECTION_REWRITE_SYSTEM = """You are an expert resume writer and ATS optimization specialist. You will be given a job description, a few missing keywords, and ONE section of a resume. Rewrite only that section so it naturally covers the keywords, while maintaining complete honesty and factual accuracy.
+
+RULES:
+1. DO NOT invent or fabricate any experience, skills, or qualifications
+2. Only enhance and reframe what the section already says
+3. If a keyword cannot be honestly incorporated, skip it
+4. Keep the section's format: same lines and bullet style, the role/title line unchanged
+5. Use strong action verbs and keep quantifiable achievements that already exist
+6. For a skills section, add keywords only if the rest of the resume supports them
+
+Return ONLY the rewritten section text. No heading, explanations, markdown formatting, or JSON."""
+
+
+def section_rewrite_messages(job_description: str, keywords_text: str, section_title: str, section_text: str) -> Messages:
+    # The job description comes first: every section of one resume shares it as a cached prefix
+    return chat(SECTION_REWRITE_SYSTEM, f"""Job Description:
+{job_description}
+
+KEYWORDS TO COVER:
+{keywords_text}
+
+RESUME SECTION ({section_title}):
+{section_text}""")
+
+
+# ── Resume digest ───────────────────────────────────────
+
+DIGEST_SYSTEM = """You are a resume parser. Summarize the resume you are given into a compact, factual digest.
+
+Provide a JSON response with exactly these fields:
+- headline: string (one sentence: current role, seniority and focus)
+- years_experience: number (total years of professional experience)
+- skills: array of strings (every technical and domain skill, tool and language mentioned)
+- roles: array of strings (one per position, most recent first: "Title, Company (start - end)")
+- achievements: array of strings (up to 6 most notable results, keep numbers exactly as written)
+- education: array of strings (degrees and certifications)
+
+Use only facts stated in the resume. Return ONLY valid JSON, no markdown formatting."""
+
+
+def digest_messages(resume_text: str) -> Messages:
+    return chat(DIGEST_SYSTEM, f"""Resume:
+{resume_text}""")
+
+
+def format_digest(digest: dict) -> str:
+    """Digest as plain text, used in prompts where the resume would go."""
+    lines = [f"Candidate summary: {digest.get('headline', '')}".rstrip()]
+    if digest.get("years_experience"):
+        lines.append(f"Total experience: {digest['years_experience']} years")
+    for label, key in (("Skills", "skills"), ("Education", "education")):
+        if digest.get(key):
+            lines.append(f"{label}: {', '.join(map(str, digest[key]))}")
+    for label, key in (("Roles", "roles"), ("Key achievements", "achievements")):
+        if digest.get(key):
+            lines.append(f"{label}:")
+            lines.extend(f"- {item}" for item in digest[key])
+    return "\n".join(lines)
@@ -0,0 +1,70 @@
+"""
+Per-client token-bucket limits for the LLM routes.
+
+Clients are keyed by JWT subject when a bearer token is sent, otherwise by
+client IP. Each LLM route spends tokens according to how many generations
+it runs; routes whose count depends on the input pay the rest through
+overload.charge_client() once it is known, which may leave the bucket in
+debt for the client's next request. The same key is published to overload.client_key so the Ollama
+wait queue can schedule clients fairly.
+
+Environment:
+  LLM_RATE_PER_MINUTE  tokens refilled per minute per client (default 10)
+  LLM_BURST            bucket size (default 5)
+  LLM_CLIENT_WEIGHTS   fair-share weights, e.g. "ops@example.com=3,10.0.0.5=2" (default 1)
+"""
+
+import math
+import os
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, status
+
+from auth_routes import get_optional_subject
+from metrics import LLM_RATE_LIMITED
+from overload import client_charge, client_key, client_weight
+from token_bucket import KeyedRateLimiter
+
+
+def _parse_weights(spec: str) -> dict:
+    weights = {}
+    for item in spec.split(","):
+        name, sep, weight = item.rpartition("=")
+        if sep and name.strip() and weight.strip().isdigit():
+            weights[name.strip()] = int(weight)
+    return weights
+
+
+LLM_LIMITER = KeyedRateLimiter(
+    rate_per_minute=float(os.getenv("LLM_RATE_PER_MINUTE", "10")),
+    burst=float(os.getenv("LLM_BURST", "5")),
+)
+CLIENT_WEIGHTS = _parse_weights(os.getenv("LLM_CLIENT_WEIGHTS", ""))
+
+
+def client_identity(request: Request, subject: Optional[str]) -> str:
+    if subject:
+        return f"user:{subject}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def limit_llm(cost: int = 1):
+    """Route dependency: charge `cost` tokens to the caller or answer 429."""
+
+    async def dependency(request: Request, subject: Optional[str] = Depends(get_optional_subject)) -> str:
+        key = client_identity(request, subject)
+        allowed, wait = LLM_LIMITER.take(key, cost)
+        if not allowed:
+            LLM_RATE_LIMITED.inc(kind="user" if subject else "ip")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many AI requests. Please slow down.",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+        # Async dependency: runs in the request's context, so the route sees these values
+        client_key.set(key)
+        client_weight.set(CLIENT_WEIGHTS.get(subject or key.partition(":")[2], 1))
+        client_charge.set(lambda extra: LLM_LIMITER.charge(key, extra))
+        return key
+
+    return dependency
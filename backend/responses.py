@@ -0,0 +1,56 @@
+"""
+Fast JSON responses for the large list endpoints.
+Models are dumped once through a cached Pydantic TypeAdapter and encoded
+with orjson (stdlib json if orjson is not installed), skipping FastAPI's
+response re-validation and encoder pass. Also the line formats used by
+the streaming endpoints (NDJSON and server-sent events).
+"""
+
+import json
+from functools import lru_cache
+from typing import Any, List, Sequence
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is None:
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model_type: type) -> TypeAdapter:
+    return TypeAdapter(List[model_type])
+
+
+def dump_models(models: Sequence[BaseModel]) -> list:
+    """JSON-ready list of dicts for a homogeneous list of models."""
+    if not models:
+        return []
+    return _list_adapter(type(models[0])).dump_python(list(models), mode="json")
+
+
+# ── Streaming formats ───────────────────────────────────
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def ndjson_line(content: Any) -> bytes:
+    return dumps(content) + b"\n"
+
+
+def sse_event(event: str, content: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(content) + b"\n\n"
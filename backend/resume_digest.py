@@ -0,0 +1,98 @@
+"""
+Per-resume digests (skills, roles, years, achievements), generated once and
+reused in prompts instead of the full resume text.
+
+Keyed by a hash of the resume text, kept in the cache store (cache.py) and
+persisted in SQLite, so restarts and other workers reuse them as well.
+Concurrent requests for the same new resume share a single generation,
+which runs without a request deadline; each waiter stops waiting when its
+own deadline passes.
+
+Environment:
+  RESUME_DIGEST_CACHE_TTL  seconds a digest stays in the cache in front of SQLite (default 86400)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from cache import make_cache
+from database import ResumeDigestDB, SessionLocal
+from deadlines import DeadlineExceeded, deadline, remaining
+from metrics import register_cache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the digest prompt or format changes, so old digests are not reused
+DIGEST_VERSION = 1
+
+_cache = make_cache("resume_digest", int(os.getenv("RESUME_DIGEST_CACHE_TTL", "86400")), max_entries=1024)
+register_cache("resume_digest", _cache)
+_inflight: Dict[str, "asyncio.Future"] = {}
+
+
+def resume_hash(resume_text: str) -> str:
+    # Whitespace-only edits (re-pasting the same resume) keep the same digest
+    normalized = " ".join(resume_text.split())
+    return hashlib.sha256(f"v{DIGEST_VERSION}\n{normalized}".encode()).hexdigest()
+
+
+def _load(key: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        row = db.get(ResumeDigestDB, key)
+        return json.loads(row.digest) if row else None
+    finally:
+        db.close()
+
+
+def _store(key: str, digest: dict) -> None:
+    db = SessionLocal()
+    try:
+        db.merge(ResumeDigestDB(
+            resume_hash=key,
+            digest=json.dumps(digest),
+            created_at=datetime.now(timezone.utc).isoformat(),
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _fetch(key: str, generate: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+    # Shared by every waiter, so not bound by the deadline of whichever request started it
+    deadline.set(None)
+    digest = await asyncio.to_thread(_load, key)
+    if digest is None:
+        digest = await generate()
+        if digest:
+            await asyncio.to_thread(_store, key, digest)
+            logger.info("[Digest] Stored digest %s", key[:12])
+    if digest:
+        _cache.set(key, digest)
+    return digest
+
+
+async def get_digest(resume_text: str, generate: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+    """The digest for a resume: cache, then SQLite, then `generate()` (None if that fails)."""
+    key = resume_hash(resume_text)
+    digest = _cache.get(key)
+    if digest is not None:
+        return digest
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.ensure_future(_fetch(key, generate))
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shielded: a caller that gives up (or runs out of time) does not cancel
+    # the generation the others wait for
+    left = remaining()
+    if left is None:
+        return await asyncio.shield(task)
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), max(0.0, left))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded()
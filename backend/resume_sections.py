@@ -0,0 +1,159 @@
+"""
+Split a plain-text resume into sections and put it back together.
+
+Sections are found by their headings (SUMMARY, Skills:, ## Experience, ...);
+experience and project sections are further split into one entry per role.
+Every line belongs to exactly one section, so joining the sections' text
+reproduces the resume byte for byte, and a rewritten section can be swapped
+in without touching the rest.
+"""
+
+import difflib
+import re
+from dataclasses import dataclass
+from typing import Dict, List
+
+HEADINGS = {
+    "summary": ("summary", "professional summary", "profile", "professional profile", "objective",
+                "career objective", "about me", "about"),
+    "skills": ("skills", "technical skills", "key skills", "core skills", "core competencies",
+               "competencies", "technologies", "tools", "tools and technologies", "tech stack"),
+    "experience": ("experience", "work experience", "professional experience", "employment",
+                   "employment history", "work history", "career history"),
+    "projects": ("projects", "key projects", "personal projects", "selected projects"),
+    "education": ("education", "academic background", "qualifications"),
+    "certifications": ("certifications", "certificates", "licenses and certifications", "courses"),
+}
+_HEADING_KIND = {name: kind for kind, names in HEADINGS.items() for name in names}
+
+# Kinds split into one section per role/project, and what to call each entry
+ENTRY_KINDS = {"experience": "Experience", "projects": "Project"}
+
+_BULLET_RE = re.compile(r"^\s*(?:[-*•●▪◦‣–]|\d+[.)])\s+")
+_DECORATION_RE = re.compile(r"^[#*_=\s]+|[#*_=:\s]+$")
+_WORD_RE = re.compile(r"[a-z0-9+#.]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or our the to we will with you your "
+    "who this that experience years strong work team".split()
+)
+
+
+@dataclass
+class Section:
+    kind: str  # header, heading, summary, skills, experience, projects, education, ..., other
+    title: str
+    text: str  # exact text, trailing blank lines included
+
+    @property
+    def body(self) -> str:
+        return self.text.rstrip()
+
+    @property
+    def trailing(self) -> str:
+        return self.text[len(self.body):]
+
+
+def _heading_kind(line: str):
+    """Kind for a heading line, "other" for an unknown ALL-CAPS heading, None otherwise."""
+    stripped = line.strip()
+    if not stripped or len(stripped) > 40 or _BULLET_RE.match(line):
+        return None
+    name = _DECORATION_RE.sub("", stripped).lower()
+    if name in _HEADING_KIND:
+        return _HEADING_KIND[name]
+    if stripped.isupper() and len(stripped.split()) <= 4:
+        return "other"
+    return None
+
+
+def split_sections(text: str) -> List[Section]:
+    sections: List[Section] = []
+    kind, title = "header", "Header"
+    current: List[str] = []
+    seen_bullet = gap = False
+    entries = 0
+
+    def flush():
+        if current:
+            sections.append(Section(kind, title, "".join(current)))
+            current.clear()
+
+    for line in text.splitlines(keepends=True):
+        heading = _heading_kind(line)
+        # An ALL-CAPS first line is the candidate's name, not a heading
+        if heading and (heading != "other" or sections or current):
+            flush()
+            sections.append(Section("heading", line.strip(), line))
+            kind = heading
+            title = _DECORATION_RE.sub("", line.strip()).title()
+            seen_bullet = gap = False
+            entries = 0
+            continue
+        blank = not line.strip()
+        if blank:
+            if current:
+                current.append(line)
+                gap = True
+            elif sections:
+                # Blank lines right after a heading stay with it
+                sections[-1].text += line
+            else:
+                current.append(line)
+            continue
+        bullet = bool(_BULLET_RE.match(line))
+        if kind in ENTRY_KINDS and not bullet and (not current or seen_bullet or gap):
+            # A non-bullet line after a role's bullets (or a blank line) starts the next role
+            flush()
+            entries += 1
+            title = f"{ENTRY_KINDS[kind]} {entries}: {line.strip()[:60]}"
+            seen_bullet = False
+        current.append(line)
+        seen_bullet = seen_bullet or bullet
+        gap = False
+    flush()
+    return sections
+
+
+def join_sections(sections: List[Section]) -> str:
+    return "".join(section.text for section in sections)
+
+
+def _words(text: str) -> set:
+    return {w.strip(".") for w in _WORD_RE.findall(text.lower())} - _STOPWORDS
+
+
+def assign_keywords(sections: List[Section], keywords: List[str], job_description: str) -> Dict[int, List[str]]:
+    """Which rewritable sections should take which missing keywords.
+
+    Only summary, skills, roles and projects are rewritten; contact details,
+    education etc. stay as written. Summary and skills take all keywords. Each keyword also goes to the one
+    role or project whose wording overlaps most with the job-description
+    sentences that mention the keyword; roles with no match stay untouched.
+    """
+    assigned: Dict[int, List[str]] = {}
+    if not keywords:
+        return assigned
+    sentences = re.split(r"(?<=[.!?;\n])\s+", job_description)
+    entries = [(i, _words(s.text)) for i, s in enumerate(sections) if s.kind in ENTRY_KINDS]
+    for i, section in enumerate(sections):
+        if section.kind in ("summary", "skills"):
+            assigned[i] = list(keywords)
+    for keyword in keywords:
+        context = _words(keyword)
+        for sentence in sentences:
+            if keyword.lower() in sentence.lower():
+                context |= _words(sentence)
+        best, best_score = None, 0
+        for i, words in entries:
+            score = len(words & context)
+            if score > best_score:
+                best, best_score = i, score
+        if best is not None:
+            assigned.setdefault(best, []).append(keyword)
+    return assigned
+
+
+def section_diff(original: str, rewritten: str, name: str) -> str:
+    return "\n".join(difflib.unified_diff(
+        original.splitlines(), rewritten.splitlines(), f"{name} (original)", f"{name} (optimized)", n=1, lineterm="",
+    ))
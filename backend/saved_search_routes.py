@@ -0,0 +1,199 @@
+"""
+Saved searches — a user's recurring /jobs query, kept fresh in the background.
+Endpoints: POST /saved-searches, GET /saved-searches, GET /saved-searches/new,
+POST /saved-searches/{search_id}/sync, DELETE /saved-searches/{search_id}
+
+Syncs fetch and match only postings newer than each search's watermark (see
+saved_searches.py); the ones a user starts (create, sync) count against
+their LLM rate limit, one token per match batch. GET /saved-searches/new
+returns what was found since the user's last visit in one indexed query.
+
+Environment:
+  SAVED_SEARCH_MAX_PER_USER   saved searches per user (default 20)
+"""
+
+import os
+import uuid
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from adzuna_service import parse_countries
+from auth_routes import get_current_user
+from database import get_db, User, SavedSearchDB, SavedSearchJobDB
+from rate_limit import limit_llm
+from saved_searches import iso, now, sync_lifespan, sync_search, sync_soon
+
+MAX_PER_USER = int(os.getenv("SAVED_SEARCH_MAX_PER_USER", "20"))
+
+# A manual sync is refused when the last one was this recent
+MANUAL_SYNC_MIN_AGE = 60
+
+# Creating or syncing a search fetches and matches postings: one LLM token up
+# front (the first match batch), the other batches once the fetch shows how many
+SYNC_RATE_LIMIT = Depends(limit_llm(cost=1))
+
+# ── Pydantic schemas ────────────────────────────────────
+
+class SavedSearchRequest(BaseModel):
+    role: str = Field(..., min_length=1)
+    location: str = ""
+    experience_level: str = ""
+    countries: str = ""  # Adzuna country codes, e.g. "in,gb"; default ADZUNA_COUNTRIES
+    resume_text: Optional[str] = None  # new postings are matched against it when set
+
+class SavedSearch(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    role: str
+    location: str = ""
+    experience_level: str = ""
+    countries: str
+    watermark: Optional[str] = None
+    last_synced_at: Optional[str] = None
+    created_at: str
+
+class SavedSearchJob(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    search_id: str
+    title: str
+    company: str
+    location: str = ""
+    description: str = ""
+    apply_link: str = ""
+    created: Optional[str] = None
+    source_job_id: Optional[str] = None  # CleanedJob.id from Adzuna
+    country: Optional[str] = None
+    match_score: Optional[float] = None  # None when the search has no resume or matching failed
+    reasoning: Optional[str] = None
+
+class SyncResult(BaseModel):
+    synced: bool  # False: synced too recently, nothing fetched
+    new_jobs: int = 0
+
+router = APIRouter(tags=["Saved Searches"], lifespan=sync_lifespan)
+
+# ── Routes (all require auth) ───────────────────────────
+
+def _owned_search(db: Session, user_id: int, search_id: str) -> SavedSearchDB:
+    search = (
+        db.query(SavedSearchDB)
+        .filter(SavedSearchDB.id == search_id, SavedSearchDB.user_id == user_id)
+        .first()
+    )
+    if search is None:
+        raise HTTPException(status_code=404, detail=f"Saved search {search_id} not found")
+    return search
+
+
+@router.post("/saved-searches", response_model=SavedSearch, dependencies=[SYNC_RATE_LIMIT])
+async def create_saved_search(
+    req: SavedSearchRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Save a search; its first sync starts right away."""
+    try:
+        countries = parse_countries(req.countries)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    count = db.query(SavedSearchDB).filter(SavedSearchDB.user_id == current_user.id).count()
+    if count >= MAX_PER_USER:
+        raise HTTPException(status_code=409, detail=f"At most {MAX_PER_USER} saved searches per user")
+
+    search = SavedSearchDB(
+        id=str(uuid.uuid4()),
+        user_id=current_user.id,
+        role=req.role.strip(),
+        location=req.location.strip(),
+        experience_level=req.experience_level.strip(),
+        countries=",".join(countries),
+        resume_text=req.resume_text or None,
+        last_seen_id=0,
+        created_at=iso(now()),
+    )
+    db.add(search)
+    db.commit()
+    db.refresh(search)
+    sync_soon(search.id)
+    return search
+
+
+@router.get("/saved-searches", response_model=List[SavedSearch])
+async def list_saved_searches(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return (
+        db.query(SavedSearchDB)
+        .filter(SavedSearchDB.user_id == current_user.id)
+        .order_by(SavedSearchDB.created_at)
+        .all()
+    )
+
+
+@router.get("/saved-searches/new", response_model=List[SavedSearchJob])
+async def new_since_last_visit(
+    search_id: Optional[str] = None,
+    mark_seen: bool = True,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Postings found since the last visit, across all saved searches (or one), newest first.
+    Marks them seen unless mark_seen=false.
+    """
+    query = (
+        db.query(SavedSearchJobDB)
+        .join(SavedSearchDB, SavedSearchJobDB.search_id == SavedSearchDB.id)
+        .filter(SavedSearchDB.user_id == current_user.id, SavedSearchJobDB.id > SavedSearchDB.last_seen_id)
+    )
+    if search_id:
+        query = query.filter(SavedSearchDB.id == search_id)
+    rows = query.order_by(SavedSearchJobDB.created.desc(), SavedSearchJobDB.id.desc()).all()
+    jobs = [SavedSearchJob.model_validate(row) for row in rows]
+
+    if mark_seen and rows:
+        # Up to what was returned, not "now": postings stored meanwhile stay new
+        newest = {}
+        for row in rows:
+            newest[row.search_id] = max(newest.get(row.search_id, 0), row.id)
+        for sid, last_id in newest.items():
+            db.execute(
+                update(SavedSearchDB)
+                .where(SavedSearchDB.id == sid, SavedSearchDB.last_seen_id < last_id)
+                .values(last_seen_id=last_id)
+            )
+        db.commit()
+    return jobs
+
+
+@router.post("/saved-searches/{search_id}/sync", response_model=SyncResult, dependencies=[SYNC_RATE_LIMIT])
+async def sync_saved_search(
+    search_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Sync one search now instead of waiting for the background loop."""
+    _owned_search(db, current_user.id, search_id)
+    new_jobs = await sync_search(search_id, min_age_seconds=MANUAL_SYNC_MIN_AGE)
+    if new_jobs is None:
+        return SyncResult(synced=False)
+    return SyncResult(synced=True, new_jobs=new_jobs)
+
+
+@router.delete("/saved-searches/{search_id}", status_code=204)
+async def delete_saved_search(
+    search_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    search = _owned_search(db, current_user.id, search_id)
+    db.query(SavedSearchJobDB).filter(SavedSearchJobDB.search_id == search.id).delete()
+    db.delete(search)
+    db.commit()
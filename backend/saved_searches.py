@@ -0,0 +1,240 @@
+"""
+Background sync for saved searches (routes in saved_search_routes.py).
+
+Each search keeps a watermark: the created time of the newest posting it has
+seen. A sync asks Adzuna only for the days since the watermark (max_days_old),
+reads those postings newest first until it reaches the watermark
+(adzuna_service.fetch_jobs_since) and runs LLM matching on the new ones,
+instead of re-fetching and re-matching the whole result list every day. When
+a sync could not read back to the watermark (a country failed, or too many
+pages), the watermark stays put so the next sync covers the gap; postings
+already stored are not matched again. Stored
+postings get increasing ids, so "new since the last visit" is an indexed
+id > last_seen_id lookup.
+
+Every worker runs the loop; a conditional UPDATE lets exactly one of them
+claim a due search.
+
+Environment:
+  SAVED_SEARCH_SYNC_INTERVAL  seconds between background syncs of one search (default 3600; 0 turns the loop off)
+"""
+
+import asyncio
+import logging
+import math
+import os
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import or_, update
+from sqlalchemy.dialects.sqlite import insert
+
+from adzuna_service import fetch_jobs_since, posted_at
+from database import SessionLocal, SavedSearchDB, SavedSearchJobDB
+from llm_service import match_jobs
+from models import CleanedJob, MatchJobResult
+from overload import charge_client
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = float(os.getenv("SAVED_SEARCH_SYNC_INTERVAL", "3600"))
+
+# How often the background loop looks for due searches
+SYNC_POLL_SECONDS = 60
+# New postings are matched this many per prompt
+MATCH_BATCH = 10
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def iso(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+def _days_since(watermark: Optional[str]) -> Optional[int]:
+    """max_days_old covering everything after the watermark; None (no limit) on the first sync."""
+    if not watermark:
+        return None
+    age = now() - datetime.fromisoformat(watermark)
+    # Adzuna's window is whole days
+    return max(1, math.ceil(age / timedelta(days=1)))
+
+def _match_key(title: str, company: str) -> tuple:
+    return (title.strip().lower(), company.strip().lower())
+
+def _claim(search_id: str, min_age_seconds: float) -> Optional[SavedSearchDB]:
+    """
+    Stamp last_synced_at, unless the search was synced in the last min_age_seconds.
+    The conditional UPDATE is atomic, so only one worker syncs a search.
+    """
+    started = now()
+    db = SessionLocal()
+    try:
+        stmt = update(SavedSearchDB).where(SavedSearchDB.id == search_id)
+        if min_age_seconds > 0:
+            cutoff = iso(started - timedelta(seconds=min_age_seconds))
+            stmt = stmt.where(or_(SavedSearchDB.last_synced_at.is_(None), SavedSearchDB.last_synced_at < cutoff))
+        if db.execute(stmt.values(last_synced_at=iso(started))).rowcount == 0:
+            db.rollback()
+            return None
+        db.commit()
+        search = db.get(SavedSearchDB, search_id)
+        if search is not None:
+            db.expunge(search)
+        return search
+    finally:
+        db.close()
+
+def _store(search_id: str, jobs: List[CleanedJob], matches: Dict[tuple, MatchJobResult], watermark: Optional[str]) -> None:
+    db = SessionLocal()
+    try:
+        rows = []
+        for job in jobs:
+            match = matches.get(_match_key(job.title, job.company))
+            rows.append({
+                "search_id": search_id,
+                "source_job_id": job.id,
+                "country": job.country,
+                "title": job.title,
+                "company": job.company,
+                "location": job.location,
+                "description": job.description,
+                "apply_link": job.apply_link,
+                "created": job.created,
+                "match_score": match.match_score if match else None,
+                "reasoning": match.reasoning if match else None,
+            })
+        if rows:
+            # A posting re-listed without a newer created time is not stored twice
+            db.execute(
+                insert(SavedSearchJobDB).on_conflict_do_nothing(
+                    index_elements=["search_id", "country", "source_job_id"]
+                ),
+                rows,
+            )
+        db.execute(update(SavedSearchDB).where(SavedSearchDB.id == search_id).values(watermark=watermark))
+        db.commit()
+    finally:
+        db.close()
+
+def _unstored(search_id: str, jobs: List[CleanedJob]) -> List[CleanedJob]:
+    """Drop postings an earlier sync already stored (it may not have moved the watermark)."""
+    ids = {job.id for job in jobs if job.id}
+    if not ids:
+        return jobs
+    db = SessionLocal()
+    try:
+        stored = set(
+            db.query(SavedSearchJobDB.country, SavedSearchJobDB.source_job_id)
+            .filter(SavedSearchJobDB.search_id == search_id, SavedSearchJobDB.source_job_id.in_(ids))
+            .all()
+        )
+    finally:
+        db.close()
+    return [job for job in jobs if (job.country, job.id) not in stored]
+
+async def _match_new(resume_text: str, jobs: List[CleanedJob]) -> Dict[tuple, MatchJobResult]:
+    # Syncs started by a route paid for one batch up front; the rest go on the
+    # user's bill (a no-op for the background loop, which no user started)
+    charge_client(math.ceil(len(jobs) / MATCH_BATCH) - 1)
+    # Sequential batches: background work should not crowd out interactive requests
+    matches = {}
+    for start in range(0, len(jobs), MATCH_BATCH):
+        batch = [
+            {"title": job.title, "description": job.description, "company": job.company}
+            for job in jobs[start:start + MATCH_BATCH]
+        ]
+        try:
+            results = await match_jobs(resume_text, batch)
+        except Exception as e:
+            logger.warning("[SavedSearch] Matching failed, storing %s jobs unscored: %s", len(batch), e)
+            continue
+        for result in results:
+            matches[_match_key(result.title, result.company)] = result
+    return matches
+
+async def sync_search(search_id: str, min_age_seconds: float = SYNC_INTERVAL) -> Optional[int]:
+    """
+    Fetch the postings newer than the search's watermark, match them and store them.
+    Returns how many were new, or None when the search was synced too recently.
+    """
+    search = await asyncio.to_thread(_claim, search_id, min_age_seconds)
+    if search is None:
+        return None
+
+    since = datetime.fromisoformat(search.watermark) if search.watermark else None
+    jobs, complete = await fetch_jobs_since(
+        search.role, search.location, search.experience_level, search.countries, since,
+        max_days_old=_days_since(search.watermark),
+    )
+    # Undated postings cannot be compared; the unique index drops repeats
+    new = [job for job in jobs if since is None or posted_at(job) is None or posted_at(job) > since]
+    new = await asyncio.to_thread(_unstored, search_id, new)
+
+    matches = await _match_new(search.resume_text, new) if search.resume_text and new else {}
+
+    newest = max((stamp for stamp in map(posted_at, jobs) if stamp), default=None)
+    if not complete:
+        # Postings between the watermark and the oldest one read may be missing
+        newest = since
+    elif since is not None and (newest is None or newest < since):
+        newest = since
+    await asyncio.to_thread(_store, search_id, new, matches, iso(newest) if newest else None)
+    logger.info("[SavedSearch] Synced %s: %s fetched, %s new, %s matched", search_id, len(jobs), len(new), len(matches))
+    return len(new)
+
+def _due_search_ids() -> List[str]:
+    cutoff = iso(now() - timedelta(seconds=SYNC_INTERVAL))
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(SavedSearchDB.id)
+            .filter(or_(SavedSearchDB.last_synced_at.is_(None), SavedSearchDB.last_synced_at < cutoff))
+            .order_by(SavedSearchDB.last_synced_at)
+            .limit(50)
+            .all()
+        )
+        return [row.id for row in rows]
+    finally:
+        db.close()
+
+async def _sync_loop() -> None:
+    while True:
+        try:
+            for search_id in await asyncio.to_thread(_due_search_ids):
+                try:
+                    await sync_search(search_id)
+                except Exception as e:
+                    # Retried after the next interval (last_synced_at was already stamped)
+                    logger.error("[SavedSearch] Sync of %s failed: %s", search_id, e)
+        except Exception as e:
+            logger.error("[SavedSearch] Sync loop error: %s", e)
+        await asyncio.sleep(SYNC_POLL_SECONDS)
+
+# First syncs of new searches; referenced so they are not garbage-collected mid-run
+_background: Set["asyncio.Task"] = set()
+
+def sync_soon(search_id: str) -> None:
+    """Start a new search's first sync without waiting for it."""
+
+    async def first_sync():
+        try:
+            await sync_search(search_id, min_age_seconds=0)
+        except Exception as e:
+            logger.error("[SavedSearch] First sync of %s failed: %s", search_id, e)
+
+    task = asyncio.create_task(first_sync())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+@asynccontextmanager
+async def sync_lifespan(app):
+    """Runs the background sync loop while the app is up."""
+    task = asyncio.create_task(_sync_loop()) if SYNC_INTERVAL > 0 else None
+    try:
+        yield
+    finally:
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
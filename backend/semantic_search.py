@@ -0,0 +1,233 @@
+"""
+Semantic job search: rank stored postings by similarity to a resume.
+Endpoints (main.py): POST /resumes, GET /jobs/semantic?resume_id=
+
+Every job fetched from Adzuna is embedded once, through Ollama's
+/api/embed, and appended to an on-disk matrix (embedding_store.py); SQLite
+maps each row back to the job. adzuna_service hands fresh results to
+ingest_soon(), and one background task embeds the new ones in batches of
+EMBED_BATCH, so searches never wait for it. Embedding calls are admitted
+like generations (llm_service.embed_texts); ingest queues as a single
+background client, so it never takes more than one fair share of slots.
+
+POST /resumes embeds a resume and returns its resume_id (the hash
+resume_digest uses for the same text); only the vector is stored.
+GET /jobs/semantic then scores the whole matrix against that vector.
+
+Matrices are per embedding model and dimension, so changing
+OLLAMA_EMBED_MODEL starts a new one; resumes must be posted again.
+
+Environment:
+  OLLAMA_EMBED_MODEL  embedding model (default nomic-embed-text)
+  EMBEDDING_DIR       where the matrix files live (default ./embeddings)
+  EMBED_BATCH         texts per embedding call (default 32)
+  SEMANTIC_INGEST     0 stops embedding fetched jobs (default 1)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from database import JobEmbeddingDB, ResumeEmbeddingDB, SessionLocal
+from deadlines import deadline
+from embedding_store import EmbeddingMatrix, normalize, np
+from llm_service import embed_texts
+from models import CleanedJob
+from overload import client_charge, client_key, client_weight
+from resume_digest import resume_hash
+from tracing import current_trace, span
+
+logger = logging.getLogger(__name__)
+
+EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+EMBEDDING_DIR = os.getenv("EMBEDDING_DIR", "embeddings")
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", "32"))
+SEMANTIC_INGEST = os.getenv("SEMANTIC_INGEST", "1").strip().lower() not in ("0", "false", "no")
+
+# Fair-share queue key (overload.py) that background ingest waits under
+INGEST_CLIENT = "background:semantic-ingest"
+
+_matrices: Dict[int, EmbeddingMatrix] = {}
+_pending: Dict[str, CleanedJob] = {}
+_ingest_task: Optional[asyncio.Task] = None
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _model_prefix(model: str) -> str:
+    return f"jobs-{re.sub(r'[^A-Za-z0-9]+', '_', model).strip('_')}-"
+
+
+def matrix_name(model: str, dim: int) -> str:
+    return f"{_model_prefix(model)}{dim}"
+
+
+def _matrix(dim: int) -> EmbeddingMatrix:
+    if dim not in _matrices:
+        _matrices[dim] = EmbeddingMatrix(os.path.join(EMBEDDING_DIR, matrix_name(EMBED_MODEL, dim) + ".f32"), dim)
+    return _matrices[dim]
+
+
+def job_key(job: CleanedJob) -> str:
+    if job.id:
+        return f"{job.country or ''}:{job.id}"
+    content = "\n".join((job.title, job.company, job.description))
+    return "sha1:" + hashlib.sha1(content.encode()).hexdigest()
+
+
+def _job_text(job: CleanedJob) -> str:
+    return f"{job.title}\n{job.company}\n{job.location}\n{job.description}"
+
+
+async def _embed(texts: List[str]) -> "np.ndarray":
+    """Unit-length embeddings for a batch of texts, one Ollama call."""
+    return normalize(await embed_texts(texts, EMBED_MODEL))
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+# ── Ingest ──────────────────────────────────────────────
+
+def _known_keys(keys: Sequence[str], name: Optional[str] = None) -> set:
+    """Keys already stored in matrix `name`, or in any matrix of the current model."""
+    db = SessionLocal()
+    try:
+        matrix = JobEmbeddingDB.matrix == name if name else JobEmbeddingDB.matrix.startswith(_model_prefix(EMBED_MODEL))
+        rows = db.query(JobEmbeddingDB.job_key).filter(matrix, JobEmbeddingDB.job_key.in_(keys))
+        return {key for (key,) in rows}
+    finally:
+        db.close()
+
+
+def _store_batch(jobs: Dict[str, CleanedJob], vectors: "np.ndarray") -> int:
+    """Append the embedded jobs not stored yet; returns how many were added."""
+    matrix = _matrix(vectors.shape[1])
+    name = matrix_name(EMBED_MODEL, matrix.dim)
+    # Checked again under the lock: another worker may have stored some meanwhile
+    with matrix.locked():
+        known = _known_keys(list(jobs), name)
+        new = [i for i, key in enumerate(jobs) if key not in known]
+        if not new:
+            return 0
+        first = matrix.append(vectors[new])
+        keys, created = list(jobs), _now()
+        db = SessionLocal()
+        try:
+            db.add_all(
+                JobEmbeddingDB(matrix=name, row=first + n, job_key=keys[i],
+                               job=jobs[keys[i]].model_dump_json(), created_at=created)
+                for n, i in enumerate(new)
+            )
+            db.commit()
+        finally:
+            db.close()
+    return len(new)
+
+
+async def _ingest_batch(jobs: Dict[str, CleanedJob]) -> int:
+    """Embed and store the jobs not stored yet; returns how many were added."""
+    known = await asyncio.to_thread(_known_keys, list(jobs))
+    jobs = {key: job for key, job in jobs.items() if key not in known}
+    if not jobs:
+        return 0
+    vectors = await _embed([_job_text(job) for job in jobs.values()])
+    return await asyncio.to_thread(_store_batch, jobs, vectors)
+
+
+async def _drain() -> None:
+    # The task inherits the context of the search that started it: drop its
+    # deadline, trace and rate-limit billing, and queue for Ollama as one
+    # background client, so ingest gets one fair share of slots at most
+    deadline.set(None)
+    current_trace.set(None)
+    client_charge.set(None)
+    client_key.set(INGEST_CLIENT)
+    client_weight.set(1)
+    while _pending:
+        batch = {}
+        for key in list(_pending)[:EMBED_BATCH]:
+            batch[key] = _pending.pop(key)
+        try:
+            added = await _ingest_batch(batch)
+            logger.debug("[Semantic] Embedded %s new jobs", added)
+        except Exception as e:
+            # Jobs are offered again the next time a search fetches them
+            logger.warning("[Semantic] Could not embed %s jobs: %s", len(batch), getattr(e, "detail", e))
+            _pending.clear()
+
+
+def ingest_soon(jobs: Sequence[CleanedJob]) -> None:
+    """Queue fetched jobs for embedding; returns at once. Call from the event loop."""
+    global _ingest_task
+    if not SEMANTIC_INGEST or not available() or not jobs:
+        return
+    for job in jobs:
+        _pending.setdefault(job_key(job), job)
+    if _ingest_task is None or _ingest_task.done():
+        _ingest_task = asyncio.get_running_loop().create_task(_drain())
+
+
+# ── Resumes and search ──────────────────────────────────
+
+def _store_resume(resume_id: str, vector: "np.ndarray") -> None:
+    db = SessionLocal()
+    try:
+        db.merge(ResumeEmbeddingDB(resume_id=resume_id, model=EMBED_MODEL,
+                                   vector=vector.astype(np.float32).tobytes(), created_at=_now()))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def embed_resume(resume_text: str) -> str:
+    """Embed and store a resume; returns its resume_id."""
+    resume_id = resume_hash(resume_text)
+    with span("embed"):
+        vectors = await _embed([resume_text])
+    await asyncio.to_thread(_store_resume, resume_id, vectors[0])
+    return resume_id
+
+
+def _search_sync(resume_id: str, limit: int) -> Optional[List[Tuple[CleanedJob, float]]]:
+    db = SessionLocal()
+    try:
+        row = db.get(ResumeEmbeddingDB, (resume_id, EMBED_MODEL))
+        if row is None:
+            return None
+        query = np.frombuffer(row.vector, dtype=np.float32)
+        matrix = _matrix(len(query))
+        start = time.perf_counter()
+        hits = matrix.search(query, limit)
+        logger.debug("[Semantic] Scored %s rows in %.1f ms", matrix.rows(), (time.perf_counter() - start) * 1000)
+        if not hits:
+            return []
+        name = matrix_name(EMBED_MODEL, matrix.dim)
+        stored = {
+            r.row: r.job
+            for r in db.query(JobEmbeddingDB.row, JobEmbeddingDB.job)
+            .filter(JobEmbeddingDB.matrix == name, JobEmbeddingDB.row.in_([hit for hit, _ in hits]))
+        }
+    finally:
+        db.close()
+    # Rows appended by a worker that has not committed their ids yet are skipped
+    return [(CleanedJob.model_validate(json.loads(stored[r])), score) for r, score in hits if r in stored]
+
+
+async def search(resume_id: str, limit: int = 20) -> Optional[List[Tuple[CleanedJob, float]]]:
+    """Stored jobs most similar to the resume, best first; None if the resume was never embedded."""
+    if not available():
+        raise HTTPException(status_code=503, detail="Semantic search is not available (numpy is not installed)")
+    with span("vector-search"):
+        return await asyncio.to_thread(_search_sync, resume_id, limit)
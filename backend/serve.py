@@ -0,0 +1,68 @@
+"""
+Production entry point: several uvicorn worker processes behind one port.
+
+    python serve.py                      # WEB_CONCURRENCY workers on :8000
+    WEB_CONCURRENCY=4 CACHE_BACKEND=sqlite python serve.py
+
+Each worker is a separate process, so bcrypt hashing and JSON/compression
+work use every core. What stays per worker, and how to size it:
+  - job and LLM caches, tracker ETag versions: shared via CACHE_BACKEND
+    (see cache.py). With more than one worker the default "memory" backend
+    is replaced by "sqlite": per-worker ETag versions would let one worker
+    answer 304 for a list another worker just changed
+  - Ollama concurrency (OLLAMA_*_CONCURRENCY, OLLAMA_MAX_QUEUE) and LLM rate
+    limits (LLM_RATE_PER_MINUTE, LLM_BURST) apply per worker: divide by the
+    worker count for a global budget
+  - /metrics reports the worker that answered the scrape
+
+Environment:
+  HOST, PORT        bind address (default 0.0.0.0:8000)
+  WEB_CONCURRENCY   worker processes (default: CPU count, at most 8)
+  FORWARDED_ALLOW_IPS  proxies trusted for X-Forwarded-For (default 127.0.0.1)
+
+For development, `uvicorn main:app --reload` still runs a single process.
+"""
+
+import logging
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def worker_count() -> int:
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    return max(1, min(os.cpu_count() or 1, 8))
+
+
+def main() -> None:
+    workers = worker_count()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if workers > 1 and os.getenv("CACHE_BACKEND", "memory").strip().lower() == "memory":
+        # Set before anything imports cache.py; the workers inherit it
+        os.environ["CACHE_BACKEND"] = "sqlite"
+        logger.warning("[Serve] %s workers need a shared cache store: using CACHE_BACKEND=sqlite", workers)
+
+    # Create/migrate tables once, before the workers race to do it
+    from database import init_db
+
+    init_db()
+    logger.info("[Serve] Starting %s worker(s)", workers)
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=workers,
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Application startup: what runs before (and right after) a worker takes traffic.
+
+Nothing with side effects runs on import any more. The app's lifespan does,
+in order:
+  1. schema check: create missing tables, columns and indexes (database.init_db)
+  2. HTTP pools for Ollama and Adzuna (http_pool.py)
+  3. cache check: one round trip to the shared cache store
+and then starts serving. Warm-ups run in the background while it does:
+  - every routed Ollama model is loaded on every host, in parallel
+  - STARTUP_WARM_SEARCHES are fetched into the job cache
+GET / answers as soon as the worker is up (liveness); GET /ready returns
+503 until the warm-ups are done (readiness), so a load balancer only sends
+traffic to warm workers. A failed warm-up is logged and does not keep the
+worker unready: the breakers and retries handle a host that is down.
+
+Startup time is reported per phase, import and init separately, in one log
+line and in the /ready body. For a per-module import breakdown run
+`python -X importtime -c "import main"`.
+
+Environment:
+  STARTUP_WARM_MODELS     load the Ollama models at startup (default 1)
+  STARTUP_WARM_SEARCHES   job searches to prefetch, ";"-separated "role@location",
+                          e.g. "data analyst@pune;python developer" (default none)
+  STARTUP_WARMUP_TIMEOUT  seconds a warm-up may take before the worker is ready anyway (default 120)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Imported first by main.py, so this is (nearly) the start of the app's own imports
+STARTED = time.perf_counter()
+
+logger = logging.getLogger(__name__)
+
+STARTUP_WARM_MODELS = os.getenv("STARTUP_WARM_MODELS", "1").strip().lower() not in ("0", "false", "no", "")
+STARTUP_WARM_SEARCHES = os.getenv("STARTUP_WARM_SEARCHES", "")
+STARTUP_WARMUP_TIMEOUT = float(os.getenv("STARTUP_WARMUP_TIMEOUT", "120"))
+
+
+class StartupReport:
+    """Milliseconds per startup phase, in the order they ran."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.warmup: Dict[str, Optional[float]] = {}  # warmed item -> seconds, None if it failed
+        self.ready = False
+        self._last = STARTED
+
+    def mark(self, phase: str) -> None:
+        """Record the time since the previous mark as `phase`."""
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self._last) * 1000, 1)
+        self._last = now
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "phases_ms": dict(self.phases),
+            "since_start_ms": round((time.perf_counter() - STARTED) * 1000, 1),
+            "warmup": {name: None if seconds is None else round(seconds * 1000, 1) for name, seconds in self.warmup.items()},
+        }
+
+    def log(self) -> None:
+        logger.info(
+            "[Startup] %s: %s", "ready" if self.ready else "serving",
+            ", ".join(f"{phase} {ms:.0f} ms" for phase, ms in self.phases.items()),
+            extra={"startup": self.as_dict()},
+        )
+
+
+REPORT = StartupReport()
+
+
+def parse_warm_searches(spec: str) -> List[Tuple[str, str]]:
+    """'data analyst@pune;python developer' -> [("data analyst", "pune"), ("python developer", "")]"""
+    searches = []
+    for item in spec.split(";"):
+        role, _, location = item.partition("@")
+        if role.strip():
+            searches.append((role.strip(), location.strip()))
+    return searches
+
+
+# ── Init (before serving) ───────────────────────────────
+
+def _init() -> None:
+    from cache import STORE
+    from database import init_db
+    import http_pool
+
+    init_db()
+    REPORT.mark("init:schema")
+    http_pool.session("ollama")
+    http_pool.session("adzuna")
+    REPORT.mark("init:http_pools")
+    try:
+        STORE.instance_id()
+    except Exception as e:
+        # Shared caches already degrade to misses on errors
+        logger.warning("[Startup] Cache store unreachable: %s", e)
+    REPORT.mark("init:cache")
+
+
+# ── Warm-up (while serving) ─────────────────────────────
+
+async def _warm_models() -> None:
+    from llm_service import warm_up_models
+
+    REPORT.warmup.update(await warm_up_models(timeout=STARTUP_WARMUP_TIMEOUT))
+
+
+async def _warm_search(role: str, location: str) -> None:
+    from adzuna_service import fetch_jobs
+
+    start = time.perf_counter()
+    try:
+        await fetch_jobs(role, location, False, "")
+        REPORT.warmup[f"jobs:{role}@{location}"] = time.perf_counter() - start
+    except Exception as e:
+        logger.warning("[Startup] Could not prefetch %r in %r: %s", role, location, e)
+        REPORT.warmup[f"jobs:{role}@{location}"] = None
+
+
+async def _warm_up() -> None:
+    start = time.perf_counter()
+    tasks = [_warm_search(role, location) for role, location in parse_warm_searches(STARTUP_WARM_SEARCHES)]
+    if STARTUP_WARM_MODELS:
+        tasks.append(_warm_models())
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks), STARTUP_WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("[Startup] Warm-up still running after %.0fs, marking ready", STARTUP_WARMUP_TIMEOUT)
+    REPORT.phases["warmup"] = round((time.perf_counter() - start) * 1000, 1)
+    REPORT.ready = True
+    REPORT.log()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """App lifespan: init before the first request, warm-ups in the background, pools closed on exit."""
+    import http_pool
+    from llm_service import OLLAMA_POOL
+
+    REPORT.mark("app:setup")
+    await asyncio.to_thread(_init)
+    REPORT.log()
+    warm_up = asyncio.create_task(_warm_up(), name="startup-warm-up")
+    try:
+        yield
+    finally:
+        warm_up.cancel()
+        OLLAMA_POOL.close()
+        http_pool.close_all()
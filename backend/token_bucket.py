@@ -0,0 +1,68 @@
+"""
+Token buckets: TokenBucket for one caller, KeyedRateLimiter for many.
+
+Used for inbound limits (per client on the LLM routes, see rate_limit.py)
+and outbound ones (per Adzuna country, see adzuna_service.py). Thread-safe.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate  # tokens per second
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1) -> Tuple[bool, float]:
+        """Spend cost tokens if available. Returns (allowed, seconds until it would be)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+        return False, (cost - self.tokens) / self.rate
+
+    def charge(self, cost: float) -> None:
+        """Spend cost tokens unconditionally; the bucket may go negative (into debt)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - cost
+        self.updated = now
+
+
+class KeyedRateLimiter:
+    """One TokenBucket per key; the least recently used buckets are dropped past max_keys."""
+
+    def __init__(self, rate_per_minute: float, burst: float, max_keys: int = 10000):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: str) -> TokenBucket:
+        # Called with the lock held
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def take(self, key: str, cost: float = 1) -> Tuple[bool, float]:
+        # A request costing more than the bucket holds could never pass
+        cost = min(cost, self.burst)
+        with self._lock:
+            return self._bucket(key).take(cost)
+
+    def charge(self, key: str, cost: float) -> None:
+        """Bill work found only after admission; later requests wait until the debt is repaid."""
+        with self._lock:
+            self._bucket(key).charge(cost)
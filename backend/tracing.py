@@ -0,0 +1,164 @@
+"""
+Per-request tracing: a trace ID and timed spans, reported to the browser and the logs.
+
+TracingMiddleware gives every HTTP request a trace ID (the caller's W3C
+`traceparent` or `X-Request-ID` if sent, otherwise a new one) and publishes
+a Trace in a context variable. Code anywhere below the route - including
+worker threads started with asyncio.to_thread - adds spans to it:
+
+    with span("prompt"):
+        messages = match_messages(...)
+    add_span("generation", seconds)       # measured elsewhere, e.g. by Ollama
+
+Spans with the same name are summed. The response carries them as a
+`Server-Timing` header (shown in the browser devtools timing tab) plus
+`X-Trace-Id`, and one structured log record per request lists them with the
+trace ID. Every log record written during the request gets a `trace_id`
+attribute (printed by LOG_FORMAT=json).
+
+Streamed responses send their headers before the work is done, so their
+Server-Timing only covers what happened before the first byte; the log
+record has the full breakdown.
+"""
+
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-[0-9a-f]{2}$")
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.start = time.perf_counter()
+        self._spans: Dict[str, List[float]] = {}  # name -> [seconds, count]
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._spans.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def spans(self) -> Dict[str, Tuple[float, int]]:
+        with self._lock:
+            return {name: (seconds, count) for name, (seconds, count) in self._spans.items()}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """Server-Timing header value; durations in milliseconds."""
+        parts = []
+        for name, (seconds, count) in self.spans().items():
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if count > 1:
+                part += f';desc="{count}x"'
+            parts.append(part)
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def traceparent(self) -> str:
+        """W3C traceparent for outgoing calls, so upstream logs carry the same trace ID."""
+        return f"00-{self.trace_id}-{uuid.uuid4().hex[:16]}-01"
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def add_span(name: str, seconds: Optional[float]) -> None:
+    """Add a measured duration to the current request's trace; no-op outside a request."""
+    trace = current_trace.get()
+    if trace is not None and seconds is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+
+
+def trace_headers() -> Dict[str, str]:
+    """Headers that propagate the current trace to an upstream HTTP call."""
+    trace = current_trace.get()
+    return {"traceparent": trace.traceparent()} if trace is not None else {}
+
+
+def _incoming_trace_id(headers: Headers) -> Optional[str]:
+    match = _TRACEPARENT_RE.match(headers.get("traceparent", "").strip().lower())
+    if match and match.group(1) != "0" * 32:
+        return match.group(1)
+    request_id = headers.get("x-request-id", "").strip()
+    return request_id if _REQUEST_ID_RE.match(request_id) else None
+
+
+class TraceIdFilter(logging.Filter):
+    """Stamps records logged during a request with its trace ID."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace.get()
+        if trace is not None and not hasattr(record, "trace_id"):
+            record.trace_id = trace.trace_id
+        return True
+
+
+class TracingMiddleware:
+    """Starts a Trace per HTTP request and reports it in headers and one log record."""
+
+    def __init__(self, app: ASGIApp, timing_allow_origins: Sequence[str] = ()):
+        self.app = app
+        # Lets cross-origin pages (the frontend dev servers) read the timings
+        self.timing_allow_origin = ", ".join(timing_allow_origins)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(_incoming_trace_id(Headers(scope=scope)))
+        token = current_trace.set(trace)
+        status = {"code": 500}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", trace.server_timing())
+                headers["X-Trace-Id"] = trace.trace_id
+                if self.timing_allow_origin:
+                    headers["Timing-Allow-Origin"] = self.timing_allow_origin
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            duration_ms = round(trace.elapsed() * 1000, 1)
+            spans = {name: round(seconds * 1000, 1) for name, (seconds, _) in trace.spans().items()}
+            logger.info(
+                "[Trace] %s %s %s %s in %.1f ms %s", trace.trace_id, scope["method"], route, status["code"], duration_ms,
+                " ".join(f"{name}={ms}" for name, ms in spans.items()),
+                extra={"trace_id": trace.trace_id, "route": route, "status": status["code"],
+                       "duration_ms": duration_ms, "spans": spans},
+            )
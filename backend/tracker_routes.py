@@ -1,20 +1,43 @@
 """
 Job Tracker — SQLite-backed, auth-protected.
-Endpoints: POST /track-job, GET /tracked-jobs, PUT /update-status/{job_id}
+Endpoints: POST /track-job, POST /track-jobs/bulk, GET /tracked-jobs,
+PUT /update-status/{job_id}, PUT /update-status/bulk
 """
 
+import logging
 import uuid
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from database import get_db, User, TrackedJobDB
-from auth_routes import get_current_user
+from cache import STORE
+from database import get_db, has_tracked_job_source_index, User, TrackedJobDB
+from auth_routes import get_current_user, get_token_subject
+from http_cache import weak_etag, etag_matches, not_modified
+from responses import ORJSONResponse, dump_models
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Job Tracker"])
 
+MAX_BULK_ITEMS = 100
+
+# Clients must revalidate every time; revalidation is a counter lookup
+TRACKER_CACHE_CONTROL = "private, no-cache"
+
+# Per-user write counters backing the /tracked-jobs ETag live in the cache
+# store, so every worker sees every write. The store's instance id keeps ETags
+# from before a restart (when the counters started over at 0) from matching.
+# When a bump fails, a "stale" flag in the store stops every worker from
+# sending that user's ETag until a later bump succeeds. _unversioned covers
+# this worker for when the store cannot take the flag either.
+_unversioned = set()
+
 # ── Pydantic schemas ────────────────────────────────────
 
 class TrackJobRequest(BaseModel):
@@ -22,8 +45,12 @@ class TrackJobRequest(BaseModel):
     company: str
     location: str = ""
     apply_link: str = ""
+    source_job_id: Optional[str] = None  # CleanedJob.id from Adzuna
+    country: Optional[str] = None  # CleanedJob.country; Adzuna ids are only unique within one country
 
 class TrackedJob(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     title: str
     company: str
@@ -31,19 +58,136 @@ class TrackedJob(BaseModel):
     apply_link: str
     status: str = "Applied"
     applied_date: str = ""
+    source_job_id: Optional[str] = None
+    country: str = ""
 
 class UpdateStatusRequest(BaseModel):
     status: str
 
+class BulkTrackJobsRequest(BaseModel):
+    jobs: List[TrackJobRequest] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+class BulkTrackResult(BaseModel):
+    index: int
+    result: str  # "created", "updated" or "duplicate" (repeated within the batch)
+    job: TrackedJob
+
+class BulkStatusUpdate(BaseModel):
+    id: str
+    status: str
+
+class BulkUpdateStatusRequest(BaseModel):
+    updates: List[BulkStatusUpdate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+class BulkStatusResult(BaseModel):
+    id: str
+    ok: bool
+    job: Optional[TrackedJob] = None
+    error: Optional[str] = None
+
+# ── Helpers ─────────────────────────────────────────────
+
+def _country(req: TrackJobRequest) -> str:
+    return (req.country or "").strip().lower()
+
+def _find_by_source(db: Session, user_id: int, country: str, source_job_id: str) -> Optional[TrackedJobDB]:
+    """The user's row for this posting; a row saved before countries were kept ("") also counts."""
+    rows = (
+        db.query(TrackedJobDB)
+        .filter(
+            TrackedJobDB.user_id == user_id,
+            TrackedJobDB.source_job_id == source_job_id,
+            TrackedJobDB.country.in_({country, ""}),
+        )
+        .all()
+    )
+    return next((row for row in rows if row.country == country), rows[0] if rows else None)
+
+def _resolve_conflicts(db: Session, user_id: int, inserts: list, updates: list, results: List[BulkTrackResult]) -> None:
+    """
+    After an ON CONFLICT DO NOTHING insert: point results whose row was
+    skipped (a concurrent save stored the posting first) at the stored row,
+    and queue that row for the same in-place update as an existing one.
+    """
+    attempted = {
+        (values["country"], values["source_job_id"]): values["id"] for values in inserts if values["source_job_id"]
+    }
+    if not attempted:
+        return
+    stored = {
+        (row.country, row.source_job_id): row
+        for row in db.query(TrackedJobDB).filter(
+            TrackedJobDB.user_id == user_id,
+            TrackedJobDB.source_job_id.in_({sid for _, sid in attempted}),
+        )
+    }
+    for result in results:
+        key = (result.job.country, result.job.source_job_id)
+        row = stored.get(key)
+        if row is None or row.id == attempted.get(key) or result.job.id != attempted.get(key):
+            continue
+        result.job.id = row.id
+        result.job.status = row.status or "Applied"
+        result.job.applied_date = row.applied_date or ""
+        if result.result == "created":
+            result.result = "updated"
+            updates.append({
+                "id": row.id, **result.job.model_dump(include={"title", "company", "location", "apply_link", "country"})
+            })
+
+def _bump_tracker_version(email: str) -> None:
+    # The write is already committed: a cache outage must not fail the request
+    try:
+        # Cleared before the bump: a bump that follows the clear is also after
+        # the commit whose failed bump set the flag
+        STORE.delete(f"tracker_stale:{email}")
+        STORE.incr(f"tracker_version:{email}")
+        _unversioned.discard(email)
+    except Exception as e:
+        logger.warning("[Tracker] Could not bump the ETag version for %s: %s", email, e)
+        _unversioned.add(email)
+        try:
+            STORE.set(f"tracker_stale:{email}", b"1", None)
+        except Exception as e:
+            logger.warning("[Tracker] Could not flag the ETag of %s as stale: %s", email, e)
+
+def _tracker_etag(email: str) -> Optional[str]:
+    """Current ETag of the user's list; None (no ETag, no 304) when the counter can't be trusted."""
+    if email in _unversioned:
+        return None
+    try:
+        if STORE.get(f"tracker_stale:{email}") is not None:
+            return None
+        return weak_etag("tracker", STORE.instance_id(), email, STORE.get_int(f"tracker_version:{email}"))
+    except Exception as e:
+        logger.warning("[Tracker] Could not read the ETag version for %s: %s", email, e)
+        return None
+
 # ── Routes (all require auth) ───────────────────────────
 
 @router.post("/track-job", response_model=TrackedJob)
 async def track_job(
     req: TrackJobRequest,
     current_user: User = Depends(get_current_user),
+    email: str = Depends(get_token_subject),
     db: Session = Depends(get_db),
 ):
-    """Save a job to the tracker."""
+    """
+    Save a job to the tracker.
+    Idempotent per Adzuna posting (country and id): re-saving a tracked
+    posting returns the existing row.
+    """
+    country = _country(req)
+    if req.source_job_id:
+        existing = _find_by_source(db, current_user.id, country, req.source_job_id)
+        if existing and existing.country != country:
+            # Saved before countries were kept: this is the posting, now with its country
+            existing.country = country
+            db.commit()
+            _bump_tracker_version(email)
+        if existing:
+            return existing
+
     job = TrackedJobDB(
         id=str(uuid.uuid4()),
         user_id=current_user.id,
@@ -52,22 +196,183 @@ async def track_job(
         location=req.location,
         apply_link=req.apply_link,
         status="Applied",
-        applied_date=""
+        applied_date="",
+        source_job_id=req.source_job_id,
+        country=country,
     )
     db.add(job)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent save of the same posting
+        db.rollback()
+        existing = _find_by_source(db, current_user.id, country, req.source_job_id)
+        if existing is None:
+            raise
+        return existing
+    _bump_tracker_version(email)
     db.refresh(job)
     return job
 
 
+@router.post("/track-jobs/bulk", response_model=List[BulkTrackResult])
+async def track_jobs_bulk(
+    req: BulkTrackJobsRequest,
+    current_user: User = Depends(get_current_user),
+    email: str = Depends(get_token_subject),
+    db: Session = Depends(get_db),
+):
+    """
+    Save many jobs in one transaction.
+    Jobs already tracked as the same Adzuna posting (country and id) are
+    updated in place (status is kept); repeats inside the batch are
+    reported as duplicates.
+    """
+    source_ids = {item.source_job_id for item in req.jobs if item.source_job_id}
+    existing, legacy = {}, {}
+    if source_ids:
+        rows = (
+            db.query(TrackedJobDB)
+            .filter(
+                TrackedJobDB.user_id == current_user.id,
+                TrackedJobDB.source_job_id.in_(source_ids),
+            )
+            .all()
+        )
+        existing = {(row.country, row.source_job_id): row for row in rows}
+        # Saved before countries were kept: claimed by the first item with that id
+        legacy = {row.source_job_id: row for row in rows if row.country == ""}
+
+    inserts, updates, results = [], [], []
+    seen = {}
+
+    for idx, item in enumerate(req.jobs):
+        sid = item.source_job_id
+        key = (_country(item), sid)
+        if sid and key in seen:
+            results.append(BulkTrackResult(index=idx, result="duplicate", job=seen[key]))
+            continue
+
+        fields = {
+            "title": item.title,
+            "company": item.company,
+            "location": item.location,
+            "apply_link": item.apply_link,
+            "country": key[0],
+        }
+        row = (existing.get(key) or legacy.get(sid)) if sid else None
+        if row is not None and row.country == "":
+            legacy.pop(sid, None)
+            existing.pop(("", sid), None)
+        if row is not None:
+            updates.append({"id": row.id, **fields})
+            job = TrackedJob(
+                id=row.id,
+                status=row.status or "Applied",
+                applied_date=row.applied_date or "",
+                source_job_id=sid,
+                **fields,
+            )
+            outcome = "updated"
+        else:
+            values = {
+                "id": str(uuid.uuid4()),
+                "user_id": current_user.id,
+                "status": "Applied",
+                "applied_date": "",
+                "source_job_id": sid,
+                **fields,
+            }
+            inserts.append(values)
+            job = TrackedJob(**values)
+            outcome = "created"
+
+        if sid:
+            seen[key] = job
+        results.append(BulkTrackResult(index=idx, result=outcome, job=job))
+
+    # executemany-style batches, one commit for the whole request.
+    if inserts and has_tracked_job_source_index():
+        # ON CONFLICT DO NOTHING keeps concurrent bulk saves from failing the
+        # batch; rows that lost the race are then updated like existing ones
+        db.execute(
+            insert(TrackedJobDB).on_conflict_do_nothing(
+                index_elements=["user_id", "country", "source_job_id"]
+            ),
+            inserts,
+        )
+        _resolve_conflicts(db, current_user.id, inserts, updates, results)
+    elif inserts:
+        # No unique index (an uncompacted old database): nothing to conflict
+        # on, so this is /track-job's check-then-insert for each row
+        db.execute(insert(TrackedJobDB), inserts)
+    if updates:
+        db.execute(update(TrackedJobDB), updates)
+    db.commit()
+    _bump_tracker_version(email)
+    return results
+
+
 @router.get("/tracked-jobs", response_model=List[TrackedJob])
 async def get_tracked_jobs(
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    email: str = Depends(get_token_subject),
     db: Session = Depends(get_db),
 ):
-    """Return tracked jobs belonging to the logged-in user."""
+    """
+    Return tracked jobs belonging to the logged-in user.
+    Supports If-None-Match: an unchanged list answers 304 without a query.
+    """
+    etag = _tracker_etag(email)
+    if etag is not None and etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, TRACKER_CACHE_CONTROL)
+
+    current_user = get_current_user(email, db)
     rows = db.query(TrackedJobDB).filter(TrackedJobDB.user_id == current_user.id).all()
-    return rows
+    jobs = [TrackedJob.model_validate(row) for row in rows]
+    headers = {"Cache-Control": TRACKER_CACHE_CONTROL}
+    if etag is not None:
+        headers["ETag"] = etag
+    return ORJSONResponse(dump_models(jobs), headers=headers)
+
+
+# Registered before /update-status/{job_id} so "bulk" is not taken as a job id
+@router.put("/update-status/bulk", response_model=List[BulkStatusResult])
+async def update_status_bulk(
+    req: BulkUpdateStatusRequest,
+    current_user: User = Depends(get_current_user),
+    email: str = Depends(get_token_subject),
+    db: Session = Depends(get_db),
+):
+    """Update the status of many tracked jobs in one transaction."""
+    # Last write wins when the same id appears twice
+    wanted = {item.id: item.status for item in req.updates}
+    rows = (
+        db.query(TrackedJobDB)
+        .filter(TrackedJobDB.user_id == current_user.id, TrackedJobDB.id.in_(wanted))
+        .all()
+    )
+    owned = {row.id: row for row in rows}
+
+    # Build responses before commit; committing expires the loaded rows
+    results = []
+    for job_id, new_status in wanted.items():
+        row = owned.get(job_id)
+        if row is None:
+            results.append(BulkStatusResult(id=job_id, ok=False, error=f"Job {job_id} not found"))
+            continue
+        job = TrackedJob.model_validate(row)
+        job.status = new_status
+        results.append(BulkStatusResult(id=job_id, ok=True, job=job))
+
+    if owned:
+        db.execute(
+            update(TrackedJobDB),
+            [{"id": job_id, "status": wanted[job_id]} for job_id in owned],
+        )
+        db.commit()
+        _bump_tracker_version(email)
+    return results
 
 
 @router.put("/update-status/{job_id}", response_model=TrackedJob)
@@ -75,6 +380,7 @@ async def update_status(
     job_id: str,
     req: UpdateStatusRequest,
     current_user: User = Depends(get_current_user),
+    email: str = Depends(get_token_subject),
     db: Session = Depends(get_db),
 ):
     """Update the status of a tracked job (must belong to user)."""
@@ -88,5 +394,6 @@ async def update_status(
 
     job.status = req.status
     db.commit()
+    _bump_tracker_version(email)
     db.refresh(job)
     return job
@@ -0,0 +1,154 @@
+"""
+WebSocket session channel — search, match, analyze and cover letters over one connection.
+Endpoint: WS /ws
+
+The client authenticates once, with its first frame:
+    {"op": "auth", "token": "<JWT>"}
+and gets {"type": "ready", "ops": [...], "max_in_flight": 4} back (or the
+socket is closed with code 4401). After that, every request reuses the
+connection and the user looked up here, instead of paying a bearer-token
+check, user query and HTTP round trip each. Operations and their params:
+    search        role, location, last_24, experience_level, countries  (as GET /jobs)
+    match         resume_text, jobs    one "partial" frame per scored job (as /match-jobs/stream)
+    analyze       resume_text, job_description
+    cover_letter  resume_text, job_description, company
+Framing, cancellation and backpressure: see ws_session.py. The LLM
+operations are charged to the user's rate-limit bucket like the HTTP
+routes, and get the same deadlines.
+
+Environment:
+  WS_AUTH_TIMEOUT  seconds to wait for the auth frame (default 10)
+"""
+
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field
+
+from adzuna_service import fetch_jobs, parse_countries
+from auth_routes import decode_token
+from database import SessionLocal, User
+from llm_service import analyze_resume, check_llm_capacity, generate_cover_letter, match_jobs_stream
+from metrics import LLM_RATE_LIMITED
+from models import AnalyzeResumeRequest, GenerateCoverLetterRequest, MatchJobsRequest
+from overload import client_key, client_weight
+from rate_limit import CLIENT_WEIGHTS, LLM_LIMITER
+from responses import dump_models
+from ws_session import Channel, Emit, Operation
+
+logger = logging.getLogger(__name__)
+
+WS_AUTH_TIMEOUT = float(os.getenv("WS_AUTH_TIMEOUT", "10"))
+
+# Application close code for a missing or invalid token (4000-4999 are free to use)
+CLOSE_UNAUTHORIZED = 4401
+
+router = APIRouter(tags=["WebSocket"])
+
+# ── Operations ──────────────────────────────────────────
+
+class JobSearchParams(BaseModel):
+    role: str = Field(..., min_length=1)
+    location: str = ""
+    last_24: bool = False
+    experience_level: str = ""
+    countries: str = ""  # Adzuna country codes, e.g. "in,gb"; default ADZUNA_COUNTRIES
+
+
+async def _search(params: dict, emit: Emit) -> list:
+    req = JobSearchParams.model_validate(params)
+    try:
+        countries = parse_countries(req.countries)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    jobs = await fetch_jobs(req.role, req.location, req.last_24, req.experience_level, countries)
+    return dump_models(jobs)
+
+
+async def _match(params: dict, emit: Emit) -> dict:
+    req = MatchJobsRequest.model_validate(params)
+    check_llm_capacity()
+    jobs_dicts = [{"title": job.title, "description": job.description, "company": job.company} for job in req.jobs]
+    count = 0
+    async for result in match_jobs_stream(req.resume_text, jobs_dicts):
+        count += 1
+        await emit(result.model_dump(mode="json"))
+    return {"count": count}
+
+
+async def _analyze(params: dict, emit: Emit) -> dict:
+    req = AnalyzeResumeRequest.model_validate(params)
+    result = await analyze_resume(req.resume_text, req.job_description)
+    return result.model_dump(mode="json")
+
+
+async def _cover_letter(params: dict, emit: Emit) -> dict:
+    req = GenerateCoverLetterRequest.model_validate(params)
+    result = await generate_cover_letter(req.resume_text, req.job_description, req.company)
+    return result.model_dump(mode="json")
+
+
+# Budgets and costs as on the HTTP routes (main.py)
+OPERATIONS = {
+    "search": Operation(_search),
+    "match": Operation(_match, budget=150, cost=1),
+    "analyze": Operation(_analyze, budget=150, cost=1),
+    "cover_letter": Operation(_cover_letter, budget=150, cost=1),
+}
+
+# ── Route ───────────────────────────────────────────────
+
+def _user_exists(email: str) -> bool:
+    db = SessionLocal()
+    try:
+        return db.query(User.id).filter(User.email == email).first() is not None
+    finally:
+        db.close()
+
+
+async def _authenticate(websocket: WebSocket) -> Optional[str]:
+    """Email of the user named by the auth frame, or None."""
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), WS_AUTH_TIMEOUT)
+    except (asyncio.TimeoutError, ValueError):
+        return None
+    if not isinstance(message, dict) or message.get("op") != "auth":
+        return None
+    try:
+        email = decode_token(str(message.get("token") or ""))
+    except HTTPException:
+        return None
+    return email if await asyncio.to_thread(_user_exists, email) else None
+
+
+@router.websocket("/ws")
+async def session_channel(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        email = await _authenticate(websocket)
+    except WebSocketDisconnect:
+        return
+    if email is None:
+        await websocket.close(code=CLOSE_UNAUTHORIZED, reason="Invalid or missing token")
+        return
+
+    # Set once; every operation task inherits them (fair queueing in overload.py)
+    key = f"user:{email}"
+    client_key.set(key)
+    client_weight.set(CLIENT_WEIGHTS.get(email, 1))
+
+    def admit(cost: int) -> Optional[float]:
+        allowed, wait = LLM_LIMITER.take(key, cost)
+        if allowed:
+            return None
+        LLM_RATE_LIMITED.inc(kind="user")
+        return wait
+
+    channel = Channel(websocket, OPERATIONS, admit=admit)
+    await channel.send({"type": "ready", "ops": sorted(OPERATIONS), "max_in_flight": channel.max_in_flight})
+    logger.info("[WS] Channel opened for %s", email)
+    await channel.run()
+    logger.info("[WS] Channel closed for %s", email)
@@ -0,0 +1,225 @@
+"""
+One WebSocket connection carrying many concurrent operations (see ws_routes.py).
+
+Client -> server, one JSON object per text frame:
+    {"id": "r1", "op": "match", "params": {...}, "timeout": 30}
+    {"id": "r1", "op": "cancel"}
+Server -> client:
+    {"id": "r1", "type": "partial", "data": ...}   streamed piece (e.g. one match)
+    {"id": "r1", "type": "result", "data": ..., "timing": {"prompt-eval": 812.4, ...}}
+    {"id": "r1", "type": "error", "status": 429, "detail": "...", "retry_after": 6}
+
+Every operation runs as its own task, so results are pushed as they
+complete, in any order; the id ties them to the request. `timeout` works
+like X-Request-Timeout: it can shorten the operation's budget, not extend it.
+
+Backpressure, per connection:
+  - at most WS_MAX_IN_FLIGHT operations run at once; more are refused with
+    429 right away (cancel always gets through)
+  - outgoing frames wait in a queue of WS_SEND_QUEUE; when the client reads
+    slower than results arrive, the operations producing them pause instead
+    of buffering without bound
+  - replies to the requests themselves (errors, cancel acknowledgements) are
+    never waited for: if the queue is full, the client is sending requests
+    without reading answers, and the connection is closed with 1008
+
+The reader and the writer run as two tasks. When either ends (disconnect,
+failed send, overflow), the other and every operation are cancelled, so a
+dead socket never holds an Ollama slot.
+
+Environment:
+  WS_MAX_IN_FLIGHT  concurrent operations per connection (default 4)
+  WS_SEND_QUEUE     frames buffered per connection before producers wait (default 64)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from deadlines import deadline
+from metrics import WS_OPERATION_SECONDS, register_ws_channels
+from responses import dumps
+from tracing import Trace, current_trace
+
+logger = logging.getLogger(__name__)
+
+WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", "4"))
+WS_SEND_QUEUE = int(os.getenv("WS_SEND_QUEUE", "64"))
+
+# Close code when the client stops reading its replies (policy violation)
+CLOSE_NOT_READING = 1008
+
+Emit = Callable[[Any], Awaitable[None]]
+
+
+class _NotReading(Exception):
+    """The send queue was full when a reply to a request had to go out."""
+
+
+_channels: Set["Channel"] = set()
+register_ws_channels(_channels)
+
+
+@dataclass
+class Operation:
+    handler: Callable[[dict, Emit], Awaitable[Any]]  # (params, emit partial) -> result
+    budget: Optional[float] = None  # seconds, as the matching HTTP route's deadline
+    cost: int = 0  # LLM rate-limit tokens, see rate_limit.py
+
+
+class Channel:
+    """Runs the operations of one authenticated connection and sends their frames back."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        operations: Dict[str, Operation],
+        admit: Callable[[int], Optional[float]] = lambda cost: None,
+        max_in_flight: int = WS_MAX_IN_FLIGHT,
+        send_queue: int = WS_SEND_QUEUE,
+    ):
+        self.websocket = websocket
+        self.operations = operations
+        self.admit = admit  # cost -> None if allowed, else seconds to wait
+        self.max_in_flight = max_in_flight
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=send_queue)
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def send(self, message: dict) -> None:
+        """Queue a frame; waits while the queue is full (the client is not keeping up)."""
+        await self._outbox.put(dumps(message).decode("utf-8"))
+
+    async def error(self, request_id: Any, status: int, detail: Any, **extra) -> None:
+        await self.send({"id": request_id, "type": "error", "status": status, "detail": detail, **extra})
+
+    def _reply_error(self, request_id: Any, status: int, detail: Any, **extra) -> None:
+        """Queue an error from the read loop, which must never wait on the writer."""
+        try:
+            self._outbox.put_nowait(dumps({"id": request_id, "type": "error", "status": status, "detail": detail, **extra}).decode("utf-8"))
+        except asyncio.QueueFull:
+            raise _NotReading()
+
+    async def run(self) -> None:
+        """Read requests until the client disconnects or stops reading; in-flight operations are then cancelled."""
+        reader = asyncio.create_task(self._read())
+        writer = asyncio.create_task(self._write())
+        _channels.add(self)
+        try:
+            done, _ = await asyncio.wait({reader, writer}, return_when=asyncio.FIRST_COMPLETED)
+            if writer in done:
+                logger.info("[WS] Send failed, closing the channel: %s", writer.exception())
+            if reader in done and isinstance(reader.exception(), _NotReading):
+                logger.warning("[WS] Client is not reading its replies, closing the channel")
+                await self._close(CLOSE_NOT_READING, "Send queue full: read the replies")
+            elif reader in done and reader.exception() is not None:
+                logger.info("[WS] Receive failed, closing the channel: %s", reader.exception())
+        finally:
+            _channels.discard(self)
+            for task in list(self._tasks.values()):
+                task.cancel()
+            reader.cancel()
+            writer.cancel()
+            # wait() rather than gather(): if this task is cancelled meanwhile, the
+            # CancelledError raised here is its own, not one of the children's
+            await asyncio.wait([reader, writer, *self._tasks.values()])
+
+    async def _close(self, code: int, reason: str) -> None:
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass  # already gone
+
+    async def _read(self) -> None:
+        try:
+            while True:
+                self._dispatch(await self.websocket.receive_text())
+        except WebSocketDisconnect:
+            pass
+
+    async def _write(self) -> None:
+        while True:
+            await self.websocket.send_text(await self._outbox.get())
+
+    def _dispatch(self, text: str) -> None:
+        try:
+            message = json.loads(text)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict) or not isinstance(message.get("id"), (str, int)):
+            self._reply_error(None, 400, "Expected a JSON object with an id")
+            return
+        request_id, op = message["id"], message.get("op")
+
+        if op == "cancel":
+            task = self._tasks.get(request_id)
+            # Finished operations have already sent their result; nothing to answer
+            if task is not None and task.cancel():
+                self._reply_error(request_id, 499, "Cancelled")
+            return
+        operation = self.operations.get(op)
+        if operation is None:
+            self._reply_error(request_id, 400, f"Unknown op {op!r}; expected one of {sorted(self.operations)} or 'cancel'")
+            return
+        if request_id in self._tasks:
+            self._reply_error(request_id, 409, "An operation with this id is still running")
+            return
+        if self.in_flight >= self.max_in_flight:
+            self._reply_error(request_id, 429, f"At most {self.max_in_flight} operations in flight per connection")
+            return
+        wait = self.admit(operation.cost) if operation.cost else None
+        if wait is not None:
+            self._reply_error(request_id, 429, "Too many AI requests. Please slow down.", retry_after=max(1, round(wait)))
+            return
+
+        params = message.get("params") or {}
+        budget = operation.budget
+        if isinstance(message.get("timeout"), (int, float)):
+            budget = min(budget, max(0.0, message["timeout"])) if budget else max(0.0, message["timeout"])
+        task = asyncio.create_task(self._run_operation(request_id, op, operation, params, budget))
+        self._tasks[request_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(request_id, None))
+
+    async def _run_operation(self, request_id: Any, op: str, operation: Operation, params: dict, budget: Optional[float]) -> None:
+        # Own task, own context: the trace and deadline belong to this operation only
+        trace = Trace()
+        current_trace.set(trace)
+        if budget is not None:
+            deadline.set(time.monotonic() + budget)
+
+        async def emit(data: Any) -> None:
+            await self.send({"id": request_id, "type": "partial", "data": data})
+
+        outcome = "ok"
+        try:
+            result = await operation.handler(params, emit)
+            timing = {name: round(seconds * 1000, 1) for name, (seconds, _) in trace.spans().items()}
+            await self.send({"id": request_id, "type": "result", "data": result, "timing": timing})
+        except asyncio.CancelledError:
+            # By a cancel message (answered in _dispatch) or a closed connection
+            outcome = "cancelled"
+            raise
+        except ValidationError as e:
+            outcome = "invalid"
+            await self.error(request_id, 422, json.loads(e.json(include_url=False)))
+        except HTTPException as e:
+            outcome = "error"
+            await self.error(request_id, e.status_code, e.detail)
+        except Exception as e:
+            outcome = "error"
+            logger.error("[WS] %s %s failed: %s", op, request_id, e)
+            await self.error(request_id, 500, str(e))
+        finally:
+            WS_OPERATION_SECONDS.observe(trace.elapsed(), op=op, outcome=outcome)
+            logger.info("[WS] %s %s %s in %.1f ms", op, request_id, outcome, trace.elapsed() * 1000,
+                        extra={"trace_id": trace.trace_id})
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: parsing malformed llama3 output.
+
+Runs every case in corpus/llama3_malformed.jsonl through the previous
+multi-pass regex parser and the current single-pass extractor
+(json_extract.loads_tolerant), and reports which cases each one recovers
+and the time per case. Neither does any instrumentation. The production
+entry point, llm_service._parse_llm_json, is timed separately, so the cost
+of its metrics and span shows up as its own row. Under the old
+call_llm_safe every unrecovered case cost a second Ollama generation.
+
+Usage: python benchmarks/bench_json_parse.py [--rounds 2000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from json_extract import loads_tolerant
+from llm_service import _parse_llm_json
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "llama3_malformed.jsonl")
+
+
+def legacy_parse(text: str, expect_array: bool):
+    """The pre-extractor strategy chain: strip fences, greedy regex, drop bad escapes, drop all backslashes."""
+    try:
+        return json.loads(text), True
+    except json.JSONDecodeError:
+        pass
+    cleaned = text.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    elif cleaned.startswith("```"):
+        cleaned = cleaned[3:]
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+    cleaned = cleaned.strip()
+    try:
+        return json.loads(cleaned), True
+    except json.JSONDecodeError:
+        pass
+    match = re.search(r"\[.*\]" if expect_array else r"\{.*\}", cleaned, re.DOTALL)
+    if not match:
+        return None, False
+    sanitized = re.sub(r'\\(?!["\\/bfnrtu])', "", match.group())
+    try:
+        return json.loads(sanitized), True
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(sanitized.replace("\\", "").replace('""', '"')), True
+    except json.JSONDecodeError:
+        return None, False
+
+
+def current_parse(text: str, expect_array: bool):
+    try:
+        return loads_tolerant(text, expect_array), True
+    except ValueError:
+        return None, False
+
+
+def instrumented_parse(text: str, expect_array: bool):
+    """What callers run: the extractor plus metrics, a span and the {"key": [...]} unwrap."""
+    return _parse_llm_json(text, expect_array)
+
+
+def _usable(data, expect_array: bool) -> bool:
+    """Mirrors what callers accept: a list for match_jobs, a dict otherwise."""
+    return isinstance(data, list) if expect_array else isinstance(data, dict)
+
+
+def time_case(parse, case: dict, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse(case["text"], case["expect_array"])
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare LLM JSON parsers on a malformed-output corpus")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with open(CORPUS) as fh:
+        cases = [json.loads(line) for line in fh if line.strip()]
+
+    parsers = (("legacy", legacy_parse), ("current", current_parse), ("instrumented", instrumented_parse))
+    print(f"{'case':<26}" + "".join(f"{name:>{len(name) + 4}}{'µs':>9}" for name, _ in parsers))
+    totals = {name: [0, 0.0] for name, _ in parsers}
+    for case in cases:
+        row = [f"{case['name']:<26}"]
+        for name, parse in parsers:
+            data, ok = parse(case["text"], case["expect_array"])
+            ok = ok and _usable(data, case["expect_array"])
+            micros = time_case(parse, case, args.rounds)
+            totals[name][0] += ok
+            totals[name][1] += micros
+            row.append(f"{'ok' if ok else 'FAIL':>{len(name) + 4}}{micros:>9.1f}")
+        print("".join(row))
+
+    print()
+    for name, (recovered, micros) in totals.items():
+        print(f"{name:<13} recovered {recovered}/{len(cases)}  mean {micros / len(cases):.1f} µs/case")
+    overhead = (totals["instrumented"][1] - totals["current"][1]) / len(cases)
+    print(f"{'metrics':<13} overhead of _parse_llm_json over the extractor: {overhead:.1f} µs/case")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
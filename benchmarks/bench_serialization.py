@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: JSON serialization time and bytes on the wire for the large list
+endpoints (/jobs, /match-jobs, /tracked-jobs).
+
+Compares the old path (jsonable_encoder + json.dumps, uncompressed) with the
+current one (orjson / Pydantic JSON bytes, GZip or Brotli above the size
+threshold).
+
+Usage: python benchmarks/bench_serialization.py [--jobs 50] [--rounds 200]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from models import CleanedJob, MatchJobResult
+from responses import ORJSONResponse, dump_models
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def make_jobs(n: int) -> List[CleanedJob]:
+    description = ("Build data pipelines in Python and SQL, own dashboards, partner with product. " * 5)[:297] + "..."
+    return [
+        CleanedJob(
+            title=f"Senior Data Engineer {i}",
+            company=f"Company {i % 17}",
+            location="Bengaluru, Karnataka",
+            description=description,
+            apply_link=f"https://www.adzuna.in/land/ad/{5623800000 + i}?se=abc&utm_medium=api&utm_source=2041a992",
+            created="2026-02-10T12:45:30Z",
+            id=str(5623800000 + i),
+        )
+        for i in range(n)
+    ]
+
+
+def make_matches(n: int) -> List[MatchJobResult]:
+    return [
+        MatchJobResult(
+            title=f"Senior Data Engineer {i}",
+            company=f"Company {i % 17}",
+            match_score=50 + i % 50,
+            reasoning="Strong match with required Python and SQL skills. Has 4 years of pipeline experience.",
+            confidence=0.9,
+        )
+        for i in range(n)
+    ]
+
+
+def timed(fn, rounds: int) -> float:
+    """Median wall time of fn() in milliseconds."""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def bench(name: str, models: list, model_type, rounds: int) -> None:
+    adapter = TypeAdapter(List[model_type])
+
+    def before():
+        # FastAPI's classic path: validate, jsonable_encoder, json.dumps
+        validated = adapter.validate_python(models)
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False).encode("utf-8")
+
+    def after():
+        return ORJSONResponse(content=dump_models(models)).body
+
+    before_body, after_body = before(), after()
+    assert json.loads(before_body) == json.loads(after_body)
+
+    rows = [
+        ("before (json.dumps)", timed(before, rounds), len(before_body), "identity"),
+        ("after (orjson)", timed(after, rounds), len(after_body), "identity"),
+        ("after + gzip", None, len(gzip.compress(after_body, compresslevel=6)), "gzip"),
+    ]
+    if brotli is not None:
+        rows.append(("after + brotli", None, len(brotli.compress(after_body, quality=4)), "br"))
+
+    print(f"\n{name} ({len(models)} items)")
+    print(f"  {'variant':<22}{'serialize ms':>14}{'bytes':>10}  encoding")
+    for label, ms, size, encoding in rows:
+        ms_text = f"{ms:.3f}" if ms is not None else "-"
+        print(f"  {label:<22}{ms_text:>14}{size:>10}  {encoding}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    bench("/jobs", make_jobs(args.jobs), CleanedJob, args.rounds)
+    bench("/match-jobs", make_matches(args.jobs), MatchJobResult, args.rounds)
+    if brotli is None:
+        print("\n(brotli not installed; Brotli sizes skipped)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for Ollama and the Adzuna search API, used by the load test.
+
+Fake Ollama (POST /api/chat, /api/generate, /api/embed) answers with JSON shaped like
+what the prompts ask for, simulating prompt latency, a token rate and a
+fraction of malformed llama3-style replies (fences, prose, bad escapes). It
+reports the same timing fields as Ollama (total_duration, eval_count, ...).
+With "stream": true it sends NDJSON chunks at the configured token rate.
+Chat requests whose system message was seen before skip its evaluation, like
+Ollama's prompt cache: fewer prompt_eval_count tokens and less latency.
+
+Fake Adzuna (GET /v1/api/jobs/<country>/search/<page>) returns a page of
+realistic postings after a configurable delay.
+
+Run standalone:  python benchmarks/fake_upstreams.py --ollama-port 11500 --adzuna-port 11600
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class UpstreamConfig:
+    ollama_latency: float = 0.2       # seconds before the first token (load + prompt eval)
+    tokens_per_second: float = 200.0  # generation speed
+    malformed_rate: float = 0.1       # fraction of JSON replies wrapped in llama3-style noise
+    adzuna_latency: float = 0.15      # seconds per search call
+    adzuna_page_size: int = 10
+
+
+# ── Fake Ollama ─────────────────────────────────────────
+
+def _fake_analysis() -> dict:
+    return {
+        "ats_score": random.randint(40, 90),
+        "missing_keywords": random.sample(["SQL", "Airflow", "Kubernetes", "dbt", "Spark", "Tableau"], 3),
+        "strengths": ["Strong Python background", "Relevant analytics experience"],
+        "improvements": ["Quantify impact in recent roles", "Mention cloud data tooling"],
+    }
+
+
+def _fake_digest() -> dict:
+    return {
+        "headline": "Data analyst focused on sales reporting and dashboards",
+        "years_experience": 4,
+        "skills": ["Python", "SQL", "Excel", "Power BI"],
+        "roles": ["Data Analyst, Acme Corp (2021 - Present)", "Junior Analyst, Beta Retail (2019 - 2021)"],
+        "achievements": ["Cut weekly reporting time by 60% with Python automation"],
+        "education": ["B.Sc. Statistics"],
+    }
+
+
+def _fake_matches(prompt: str) -> list:
+    jobs = re.findall(r"Job \d+:\nTitle: (.*)\nCompany: (.*)\n", prompt)
+    return [
+        {
+            "title": title,
+            "company": company,
+            "match_score": random.randint(30, 95),
+            "reasoning": "Good overlap with the required Python and SQL skills. Some gaps in cloud tooling.",
+        }
+        for title, company in jobs
+    ]
+
+
+def _malform(text: str) -> str:
+    """Mimic the ways llama3 breaks JSON: fences, leading prose, invalid escapes."""
+    style = random.choice(["fence", "prose", "escape"])
+    if style == "fence":
+        return f"```json\n{text}\n```"
+    if style == "prose":
+        return f"Here is the JSON you asked for:\n\n{text}\n\nLet me know if you need anything else."
+    return text.replace("Python", "Python\\_3", 1).replace("SQL", "S\\QL", 1)
+
+
+def _fake_completion(prompt: str, malformed_rate: float) -> str:
+    if "JSON array" in prompt:
+        text = json.dumps(_fake_matches(prompt), indent=2)
+    elif "ats_score" in prompt:
+        text = json.dumps(_fake_analysis(), indent=2)
+    elif "years_experience" in prompt:
+        text = json.dumps(_fake_digest(), indent=2)
+    else:
+        # Free-text generations (cover letter, optimized resume)
+        return ("Dear Hiring Manager,\n\n" + "I bring hands-on experience building data products. " * 40).strip()
+    if random.random() < malformed_rate:
+        text = _malform(text)
+    return text
+
+
+def _fake_embedding(text: str, dim: int = 64) -> list:
+    """Hashed bag of words: texts sharing words get similar vectors."""
+    vector = [0.0] * dim
+    for word in re.findall(r"[a-z0-9+#]+", text.lower()):
+        vector[zlib.crc32(word.encode()) % dim] += 1.0
+    return vector
+
+
+def _ollama_handler(config: UpstreamConfig):
+    prefix_cache = set()  # (model, system prompt) pairs already evaluated
+    cache_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _embed(self, body: dict) -> None:
+            inputs = body.get("input", [])
+            texts = [inputs] if isinstance(inputs, str) else inputs
+            time.sleep(config.ollama_latency * 0.1)
+            payload = json.dumps({"model": body.get("model"), "embeddings": [_fake_embedding(t) for t in texts]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            # /api/tags: model list, used as a health check
+            payload = json.dumps({"models": [{"name": "llama3:latest"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path.rstrip("/").endswith("/embed"):
+                self._embed(body)
+                return
+            self.chat = self.path.rstrip("/").endswith("/chat")
+            if self.chat:
+                messages = body.get("messages", [])
+                prompt = "\n\n".join(m.get("content", "") for m in messages)
+                cached = "".join(m.get("content", "") for m in messages[:-1])
+                with cache_lock:
+                    hit = (body.get("model"), cached) in prefix_cache
+                    prefix_cache.add((body.get("model"), cached))
+                cached_chars = len(cached) if hit else 0
+            else:
+                prompt = body.get("prompt", "")
+                cached_chars = 0
+            text = _fake_completion(prompt, config.malformed_rate)
+
+            prompt_tokens = max(1, (len(prompt) - cached_chars) // 4)
+            # Prompt evaluation scales with the tokens that were not cached
+            prompt_eval = config.ollama_latency * 0.9 * prompt_tokens / max(1, len(prompt) // 4)
+            latency = config.ollama_latency * 0.1 + prompt_eval
+            eval_count = max(1, len(text) // 4)
+            generation = eval_count / config.tokens_per_second
+            stats = {
+                "model": body.get("model", "llama3"),
+                "done": True,
+                "total_duration": int((latency + generation) * 1e9),
+                "load_duration": int(config.ollama_latency * 0.1 * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prompt_eval * 1e9),
+                "eval_count": eval_count,
+                "eval_duration": int(generation * 1e9),
+            }
+            if body.get("stream"):
+                self._stream(text, stats, latency)
+                return
+
+            time.sleep(latency + generation)
+            payload = json.dumps({**stats, **self._content(text)}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _content(self, text: str) -> dict:
+            if self.chat:
+                return {"message": {"role": "assistant", "content": text}}
+            return {"response": text}
+
+        def _stream(self, text: str, stats: dict, latency: float):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            # HTTP/1.0 without Content-Length: the body ends when the connection closes
+            self.end_headers()
+            time.sleep(latency)
+            try:
+                # ~4 characters per token
+                for i in range(0, len(text), 4):
+                    self._chunk({"model": stats["model"], **self._content(text[i:i + 4]), "done": False})
+                    time.sleep(1 / config.tokens_per_second)
+                self._chunk({**stats, **self._content("")})
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client closed the connection: Ollama stops generating too
+
+        def _chunk(self, message: dict):
+            self.wfile.write(json.dumps(message).encode() + b"\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+# ── Fake Adzuna ─────────────────────────────────────────
+
+_COMPANIES = ["Fraoula", "InterEx Group", "ZeroNorth", "Data Unveil", "Bajaj Finserv", "Elevate Recruitment"]
+_CITIES = ["Bengaluru, Karnataka", "Pune, Maharashtra", "Hyderabad, Telangana", "Remote"]
+
+
+def _adzuna_handler(config: UpstreamConfig):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            what = query.get("what", ["Data Analyst"])[0]
+            country = re.search(r"/jobs/([a-z]{2})/", url.path)
+            domain = {"in": "adzuna.in", "gb": "adzuna.co.uk"}.get(country.group(1) if country else "in", "adzuna.com")
+            time.sleep(config.adzuna_latency)
+
+            now = datetime.now(timezone.utc)
+            results = []
+            for i in range(config.adzuna_page_size):
+                job_id = random.randint(5_600_000_000, 5_699_999_999)
+                results.append({
+                    "id": str(job_id),
+                    "title": f"{what.title()} {random.choice(['I', 'II', 'Lead', ''])}".strip(),
+                    "company": {"display_name": random.choice(_COMPANIES)},
+                    "location": {"display_name": random.choice(_CITIES)},
+                    "description": "We are looking for an analyst to own dashboards, write SQL and Python, "
+                                   "and partner with product teams on experimentation. " * 3,
+                    "redirect_url": f"https://www.{domain}/land/ad/{job_id}?se=bench&utm_medium=api",
+                    "created": (now - timedelta(hours=random.randint(1, 72))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                })
+            payload = json.dumps({"count": len(results), "results": results}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+# ── Lifecycle ───────────────────────────────────────────
+
+def start_servers(config: UpstreamConfig, ollama_port: int = 0, adzuna_port: int = 0):
+    """Start both fakes on daemon threads. Returns (ollama_server, adzuna_server)."""
+    servers = []
+    for handler, port in ((_ollama_handler(config), ollama_port), (_adzuna_handler(config), adzuna_port)):
+        server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers[0], servers[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run fake Ollama and Adzuna servers")
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--adzuna-port", type=int, default=11600)
+    parser.add_argument("--ollama-latency", type=float, default=UpstreamConfig.ollama_latency)
+    parser.add_argument("--tokens-per-second", type=float, default=UpstreamConfig.tokens_per_second)
+    parser.add_argument("--malformed-rate", type=float, default=UpstreamConfig.malformed_rate)
+    parser.add_argument("--adzuna-latency", type=float, default=UpstreamConfig.adzuna_latency)
+    args = parser.parse_args()
+
+    config = UpstreamConfig(args.ollama_latency, args.tokens_per_second, args.malformed_rate, args.adzuna_latency)
+    ollama, adzuna = start_servers(config, args.ollama_port, args.adzuna_port)
+    print(f"Fake Ollama: http://127.0.0.1:{ollama.server_port}/api/chat")
+    print(f"Fake Adzuna: http://127.0.0.1:{adzuna.server_port}/v1/api/jobs/in/search/1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
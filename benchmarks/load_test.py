@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Offline load test: runs the FastAPI app against fake Ollama and Adzuna
+servers and drives a realistic request mix at increasing concurrency.
+
+Reports p50/p95/p99 latency, requests/sec and errors per endpoint for each
+concurrency level. Nothing leaves the machine; no Ollama or Adzuna keys needed.
+
+Usage:
+  python benchmarks/load_test.py
+  python benchmarks/load_test.py --concurrency 1,8,32 --duration 20 \\
+      --ollama-latency 0.5 --tokens-per-second 40 --malformed-rate 0.2
+  python benchmarks/load_test.py --json results.json   # machine-readable output
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from fake_upstreams import UpstreamConfig, start_servers
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+RESUME = (
+    "Data Analyst with 4 years of experience in Python, pandas and Tableau. "
+    "Built KPI dashboards for a 2M-user consumer app and automated weekly reporting. "
+) * 4
+JOB_DESCRIPTION = (
+    "We need a Data Analyst fluent in SQL and Python, with Airflow and dbt exposure, "
+    "to own product analytics and experimentation."
+) * 3
+ROLES = ["data analyst", "data engineer", "business analyst", "python developer"]
+
+# (endpoint label, weight) — roughly what the React app issues per session
+MIX = [
+    ("GET /jobs", 35),
+    ("POST /match-jobs", 15),
+    ("POST /analyze-resume", 10),
+    ("GET /tracked-jobs", 20),
+    ("POST /track-job", 10),
+    ("PUT /update-status/{job_id}", 10),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Client:
+    """One simulated user: own HTTP session and auth token."""
+
+    def __init__(self, base_url: str, token: str):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.tracked_ids = []
+
+    def run(self, label: str) -> requests.Response:
+        url = self.base_url
+        if label == "GET /jobs":
+            return self.session.get(f"{url}/jobs", params={"role": random.choice(ROLES)}, timeout=300)
+        if label == "POST /match-jobs":
+            jobs = [{"title": f"Analyst {i}", "company": "Fraoula", "description": JOB_DESCRIPTION} for i in range(5)]
+            return self.session.post(f"{url}/match-jobs", json={"resume_text": RESUME, "jobs": jobs}, timeout=300)
+        if label == "POST /analyze-resume":
+            return self.session.post(
+                f"{url}/analyze-resume",
+                json={"resume_text": RESUME, "job_description": JOB_DESCRIPTION},
+                timeout=300,
+            )
+        if label == "GET /tracked-jobs":
+            return self.session.get(f"{url}/tracked-jobs", timeout=60)
+        if label == "POST /track-job":
+            response = self.session.post(
+                f"{url}/track-job",
+                json={"title": "Data Analyst", "company": "Fraoula", "source_job_id": str(random.randint(1, 10**9))},
+                timeout=60,
+            )
+            if response.ok:
+                self.tracked_ids.append(response.json()["id"])
+            return response
+        if label == "PUT /update-status/{job_id}":
+            if not self.tracked_ids:
+                return self.run("POST /track-job")
+            job_id = random.choice(self.tracked_ids)
+            return self.session.put(f"{url}/update-status/{job_id}", json={"status": "Interview"}, timeout=60)
+        raise ValueError(label)
+
+
+def start_app(port: int, env: dict) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/", timeout=1).ok:
+                return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("App did not start within 30s")
+
+
+def create_user(base_url: str, index: int) -> str:
+    email = f"bench{index}@example.com"
+    requests.post(f"{base_url}/register", json={"email": email, "password": "benchmark"}, timeout=30)
+    response = requests.post(f"{base_url}/login", json={"email": email, "password": "benchmark"}, timeout=30)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def run_level(clients, concurrency: int, duration: float) -> dict:
+    labels = [label for label, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(client: Client):
+        while time.perf_counter() < stop_at:
+            label = random.choices(labels, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = client.run(label).status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies[label].append(elapsed)
+                if not ok:
+                    errors[label] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, clients[:concurrency]))
+    wall = time.perf_counter() - started
+
+    report = {}
+    for label in labels:
+        samples = latencies.get(label, [])
+        report[label] = {
+            "requests": len(samples),
+            "errors": errors.get(label, 0),
+            "rps": len(samples) / wall,
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+        }
+    return report
+
+
+def print_report(concurrency: int, report: dict) -> None:
+    print(f"\n── concurrency {concurrency} " + "─" * 60)
+    print(f"{'endpoint':<30}{'reqs':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for label, row in report.items():
+        print(
+            f"{label:<30}{row['requests']:>7}{row['errors']:>6}{row['rps']:>9.1f}"
+            f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline load test against fake upstreams")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--ollama-latency", type=float, default=UpstreamConfig.ollama_latency)
+    parser.add_argument("--tokens-per-second", type=float, default=UpstreamConfig.tokens_per_second)
+    parser.add_argument("--malformed-rate", type=float, default=UpstreamConfig.malformed_rate)
+    parser.add_argument("--adzuna-latency", type=float, default=UpstreamConfig.adzuna_latency)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app (repeatable), e.g. JOBS_CACHE_TTL=0")
+    args = parser.parse_args()
+
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    config = UpstreamConfig(args.ollama_latency, args.tokens_per_second, args.malformed_rate, args.adzuna_latency)
+    ollama, adzuna = start_servers(config)
+
+    workdir = tempfile.mkdtemp(prefix="vibe0-bench-")
+    port = _free_port()
+    env = {
+        **os.environ,
+        "JWT_SECRET": "benchmark-secret-benchmark-secret",
+        "ADZUNA_APP_ID": "bench",
+        "ADZUNA_APP_KEY": "bench",
+        "ADZUNA_BASE_URL": f"http://127.0.0.1:{adzuna.server_port}/v1/api/jobs/in/search/1",
+        "OLLAMA_API_URL": f"http://127.0.0.1:{ollama.server_port}/api/chat",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "LOG_LEVEL": "WARNING",
+        # Measure Ollama, not the per-user LLM rate limit (rate_limit.py);
+        # pass --env LLM_RATE_PER_MINUTE=10 to load-test the limiter itself
+        "LLM_RATE_PER_MINUTE": "100000",
+        "LLM_BURST": "10000",
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    app = start_app(port, env)
+    base_url = f"http://127.0.0.1:{port}"
+    results = {}
+    try:
+        clients = [Client(base_url, create_user(base_url, i)) for i in range(max(levels))]
+        for level in levels:
+            report = run_level(clients, level, args.duration)
+            results[level] = report
+            print_report(level, report)
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        ollama.shutdown()
+        adzuna.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"config": vars(args), "levels": results}, fh, indent=2)
+        print(f"\nWrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -125,6 +125,26 @@ export async function trackJob(job) {
       company: job.company,
       location: job.location || '',
       apply_link: job.apply_link || '',
+      source_job_id: job.id || null,
+      country: job.country || null,
+    });
+    return res.data;
+  } catch (err) {
+    throw new Error(getErrorMessage(err));
+  }
+}
+
+export async function trackJobsBulk(jobs) {
+  try {
+    const res = await api.post('/track-jobs/bulk', {
+      jobs: jobs.map((job) => ({
+        title: job.title,
+        company: job.company,
+        location: job.location || '',
+        apply_link: job.apply_link || '',
+        source_job_id: job.id || null,
+        country: job.country || null,
+      })),
     });
     return res.data;
   } catch (err) {
@@ -150,6 +170,15 @@ export async function updateTrackedJobStatus(jobId, status) {
   }
 }
 
+export async function updateTrackedJobStatusBulk(updates) {
+  try {
+    const res = await api.put('/update-status/bulk', { updates });
+    return res.data;
+  } catch (err) {
+    throw new Error(getErrorMessage(err));
+  }
+}
+
 export async function optimizeResume(resumeText, jobDescription) {
   try {
     const res = await api.post('/generate-optimized-resume', {
@@ -1,9 +1,12 @@
-import React from 'react';
+import React, { useState } from 'react';
 import SkeletonJob from './SkeletonJob';
-import { trackJob } from '../api';
+import { trackJob, trackJobsBulk } from '../api';
 import { getRelativeTime, isPostedInLast24Hours } from '../utils/timeUtils';
 
 export default function JobList({ jobs, selectedJob, onSelectJob, loading, hasSearched }) {
+  const [trackMessage, setTrackMessage] = useState('');
+  const [trackingAll, setTrackingAll] = useState(false);
+
   if (loading) {
     return (
       <>
@@ -37,10 +40,36 @@ export default function JobList({ jobs, selectedJob, onSelectJob, loading, hasSe
     }
   }
 
+  async function handleTrackAll() {
+    setTrackingAll(true);
+    setTrackMessage('');
+    try {
+      // The bulk endpoint takes at most 100 jobs per call
+      const results = await trackJobsBulk(jobs.slice(0, 100));
+      const created = results.filter((r) => r.result === 'created').length;
+      setTrackMessage(`Saved ${created} new job${created === 1 ? '' : 's'} to your tracker`);
+    } catch (err) {
+      setTrackMessage(err.message || 'Failed to track jobs.');
+    } finally {
+      setTrackingAll(false);
+    }
+  }
+
   return (
     <>
+      <div className="jobListToolbar">
+        {trackMessage && <span className="jobListToolbar__message">{trackMessage}</span>}
+        <button
+          className="btn btnSecondary btn--sm"
+          onClick={handleTrackAll}
+          disabled={trackingAll}
+        >
+          {trackingAll ? 'Saving…' : `Track all ${Math.min(jobs.length, 100)}`}
+        </button>
+      </div>
       {jobs.map((job, index) => {
-        const isSelected = selectedJob?.id === job.id;
+        // Adzuna ids are only unique within a country
+        const isSelected = selectedJob?.id === job.id && selectedJob?.country === job.country;
 
         const score = job.match_score ?? job.match_percentage ?? null;
         const confidence = job.confidence;
@@ -54,7 +83,7 @@ export default function JobList({ jobs, selectedJob, onSelectJob, loading, hasSe
 
         return (
           <div
-            key={job.id || `${job.title}-${job.company}-${index}`}
+            key={job.id ? `${job.country || ''}:${job.id}` : `${job.title}-${job.company}-${index}`}
             className={`jobCard${isSelected ? ' selected' : ''}`}
             onClick={() => onSelectJob(job)}
           >
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { getTrackedJobs, updateTrackedJobStatus } from '../api';
+import { getTrackedJobs, updateTrackedJobStatus, updateTrackedJobStatusBulk } from '../api';
 
 const STATUS_OPTIONS = ['Applied', 'Interview', 'Rejected', 'Offer'];
 
@@ -14,6 +14,7 @@ export default function JobTracker() {
     const [jobs, setJobs] = useState([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
+    const [selected, setSelected] = useState(new Set());
 
     useEffect(() => {
         fetchJobs();
@@ -43,7 +44,35 @@ export default function JobTracker() {
         }
     }
 
+    function toggleSelected(jobId) {
+        setSelected((prev) => {
+            const next = new Set(prev);
+            if (next.has(jobId)) next.delete(jobId);
+            else next.add(jobId);
+            return next;
+        });
+    }
 
+    async function handleBulkStatusChange(newStatus) {
+        if (!newStatus || selected.size === 0) return;
+        setError('');
+        try {
+            const results = await updateTrackedJobStatusBulk(
+                [...selected].map((id) => ({ id, status: newStatus })),
+            );
+            const updated = new Map(results.filter((r) => r.ok).map((r) => [r.id, r.job.status]));
+            setJobs((prev) =>
+                prev.map((j) => (updated.has(j.id) ? { ...j, status: updated.get(j.id) } : j)),
+            );
+            const failed = results.filter((r) => !r.ok);
+            if (failed.length) {
+                setError(`${failed.length} job${failed.length === 1 ? '' : 's'} could not be updated: ${failed[0].error}`);
+            }
+            setSelected(new Set(failed.map((r) => r.id)));
+        } catch (e) {
+            setError(e.message || 'Failed to update status.');
+        }
+    }
 
     return (
         <div className="trackerPage">
@@ -57,6 +86,29 @@ export default function JobTracker() {
 
             {error && <div className="errorBanner">{error}</div>}
 
+            {selected.size > 0 && (
+                <div className="trackerBulkBar">
+                    <span>{selected.size} selected</span>
+                    <select
+                        className="input trackerCard__select"
+                        value=""
+                        onChange={(e) => handleBulkStatusChange(e.target.value)}
+                    >
+                        <option value="" disabled>
+                            Set status…
+                        </option>
+                        {STATUS_OPTIONS.map((s) => (
+                            <option key={s} value={s}>
+                                {s}
+                            </option>
+                        ))}
+                    </select>
+                    <button className="btn btnSecondary btn--sm" onClick={() => setSelected(new Set())}>
+                        Clear
+                    </button>
+                </div>
+            )}
+
             {loading ? (
                 <div className="emptyState">
                     <span className="spinner spinner--md spinner--primary" />
@@ -71,6 +123,13 @@ export default function JobTracker() {
                     {jobs.map((job) => (
                         <div key={job.id} className="trackerCard">
                             <div className="trackerCard__top">
+                                <input
+                                    type="checkbox"
+                                    className="trackerCard__check"
+                                    checked={selected.has(job.id)}
+                                    onChange={() => toggleSelected(job.id)}
+                                    aria-label={`Select ${job.title}`}
+                                />
                                 <div>
                                     <h3 className="trackerCard__title">{job.title}</h3>
                                     <p className="trackerCard__company">{job.company}</p>
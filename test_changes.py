@@ -136,6 +136,1526 @@ def test_timestamp_filtering():
     
     print("✅ All timestamp filtering tests passed!\n")
 
+def test_compact_tracked_jobs():
+    """Test merging of duplicate tracked jobs."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from database import Base, TrackedJobDB, compact_tracked_jobs
+
+    print("✓ Testing tracked job compaction...")
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    link = "https://www.adzuna.in/land/ad/5623814672?se={}&utm_medium=api"
+    db.add_all([
+        TrackedJobDB(id="a", user_id=1, title="Data Analyst", company="Fraoula", apply_link=link.format("x"), status="Applied"),
+        TrackedJobDB(id="b", user_id=1, title="Data Analyst", company="Fraoula", apply_link=link.format("y"), status="Interview"),
+        TrackedJobDB(id="c", user_id=2, title="Data Analyst", company="Fraoula", apply_link=link.format("z"), status="Applied"),
+        TrackedJobDB(id="d", user_id=1, title="Manual", company="Acme", apply_link="", status="Applied"),
+    ])
+    db.commit()
+
+    result = compact_tracked_jobs(db)
+    assert result == {"backfilled": 2, "deleted": 1}, result
+    remaining = {row.id: row for row in db.query(TrackedJobDB).all()}
+    assert set(remaining) == {"b", "c", "d"}
+    assert remaining["b"].source_job_id == "5623814672"
+    print("  ✓ Duplicates merged per user, most advanced status kept")
+
+    assert compact_tracked_jobs(db) == {"backfilled": 0, "deleted": 0}
+    print("  ✓ Compaction is idempotent")
+
+    print("✅ All compaction tests passed!\n")
+
+def _import_with_jwt_secret(name):
+    """
+    Fresh import of a module that needs auth_routes. auth_routes needs
+    JWT_SECRET at import, so both are imported with a throwaway secret and
+    dropped again; JWT_SECRET is left as it was (unset, or the developer's own).
+    """
+    import importlib
+    from unittest import mock
+
+    try:
+        with mock.patch.dict(os.environ, {"JWT_SECRET": "test-only"}):
+            return importlib.import_module(name), importlib.import_module("auth_routes")
+    finally:
+        for module in ("auth_routes", name):
+            sys.modules.pop(module, None)
+
+def _tracker_client(db_path, user_id=1):
+    """TestClient serving tracker_routes against its own SQLite file, logged in as `user_id`."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from database import Base, User, get_db
+
+    tracker_routes, auth_routes = _import_with_jwt_secret("tracker_routes")
+    get_current_user, get_token_subject = auth_routes.get_current_user, auth_routes.get_token_subject
+
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    email = f"user{user_id}@example.com"
+    db = Session()
+    if db.get(User, user_id) is None:
+        db.add(User(id=user_id, email=email, hashed_password="-"))
+        db.commit()
+    db.close()
+
+    def get_test_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(tracker_routes.router)
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_current_user] = lambda: User(id=user_id, email=email)
+    app.dependency_overrides[get_token_subject] = lambda: email
+    return TestClient(app), tracker_routes, engine, Session
+
+def test_bulk_tracker_endpoints():
+    """Test /track-jobs/bulk and /update-status/bulk."""
+    import tempfile
+    from database import TrackedJobDB
+
+    print("✓ Testing bulk tracker endpoints...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "tracker.db")
+        client, tracker_routes, engine, Session = _tracker_client(db_path, user_id=1)
+        other, _, other_engine, _ = _tracker_client(db_path, user_id=2)
+
+        first = client.post("/track-job", json={"title": "Analyst", "company": "Acme", "source_job_id": "1"}).json()
+        client.put(f"/update-status/{first['id']}", json={"status": "Interview"})
+        response = client.post("/track-jobs/bulk", json={"jobs": [
+            {"title": "Senior Analyst", "company": "Acme", "location": "Pune", "source_job_id": "1"},
+            {"title": "Engineer", "company": "Beta", "source_job_id": "2"},
+            {"title": "Engineer (repost)", "company": "Beta", "source_job_id": "2"},
+            {"title": "Manual entry", "company": "Gamma"},
+        ]})
+        assert response.status_code == 200, response.text
+        results = response.json()
+        assert [(r["index"], r["result"]) for r in results] == [(0, "updated"), (1, "created"), (2, "duplicate"), (3, "created")]
+        assert results[0]["job"]["id"] == first["id"] and results[0]["job"]["status"] == "Interview"
+        assert results[0]["job"]["title"] == "Senior Analyst"
+        assert results[2]["job"]["id"] == results[1]["job"]["id"]
+        db = Session()
+        stored = {row.id: row for row in db.query(TrackedJobDB)}
+        assert len(stored) == 3 and stored[first["id"]].title == "Senior Analyst"
+        assert stored[first["id"]].status == "Interview", "an upsert keeps the status"
+        assert stored[results[1]["job"]["id"]].title == "Engineer", "the first of a repeated posting is stored"
+        db.close()
+        print("  ✓ Bulk save inserts new postings, updates tracked ones and reports repeats as duplicates")
+
+        theirs = other.post("/track-job", json={"title": "Theirs", "company": "Acme", "source_job_id": "1"}).json()
+        assert theirs["id"] != first["id"], "Adzuna ids are deduplicated per user"
+        response = client.put("/update-status/bulk", json={"updates": [
+            {"id": first["id"], "status": "Applied"},
+            {"id": "missing", "status": "Offer"},
+            {"id": theirs["id"], "status": "Rejected"},
+            {"id": first["id"], "status": "Offer"},
+        ]})
+        assert response.status_code == 200, response.text
+        results = {r["id"]: r for r in response.json()}
+        assert results[first["id"]]["ok"] and results[first["id"]]["job"]["status"] == "Offer", "last write wins"
+        assert results["missing"] == {"id": "missing", "ok": False, "job": None, "error": "Job missing not found"}
+        assert not results[theirs["id"]]["ok"], "another user's job is reported as not found"
+        db = Session()
+        assert db.get(TrackedJobDB, first["id"]).status == "Offer"
+        assert db.get(TrackedJobDB, theirs["id"]).status == "Applied"
+        db.close()
+        print("  ✓ Bulk status update applies owned ids and reports the rest per item")
+
+        india = client.post("/track-job", json={"title": "Nurse", "company": "Care", "source_job_id": "5", "country": "in"}).json()
+        britain = client.post("/track-job", json={"title": "Nurse", "company": "NHS", "source_job_id": "5", "country": "GB"}).json()
+        assert india["id"] != britain["id"] and britain["country"] == "gb"
+        again = client.post("/track-job", json={"title": "Nurse", "company": "NHS", "source_job_id": "5", "country": "gb"}).json()
+        assert again["id"] == britain["id"] and again["company"] == "NHS"
+        db = Session()
+        db.add(TrackedJobDB(id="legacy", user_id=1, title="Porter", company="Care", source_job_id="6"))
+        db.commit()
+        db.close()
+        response = client.post("/track-jobs/bulk", json={"jobs": [
+            {"title": "Nurse", "company": "Care", "source_job_id": "5", "country": "in"},
+            {"title": "Porter", "company": "Care", "source_job_id": "6", "country": "in"},
+            {"title": "Porter", "company": "Trust", "source_job_id": "6", "country": "gb"},
+        ]})
+        results = response.json()
+        assert [r["result"] for r in results] == ["updated", "updated", "created"], results
+        assert results[0]["job"]["id"] == india["id"] and results[1]["job"]["id"] == "legacy"
+        db = Session()
+        assert db.get(TrackedJobDB, "legacy").country == "in", "a row saved without a country takes the posting's"
+        db.close()
+        print("  ✓ Adzuna ids are deduplicated per country")
+
+        limit = tracker_routes.MAX_BULK_ITEMS
+        too_many = [{"title": f"Job {i}", "company": "Acme"} for i in range(limit + 1)]
+        assert client.post("/track-jobs/bulk", json={"jobs": too_many}).status_code == 422
+        assert client.put("/update-status/bulk", json={"updates": [{"id": "x", "status": "Offer"}] * (limit + 1)}).status_code == 422
+        assert client.post("/track-jobs/bulk", json={"jobs": []}).status_code == 422
+        assert client.post("/track-jobs/bulk", json={"jobs": too_many[:limit]}).status_code == 200
+        print(f"  ✓ Batches are limited to 1..{limit} items")
+        engine.dispose()
+        other_engine.dispose()
+
+    print("✅ All bulk tracker tests passed!\n")
+
+def test_bulk_track_conflicts():
+    """Test /track-jobs/bulk without the dedupe index and when losing an insert race."""
+    import tempfile
+    from sqlalchemy import text
+    import database
+    from database import TrackedJobDB
+
+    print("✓ Testing bulk track conflict handling...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client, tracker_routes, engine, Session = _tracker_client(os.path.join(tmp, "old.db"))
+        tracker_routes.has_tracked_job_source_index = lambda: False  # as init_db found it
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ux_tracked_jobs_user_posting"))
+            conn.execute(text("INSERT INTO tracked_jobs (id, user_id, title, company, location, apply_link, status, "
+                              "applied_date, source_job_id) VALUES ('a', 1, 'Old', 'Acme', '', '', 'Applied', '', '7'), "
+                              "('b', 1, 'Old', 'Acme', '', '', 'Applied', '', '7')"))
+        response = client.post("/track-jobs/bulk", json={"jobs": [
+            {"title": "New", "company": "Acme", "source_job_id": "8"},
+            {"title": "Old again", "company": "Acme", "source_job_id": "7"},
+        ]})
+        assert response.status_code == 200, response.text
+        assert [r["result"] for r in response.json()] == ["created", "updated"]
+        db = Session()
+        assert db.query(TrackedJobDB).filter(TrackedJobDB.source_job_id == "8").count() == 1
+        print("  ✓ An uncompacted database without the unique index still accepts bulk saves")
+
+        saved_flag = database._source_index
+        try:
+            database._add_missing_indexes(engine)
+            assert not database.has_tracked_job_source_index(), "duplicates block the index"
+            database.compact_tracked_jobs(db)
+            assert database.has_tracked_job_source_index()
+        finally:
+            database._source_index = saved_flag
+            db.close()
+        print("  ✓ The index flag is worked out once and updated by compaction")
+
+        client, tracker_routes, engine, Session = _tracker_client(os.path.join(tmp, "race.db"))
+        def concurrent_save():
+            # Another request stores posting 9 between the lookup and the insert
+            other = Session()
+            other.add(TrackedJobDB(id="theirs", user_id=1, title="Theirs", company="Acme", location="",
+                                   apply_link="", status="Interview", applied_date="", source_job_id="9"))
+            other.commit()
+            other.close()
+            return True
+
+        tracker_routes.has_tracked_job_source_index = concurrent_save
+        response = client.post("/track-jobs/bulk", json={"jobs": [
+            {"title": "Mine", "company": "Acme", "source_job_id": "9"},
+            {"title": "Other", "company": "Acme", "source_job_id": "10"},
+            {"title": "Mine", "company": "Acme", "source_job_id": "9"},
+        ]})
+        assert response.status_code == 200, response.text
+        results = response.json()
+        assert [r["result"] for r in results] == ["updated", "created", "duplicate"]
+        assert results[0]["job"]["id"] == results[2]["job"]["id"] == "theirs"
+        assert results[0]["job"]["status"] == "Interview"
+        db = Session()
+        stored = {row.source_job_id: row for row in db.query(TrackedJobDB)}
+        assert len(stored) == 2 and stored["9"].id == "theirs" and stored["9"].title == "Mine"
+        assert stored["10"].id == results[1]["job"]["id"]
+        db.close()
+        print("  ✓ Rows that lose an insert race report the id actually stored")
+        engine.dispose()
+
+    print("✅ All bulk track conflict tests passed!\n")
+
+def test_conditional_get_helpers():
+    """Test ETag matching and the TTL cache behind /jobs."""
+    import time
+    from http_cache import weak_etag, etag_matches
+    from cache import TTLCache
+
+    print("✓ Testing conditional GET helpers...")
+
+    etag = weak_etag("tracker", "boot", "a@b.c", 3)
+    assert etag.startswith('W/"')
+    assert etag == weak_etag("tracker", "boot", "a@b.c", 3)
+    assert etag != weak_etag("tracker", "boot", "a@b.c", 4)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('W/"other"', etag)
+    print("  ✓ Weak ETag comparison works")
+
+    cache = TTLCache(ttl_seconds=0.05, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert cache.get("a") is None and cache.get("c") == 3
+    time.sleep(0.06)
+    assert cache.get("c") is None
+    print("  ✓ TTL cache evicts oldest and expired entries")
+
+    print("✅ All conditional GET tests passed!\n")
+
+def test_response_compression():
+    """Test Brotli/GZip response compression and the orjson list responses."""
+    import json
+    from fastapi import FastAPI
+    from fastapi.responses import Response
+    from fastapi.testclient import TestClient
+    import compression
+    from compression import CompressionMiddleware
+    from models import CleanedJob
+    from responses import ORJSONResponse, dump_models, ndjson_line
+
+    print("✓ Testing response compression and orjson responses...")
+
+    jobs = [CleanedJob(title=f"Analyst {i}", company="Zürich AG", location="Pune", description="SQL " * 20,
+                       apply_link="#", created="2026-02-12T10:00:00Z", id=str(i)) for i in range(50)]
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/jobs")
+    def big():
+        return ORJSONResponse(dump_models(jobs))
+
+    @app.get("/small")
+    def small():
+        return ORJSONResponse({"ok": True})
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(b"x" * 4096, headers={"Content-Encoding": "identity"})
+
+    @app.get("/stream")
+    def stream():
+        return Response(b"".join(ndjson_line({"n": i}) for i in range(500)), media_type="application/x-ndjson")
+
+    client = TestClient(app)
+    expected = [job.model_dump(mode="json") for job in jobs]
+    encodings = ["gzip"] + (["br"] if compression.brotli is not None else [])
+    for encoding in encodings:
+        response = client.get("/jobs", headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert int(response.headers["content-length"]) < len(json.dumps(expected)) / 4
+        assert response.json() == expected
+    print(f"  ✓ Bodies above minimum_size are compressed ({', '.join(encodings)}) with Vary: Accept-Encoding")
+
+    response = client.get("/jobs", headers={"Accept-Encoding": "br, gzip"})
+    assert response.headers["content-encoding"] == ("br" if compression.brotli is not None else "gzip")
+    assert "content-encoding" not in client.get("/jobs", headers={"Accept-Encoding": "identity"}).headers
+    print("  ✓ Brotli is preferred when accepted; other clients get the plain body")
+
+    assert compression.accepted_codings("br;q=0, GZip;q=0.5, *") == {"br": 0.0, "gzip": 0.5, "*": 1.0}
+    for accept, encoding in (("br;q=0, gzip", "gzip"), ("br;q=0.2, gzip;q=0.8", "gzip"),
+                             ("gzip;q=0, br;q=0", None), ("*", "br" if compression.brotli is not None else "gzip"),
+                             ("*;q=0, gzip", "gzip")):
+        response = client.get("/jobs", headers={"Accept-Encoding": accept})
+        assert response.headers.get("content-encoding") == encoding, accept
+    print("  ✓ Accept-Encoding q-values are honoured; q=0 refuses a coding")
+
+    for path in ("/small", "/encoded", "/stream"):
+        response = client.get(path, headers={"Accept-Encoding": "br, gzip"})
+        assert response.headers.get("content-encoding") in (None, "identity"), path
+    assert client.get("/small", headers={"Accept-Encoding": "gzip"}).json() == {"ok": True}
+    print("  ✓ Small, already-encoded and streamed bodies pass through")
+
+    assert json.loads(ORJSONResponse(dump_models(jobs)).body) == expected
+    assert dump_models([]) == []
+    assert json.loads(ORJSONResponse({1: "één", "nested": [None, 1.5]}).body) == {"1": "één", "nested": [None, 1.5]}
+    print("  ✓ ORJSONResponse output round-trips through json.loads")
+
+    print("✅ All compression tests passed!\n")
+
+def test_metrics_rendering():
+    """Test Prometheus text output of the metrics registry."""
+    from metrics import Registry, Counter, Histogram
+
+    print("✓ Testing metrics rendering...")
+
+    registry = Registry()
+    calls = registry.register(Counter("demo_calls_total", "Demo calls", ["stage"]))
+    latency = registry.register(Histogram("demo_seconds", "Demo latency", buckets=(0.1, 1)))
+    calls.inc(stage="retry")
+    calls.inc(2, stage="retry")
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render()
+    assert "# TYPE demo_calls_total counter" in text
+    assert 'demo_calls_total{stage="retry"} 3' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 2' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in text
+    assert "demo_seconds_count 3" in text
+    print("  ✓ Counters and cumulative histogram buckets render correctly")
+
+    print("✅ All metrics tests passed!\n")
+
+def test_json_extract():
+    """Test repair of malformed LLM JSON."""
+    from json_extract import extract_json, loads_tolerant
+
+    print("✓ Testing JSON extraction...")
+
+    fenced = 'Here you go:\n```json\n{"ats_score": 70, "strengths": ["Python"]}\n```'
+    assert loads_tolerant(fenced) == {"ats_score": 70, "strengths": ["Python"]}
+    print("  ✓ Fences and leading prose are skipped")
+
+    messy = '{"missing_keywords": ["machine\\_learning", "C\\#",], "note": "line one\nline two",}'
+    assert loads_tolerant(messy) == {"missing_keywords": ["machine_learning", "C#"], "note": "line one\nline two"}
+    print("  ✓ Invalid escapes, raw newlines and trailing commas are repaired")
+
+    truncated = '[{"title": "Data Analyst", "match_score": 80}, {"title": "Data Engin'
+    assert loads_tolerant(truncated, expect_array=True) == [{"title": "Data Analyst", "match_score": 80}]
+    print("  ✓ Truncated output keeps the completed items")
+
+    assert extract_json("no json here") is None
+    try:
+        loads_tolerant("no json here")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    print("  ✓ Text without JSON raises ValueError")
+
+    print("✅ All JSON extraction tests passed!\n")
+
+def test_array_item_stream():
+    """Test incremental parsing of a streamed JSON array."""
+    from json_extract import ArrayItemStream
+
+    print("✓ Testing streamed array parsing...")
+
+    text = 'Sure:\n[{"title": "A", "reasoning": "uses {braces} and \\"quotes\\""}, {"title": "B", "skills": ["C\\#"]}, {"title": "C'
+    parser = ArrayItemStream()
+    seen = []
+    for i in range(0, len(text), 3):
+        for item in parser.feed(text[i:i + 3]):
+            seen.append((item["title"], i))
+    assert [title for title, _ in seen] == ["A", "B"]
+    assert seen[0][1] < seen[1][1], "first item should be emitted before the second arrives"
+    assert not parser.done
+    print("  ✓ Objects are emitted as soon as they close; the unfinished tail is held back")
+
+    assert parser.feed('"}]') == [{"title": "C"}]
+    assert parser.done
+    assert parser.feed('[{"title": "D"}]') == []
+    print("  ✓ Stream ends at the closing bracket")
+
+    print("✅ All streamed array tests passed!\n")
+
+def test_overload_protection():
+    """Test the Ollama circuit breaker and adaptive concurrency limiter."""
+    import asyncio
+    from overload import AdaptiveLimiter, CircuitBreaker, Rejected
+
+    print("✓ Testing overload protection...")
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    try:
+        breaker.before_call()
+        assert False, "expected Rejected"
+    except Rejected as e:
+        assert e.reason == "circuit_open" and e.retry_after >= 1
+    print("  ✓ Breaker opens after consecutive failures")
+
+    import time
+    time.sleep(0.06)
+    breaker.before_call()  # the probe
+    assert breaker.state == "half_open"
+    try:
+        breaker.before_call()
+        assert False, "only one probe at a time"
+    except Rejected:
+        pass
+    breaker.record_success()
+    assert breaker.state == "closed"
+    print("  ✓ Half-open admits a single probe and closes on success")
+
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_limit=1, max_limit=4, max_queue=1, queue_timeout=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+        try:
+            await limiter.acquire()
+            assert False, "queue is full"
+        except Rejected as e:
+            assert e.reason == "queue_full"
+        limiter.release()
+        await waiter
+        assert limiter.inflight == 1 and limiter.queued == 0
+
+        limiter.on_success(1.0, queue_wait=0.0)
+        assert limiter.limit == 2.0
+        limiter.on_success(1.0, queue_wait=5.0)
+        assert limiter.limit == 1.5
+        limiter.release()
+
+    asyncio.run(scenario())
+    print("  ✓ Limiter queues, rejects when full, and adapts the limit (AIMD)")
+
+    async def fairness():
+        limiter = AdaptiveLimiter(initial_limit=1, max_queue=10, max_queue_per_client=3, queue_timeout=1)
+        order = []
+
+        async def call(key):
+            await limiter.acquire(key=key)
+            order.append(key)
+            await asyncio.sleep(0)
+            limiter.release()
+
+        await limiter.acquire(key="heavy")
+        tasks = [asyncio.ensure_future(call("heavy")) for _ in range(3)]
+        await asyncio.sleep(0)
+        try:
+            await limiter.acquire(key="heavy")
+            assert False, "per-client queue is full"
+        except Rejected as e:
+            assert e.reason == "client_queue_full"
+        tasks.append(asyncio.ensure_future(call("light")))
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(fairness()) == ["heavy", "light", "heavy", "heavy"]
+    print("  ✓ Waiting clients are served round-robin, with a per-client queue cap")
+
+    print("✅ All overload protection tests passed!\n")
+
+def test_ollama_pool_routing():
+    """Test host selection in the Ollama pool."""
+    from ollama_pool import OllamaPool
+    from overload import Rejected
+
+    print("✓ Testing Ollama pool routing...")
+
+    pool = OllamaPool(["http://a:11434", "http://b:11434", "http://c:11434"], sticky_slack=1, failure_threshold=1, health_interval=0)
+    prompt = "You are an ATS expert.\nResume:\nData Analyst, 4 years Python"
+    first = pool.acquire(prompt)
+    pool.release(first, True)
+    assert all(pool.acquire(prompt) is first for _ in range(2)), "same prefix should stick to one host"
+    print("  ✓ Prompts with the same prefix stick to one host")
+
+    # `first` now has 2 outstanding; with slack 1 the next call goes elsewhere
+    other = pool.acquire(prompt)
+    assert other is not first and other.outstanding == 1
+    print("  ✓ Falls back to the least-loaded host when the sticky one is busy")
+
+    for backend in pool.backends:
+        while backend.outstanding:
+            pool.release(backend, True)
+    pool.release(pool.acquire(prompt), False)
+    assert pool.acquire(prompt) is not first, "open circuit must be skipped"
+    for backend in pool.backends:
+        if backend.breaker.state != "open":
+            backend.breaker.record_failure()
+    try:
+        pool.acquire("anything")
+        assert False, "all circuits open"
+    except Rejected as e:
+        assert e.reason == "circuit_open"
+    print("  ✓ Hosts with an open circuit are skipped; none left raises Rejected")
+
+    pool = OllamaPool(["http://127.0.0.1:9", "http://127.0.0.1:9/b"], health_interval=60)
+    pool.release(pool.acquire("start the health checks"), True)
+    thread = pool._health_thread
+    assert thread.is_alive()
+    pool.close()
+    assert not thread.is_alive() and pool._health_thread is None
+    print("  ✓ close() stops the health-check thread")
+
+    print("✅ All Ollama pool tests passed!\n")
+
+def test_model_routing():
+    """Test per-task model routes and fallback to the next model."""
+    import asyncio
+    import llm_service
+    import model_routes
+
+    print("✓ Testing task-aware model routing...")
+
+    routes = model_routes.parse_routes("analysis=small|big, matching=small ,bogus=x", default_model="big")
+    assert routes["analysis"] == ["small", "big"]
+    assert routes["matching"] == ["small"]
+    assert routes["cover_letter"] == ["big"] and "bogus" not in routes
+    print("  ✓ Route table parses fallbacks and keeps the default for other tasks")
+
+    good = '{"ats_score": 80, "missing_keywords": ["SQL"], "strengths": ["Python"], "improvements": ["Add metrics"]}'
+    replies = {"small": "Sorry, I cannot help with that.", "big": good}
+    calls = []
+
+    async def fake_call(prompt, max_retries=2, model="big"):
+        calls.append(model)
+        return replies[model]
+
+    original_routes, original_call = dict(model_routes.ROUTES), llm_service._call_ollama_with_retry
+    model_routes.ROUTES.update(routes)
+    llm_service._call_ollama_with_retry = fake_call
+    try:
+        data = asyncio.run(llm_service.call_llm_safe("prompt", task="analysis"))
+        assert calls == ["small", "big"] and data["ats_score"] == 80
+        print("  ✓ Unparseable answer from the small model falls back to the big one")
+
+        calls.clear()
+        replies["small"] = '{"ats_score": 10}'
+        data = asyncio.run(llm_service.call_llm_safe("prompt", task="analysis"))
+        assert calls == ["small", "big"], "low-quality answer should fall back"
+        calls.clear()
+        replies["small"] = good
+        asyncio.run(llm_service.call_llm_safe("prompt", task="analysis"))
+        assert calls == ["small"]
+        print("  ✓ Low-quality answers fall back; good ones stay on the small model")
+    finally:
+        model_routes.ROUTES.clear()
+        model_routes.ROUTES.update(original_routes)
+        llm_service._call_ollama_with_retry = original_call
+
+    print("✅ All model routing tests passed!\n")
+
+def test_chat_prompts():
+    """Test the fixed system prefix of the chat prompts."""
+    from prompts import analysis_messages, match_messages, rewrite_messages
+    from ollama_pool import OllamaPool
+
+    print("✓ Testing chat prompts...")
+
+    jd = "Data Analyst: SQL, Python, Tableau"
+    a = analysis_messages("Resume A: Python developer", jd)
+    b = analysis_messages("Resume B: Java developer", jd)
+    assert [m["role"] for m in a] == ["system", "user"]
+    assert a[0] == b[0], "system prompt must not vary per request"
+    assert "Resume A" in a[1]["content"] and "Resume A" not in a[0]["content"]
+    jobs = [{"title": "Analyst", "company": "Acme", "description": "SQL"}]
+    m = match_messages("Resume A", jobs)
+    assert m[0] == match_messages("Resume B", jobs * 2)[0]
+    assert "Job 1:\nTitle: Analyst\nCompany: Acme" in m[1]["content"] and "all 1 jobs" in m[1]["content"]
+    r = rewrite_messages("Resume A", jd, "Airflow, dbt")
+    assert "Airflow" in r[1]["content"] and "Airflow" not in r[0]["content"]
+    assert all(msgs[1]["content"].startswith("Resume:") for msgs in (a, m, r)), "user message starts with the resume"
+    print("  ✓ System prompts are identical across requests; variable text is in the user message")
+
+    pool = OllamaPool(["http://a:11434", "http://b:11434", "http://c:11434"], health_interval=0)
+    hosts = set()
+    for i in range(12):
+        backend = pool.acquire(analysis_messages(f"Resume {i}", jd))
+        pool.release(backend, True)
+        hosts.add(backend)
+    assert len(hosts) > 1, "a shared system prompt must not pin every call to one host"
+    print("  ✓ Pool affinity still spreads different resumes over hosts")
+
+    print("✅ All chat prompt tests passed!\n")
+
+def test_shared_cache():
+    """Test the SQLite store that shares caches and counters between workers."""
+    import tempfile
+    import time
+    from cache import SQLiteStore, SharedTTLCache
+
+    print("✓ Testing shared cache store...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        worker_a, worker_b = SQLiteStore(path), SQLiteStore(path)
+        assert worker_a.instance_id() == worker_b.instance_id()
+
+        jobs_a = SharedTTLCache(worker_a, "jobs", ttl_seconds=0.2)
+        jobs_b = SharedTTLCache(worker_b, "jobs", ttl_seconds=0.2)
+        jobs_a.set(("data analyst", "pune"), {"jobs": [1, 2]})
+        assert jobs_b.get(("data analyst", "pune")) == {"jobs": [1, 2]}
+        assert jobs_b.get(("data analyst", "")) is None
+        assert (jobs_b.hits, jobs_b.misses) == (1, 1)
+        print("  ✓ An entry written by one worker is read by another")
+
+        time.sleep(0.25)
+        assert jobs_b.get(("data analyst", "pune")) is None
+        print("  ✓ Entries expire after the TTL")
+
+        assert [worker_a.incr("v"), worker_b.incr("v"), worker_a.incr("v")] == [1, 2, 3]
+        assert worker_b.get_int("v") == 3 and worker_b.get_int("other") == 0
+        print("  ✓ Counters are shared and atomic")
+
+        class DownStore:
+            def __getattr__(self, name):
+                def fail(*args):
+                    raise ConnectionError("cache store is down")
+                return fail
+
+        client, tracker_routes, engine, _ = _tracker_client(os.path.join(tmp, "tracker.db"))
+        tracker_routes.STORE = worker_a
+        etag = client.get("/tracked-jobs").headers["etag"]
+        tracker_routes.STORE = DownStore()
+        assert client.post("/track-job", json={"title": "Analyst", "company": "Acme"}).status_code == 200
+        response = client.get("/tracked-jobs", headers={"If-None-Match": etag})
+        assert response.status_code == 200 and "etag" not in response.headers and len(response.json()) == 1
+        tracker_routes.STORE = worker_a
+        response = client.get("/tracked-jobs", headers={"If-None-Match": etag})
+        assert response.status_code == 200 and "etag" not in response.headers, "a missed bump never yields a stale 304"
+        client.post("/track-job", json={"title": "Engineer", "company": "Acme"})
+        assert client.get("/tracked-jobs").headers["etag"] != etag
+        print("  ✓ A cache store outage skips the ETag instead of failing tracker writes")
+
+        class NoIncrStore:
+            """worker_a's view of the shared store while counter updates fail."""
+            def __getattr__(self, name):
+                return getattr(worker_a, name)
+
+            def incr(self, key):
+                raise ConnectionError("cache store timed out")
+
+        # Two workers: separate module state, one database and one shared store
+        client_b, routes_b, engine_b, _ = _tracker_client(os.path.join(tmp, "tracker.db"))
+        routes_b.STORE = worker_b
+        etag = client_b.get("/tracked-jobs").headers["etag"]
+        tracker_routes.STORE = NoIncrStore()
+        assert client.post("/track-job", json={"title": "Designer", "company": "Acme"}).status_code == 200
+        response = client_b.get("/tracked-jobs", headers={"If-None-Match": etag})
+        assert response.status_code == 200 and "etag" not in response.headers and len(response.json()) == 3
+        print("  ✓ A bump that fails on one worker stops the ETag on every worker")
+        assert client_b.post("/track-job", json={"title": "Writer", "company": "Acme"}).status_code == 200
+        assert client_b.get("/tracked-jobs").headers["etag"] not in (None, etag)
+        engine.dispose()
+        engine_b.dispose()
+        print("  ✓ The next successful bump clears the stale flag")
+
+    print("✅ All shared cache tests passed!\n")
+
+def test_deadlines():
+    """Test deadline propagation and cancellation on client disconnect."""
+    import asyncio
+    import time
+    from deadlines import ClientDisconnected, DeadlineExceeded, deadline, time_left, until_disconnected
+
+    print("✓ Testing request deadlines...")
+
+    assert time_left(120) == 120, "no deadline: the call's own limit applies"
+    token = deadline.set(time.monotonic() + 5)
+    try:
+        assert 4 < time_left(120) <= 5
+        deadline.set(time.monotonic() - 1)
+        try:
+            time_left(120)
+            assert False, "expired deadline must raise"
+        except DeadlineExceeded as e:
+            assert e.status_code == 504
+    finally:
+        deadline.reset(token)
+    print("  ✓ Timeouts are capped by the remaining budget; an expired one raises 504")
+
+    class FakeRequest:
+        def __init__(self, disconnect_after):
+            self.disconnect_after = disconnect_after
+
+        async def receive(self):
+            await asyncio.sleep(self.disconnect_after)
+            return {"type": "http.disconnect"}
+
+    cancelled = []
+
+    async def generation():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        assert await until_disconnected(FakeRequest(10), asyncio.sleep(0.01, result="done")) == "done"
+        try:
+            await until_disconnected(FakeRequest(0.01), generation())
+            assert False, "disconnect must end the request"
+        except ClientDisconnected as e:
+            assert e.status_code == 499
+
+    asyncio.run(run())
+    assert cancelled == [True], "work must be cancelled when the client leaves"
+    print("  ✓ Client disconnects cancel the in-flight work")
+
+    print("✅ All deadline tests passed!\n")
+
+def test_section_optimization():
+    """Test section-parallel resume optimization."""
+    import asyncio
+    import llm_service
+    from overload import client_charge
+    from token_bucket import KeyedRateLimiter
+    from resume_sections import assign_keywords, join_sections, split_sections
+
+    print("✓ Testing section-parallel optimization...")
+
+    resume = """JANE DOE
+jane@example.com | Pune
+
+PROFESSIONAL SUMMARY
+Data analyst with 4 years of experience in Python and dashboards.
+
+Skills:
+Python, Excel, Power BI
+
+EXPERIENCE
+Data Analyst, Acme Corp (2021 - Present)
+- Built weekly sales dashboards in Power BI
+- Automated reporting with Python scripts
+
+Junior Analyst, Beta Retail (2019 - 2021)
+- Cleaned customer data in Excel
+- Supported marketing campaign analysis
+
+EDUCATION
+B.Sc. Statistics, Pune University
+"""
+    jd = "Write SQL for sales reporting dashboards. Run A/B testing for marketing campaigns."
+    sections = split_sections(resume)
+    assert join_sections(sections) == resume, "sections must reassemble byte for byte"
+    kinds = [s.kind for s in sections if s.kind != "heading"]
+    assert kinds == ["header", "summary", "skills", "experience", "experience", "education"], kinds
+    print("  ✓ Resume splits into header, summary, skills, one section per role, education")
+
+    assigned = {sections[i].title: keys for i, keys in assign_keywords(sections, ["SQL", "A/B testing"], jd).items()}
+    assert assigned["Experience 1: Data Analyst, Acme Corp (2021 - Present)"] == ["SQL"]
+    assert assigned["Experience 2: Junior Analyst, Beta Retail (2019 - 2021)"] == ["A/B testing"]
+    assert "Education" not in assigned
+    print("  ✓ Keywords go to the roles whose wording matches their context")
+
+    original = llm_service._generate_text
+    prompts = []
+
+    async def fake_generate(messages, task):
+        prompts.append(messages[1]["content"])
+        await asyncio.sleep(0.01)
+        body = messages[1]["content"].rsplit("):\n", 1)[1]
+        return "```\n" + body.replace("Built", "Built SQL-backed") + "\n```"
+
+    charged = []
+
+    async def optimize():
+        client_charge.set(charged.append)
+        return await llm_service._optimize_sections(resume, jd, ["SQL", "A/B testing"])
+
+    llm_service._generate_text = fake_generate
+    try:
+        text, changes = asyncio.run(optimize())
+    finally:
+        llm_service._generate_text = original
+    assert len(prompts) == 4 and all(p.startswith("Job Description:") for p in prompts)
+    assert charged == [4], "each section rewrite is charged to the client"
+    limiter = KeyedRateLimiter(rate_per_minute=60, burst=5)
+    assert limiter.take("user:jane", 2)[0]
+    limiter.charge("user:jane", 4)
+    allowed, wait = limiter.take("user:jane", 1)
+    assert not allowed and 1.5 < wait <= 2, "extra generations leave the bucket in debt"
+    assert "Built SQL-backed weekly sales dashboards" in text
+    assert text.replace("Built SQL-backed", "Built") == resume, "untouched sections must stay verbatim"
+    changed = [c for c in changes if c.changed]
+    assert [c.kind for c in changed] == ["experience"] and "+- Built SQL-backed" in changed[0].diff
+    assert [c.section for c in changes if c.kind == "education"] == ["Education"]
+    print("  ✓ Relevant sections are rewritten concurrently, reassembled in order, with a diff each")
+    print("  ✓ The client is charged one rate-limit token per section rewrite")
+
+    print("✅ All section optimization tests passed!\n")
+
+def test_resume_digest():
+    """Test the cached, persisted resume digest."""
+    import asyncio
+    import resume_digest
+    from database import init_db
+    from prompts import format_digest
+
+    print("✓ Testing resume digest cache...")
+    init_db()
+
+    resume = "Data Analyst, Acme Corp (2021 - Present)\n- Built dashboards\n" * 3 + os.urandom(4).hex()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"headline": "Data analyst", "years_experience": 4, "skills": ["Python", "SQL"],
+                "roles": ["Data Analyst, Acme Corp (2021 - Present)"], "achievements": [], "education": []}
+
+    async def run():
+        return await asyncio.gather(*(resume_digest.get_digest(resume, generate) for _ in range(5)))
+
+    digests = asyncio.run(run())
+    assert len(calls) == 1 and all(d == digests[0] for d in digests), "concurrent requests share one generation"
+    print("  ✓ Concurrent requests for a new resume share one generation")
+
+    import time
+    from deadlines import DeadlineExceeded, deadline
+
+    seen_deadlines = []
+
+    async def generate_slowly():
+        seen_deadlines.append(deadline.get())
+        await asyncio.sleep(0.1)
+        return {"headline": "Analyst", "skills": ["SQL"]}
+
+    async def with_budget(seconds, text):
+        deadline.set(time.monotonic() + seconds)
+        try:
+            return await resume_digest.get_digest(text, generate_slowly)
+        except DeadlineExceeded:
+            return "504"
+
+    async def run_mixed():
+        text = "Analyst resume " + os.urandom(4).hex()
+        return await asyncio.gather(with_budget(0.02, text), with_budget(5, text), with_budget(5, text))
+
+    hurried, *patient = asyncio.run(run_mixed())
+    assert hurried == "504" and patient == [{"headline": "Analyst", "skills": ["SQL"]}] * 2
+    assert seen_deadlines == [None], "the shared generation must not inherit the first caller's deadline"
+    print("  ✓ A waiter that runs out of time does not fail the shared generation for the others")
+
+    resume_digest._cache.clear()
+    again = asyncio.run(resume_digest.get_digest("  " + resume.replace("\n", "\n\n"), generate))
+    assert again == digests[0] and len(calls) == 1, "digest must be loaded from SQLite, keyed by normalized text"
+    print("  ✓ Digests persist in SQLite and survive whitespace-only edits")
+
+    text = format_digest(digests[0])
+    assert text.startswith("Candidate summary: Data analyst") and "Skills: Python, SQL" in text
+    assert "- Data Analyst, Acme Corp (2021 - Present)" in text and "Key achievements" not in text
+    print("  ✓ Digest formats as compact prompt text")
+
+    print("✅ All resume digest tests passed!\n")
+
+def test_multi_country_jobs():
+    """Test concurrent multi-country Adzuna search with merge and dedup."""
+    import asyncio
+    import time
+    import adzuna_service
+    from models import CleanedJob
+
+    print("✓ Testing multi-country job search...")
+
+    assert adzuna_service.parse_countries(" IN, gb,in ") == ["in", "gb"]
+    for bad in ("xx", "in,zz"):
+        try:
+            adzuna_service.parse_countries(bad)
+            assert False, f"{bad!r} should be rejected"
+        except ValueError:
+            pass
+    assert adzuna_service._search_url("gb").endswith("/jobs/gb/search/1")
+    print("  ✓ Country codes are validated and swapped into the search URL")
+
+    def job(title, company, created, country, job_id):
+        return CleanedJob(title=title, company=company, location="Remote", description="Build dashboards.",
+                          apply_link="#", created=created, id=job_id, country=country)
+
+    remote_in = job("Data Analyst", "ZeroNorth", "2026-02-10T08:00:00Z", "in", "1")
+    remote_gb = job("Data  analyst", "zeronorth", "2026-02-10T09:00:00Z", "gb", "7")
+    pages = {
+        "in": [remote_in, job("BI Developer", "Fraoula", "2026-02-11T10:00:00Z", "in", "2"), job("Analyst", "Acme", None, "in", "3")],
+        "gb": [remote_gb, job("Data Engineer", "InterEx", "2026-02-09T12:00:00Z", "gb", "3")],
+    }
+    calls = []
+
+    def fake_fetch(role, location, last_24, experience_level, country, max_days_old=None):
+        calls.append(country)
+        time.sleep(0.2)
+        return pages[country]
+
+    original = adzuna_service._fetch_jobs_sync
+    adzuna_service._fetch_jobs_sync = fake_fetch
+    role = "analyst " + os.urandom(4).hex()
+    try:
+        start = time.perf_counter()
+        jobs = asyncio.run(adzuna_service.fetch_jobs(role, countries=["in", "gb"]))
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.35, f"countries should be searched concurrently, took {elapsed:.2f}s"
+        assert [(j.title, j.country) for j in jobs] == [
+            ("BI Developer", "in"), ("Data  analyst", "gb"), ("Data Engineer", "gb"), ("Analyst", "in"),
+        ], "newest first, undated last, cross-country duplicate dropped"
+        print("  ✓ Countries are fetched concurrently and merged newest first without duplicates")
+
+        digest = adzuna_service.cached_jobs_digest(role, countries="in,gb")
+        assert digest and digest != adzuna_service.cached_jobs_digest(role, countries="in")
+        assert adzuna_service.cached_jobs_digest(role, countries="in,us") is None
+        asyncio.run(adzuna_service.fetch_jobs(role, countries="gb"))
+        assert sorted(calls) == ["gb", "in"], "per-country results are cached"
+        print("  ✓ Per-country results are cached and combine into one ETag digest")
+    finally:
+        adzuna_service._fetch_jobs_sync = original
+
+    print("✅ All multi-country job search tests passed!\n")
+
+def test_saved_search_sync():
+    """Test watermark-based delta sync of saved searches."""
+    import asyncio
+    import uuid
+    from datetime import datetime, timedelta, timezone
+    import saved_searches
+    from database import SessionLocal, SavedSearchDB, SavedSearchJobDB, init_db
+    from overload import client_charge
+    from models import CleanedJob, MatchJobResult
+
+    print("✓ Testing saved search delta sync...")
+    init_db()
+
+    now = datetime.now(timezone.utc)
+
+    def job(job_id, hours_ago):
+        created = (now - timedelta(hours=hours_ago)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        return CleanedJob(title=f"Analyst {job_id}", company="Acme", location="Pune", description="SQL",
+                          apply_link="#", created=created, id=job_id, country="in")
+
+    listing = [job("1", 30), job("2", 5)]
+    fetches, matched = [], []
+    complete = [True]
+
+    async def fake_fetch(role, location, experience_level, countries, since, max_days_old=None):
+        fetches.append(max_days_old)
+        return list(listing), complete[0]
+
+    async def fake_match(resume_text, jobs):
+        matched.append([j["title"] for j in jobs])
+        return [MatchJobResult(title=j["title"], company=j["company"], match_score=70, reasoning="ok") for j in jobs]
+
+    search_id = str(uuid.uuid4())
+    db = SessionLocal()
+    db.add(SavedSearchDB(id=search_id, user_id=0, role="analyst", countries="in", resume_text="Resume",
+                         last_seen_id=0, created_at=now.isoformat()))
+    db.commit()
+    db.close()
+
+    originals = saved_searches.fetch_jobs_since, saved_searches.match_jobs
+    saved_searches.fetch_jobs_since, saved_searches.match_jobs = fake_fetch, fake_match
+    try:
+        assert asyncio.run(saved_searches.sync_search(search_id, min_age_seconds=0)) == 2
+        assert fetches == [None] and matched == [["Analyst 1", "Analyst 2"]]
+        print("  ✓ First sync fetches without an age limit and matches everything")
+
+        assert asyncio.run(saved_searches.sync_search(search_id, min_age_seconds=3600)) is None
+        print("  ✓ A recently synced search is not claimed again")
+
+        listing.append(job("3", 1))
+        assert asyncio.run(saved_searches.sync_search(search_id, min_age_seconds=0)) == 1
+        assert fetches[-1] == 1, "second sync only asks for the days since the watermark"
+        assert matched[-1] == ["Analyst 3"], "only the new posting is matched"
+        print("  ✓ Later syncs fetch and match only postings newer than the watermark")
+
+        db = SessionLocal()
+        search = db.get(SavedSearchDB, search_id)
+        assert search.watermark.startswith((now - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M"))
+        rows = db.query(SavedSearchJobDB).filter(SavedSearchJobDB.search_id == search_id,
+                                                 SavedSearchJobDB.id > search.last_seen_id).all()
+        assert len(rows) == 3 and all(row.match_score == 70 for row in rows)
+        db.close()
+        print("  ✓ New postings are stored once, with scores, after the last-seen id")
+
+        watermark = search.watermark
+        complete[0] = False
+        listing.extend([job("4", 0.5), job("5", 0.2)])
+        assert asyncio.run(saved_searches.sync_search(search_id, min_age_seconds=0)) == 2
+        db = SessionLocal()
+        assert db.get(SavedSearchDB, search_id).watermark == watermark, "a partial read keeps the watermark"
+        db.close()
+        complete[0] = True
+        assert asyncio.run(saved_searches.sync_search(search_id, min_age_seconds=0)) == 0
+        assert matched[-1] == ["Analyst 4", "Analyst 5"], "postings already stored are not matched again"
+        print("  ✓ A sync that could not read back to the watermark does not move it")
+
+        charged = []
+
+        async def match_as_user():
+            client_charge.set(charged.append)
+            return await saved_searches._match_new("Resume", [job(str(n), 1) for n in range(25)])
+
+        assert len(asyncio.run(match_as_user())) == 25 and charged == [2]
+        asyncio.run(saved_searches._match_new("Resume", [job(str(n), 1) for n in range(25)]))
+        assert charged == [2], "background syncs are not billed to anyone"
+        print("  ✓ User-started syncs are charged one rate-limit token per match batch after the first")
+    finally:
+        saved_searches.fetch_jobs_since, saved_searches.match_jobs = originals
+
+    import adzuna_service
+
+    pages = {"in": [[job("9", 1), job("8", 2)], [job("7", 3), job("6", 40)], [job("5", 50)]],
+             "gb": [[job("9", 1), job("8", 2)], [job("7", 3), job("6", 4)], [job("5", 5), job("4", 6)]]}
+    requested = []
+
+    def fake_page(role, location, last_24, experience_level, country, max_days_old, sort_by, page, results_per_page):
+        requested.append((country, page, sort_by))
+        return [j.model_copy(update={"country": country}) for j in pages[country][page - 1]]
+
+    async def read_since(countries):
+        return await adzuna_service.fetch_jobs_since("analyst", "", "", countries, now - timedelta(hours=24), 2)
+
+    saved = (adzuna_service._fetch_jobs_sync, adzuna_service.SINCE_PAGE_SIZE, adzuna_service.SINCE_MAX_PAGES,
+             adzuna_service.ingest_soon)
+    adzuna_service._fetch_jobs_sync, adzuna_service.SINCE_PAGE_SIZE = fake_page, 2
+    adzuna_service.SINCE_MAX_PAGES, adzuna_service.ingest_soon = 2, lambda jobs: None
+    try:
+        jobs, complete_read = asyncio.run(read_since("in"))
+        assert complete_read and [j.id for j in jobs] == ["9", "8", "7", "6"]
+        assert requested == [("in", 1, "date"), ("in", 2, "date")]
+        print("  ✓ Delta syncs read date-sorted pages until one reaches the watermark")
+        requested.clear()
+        jobs, complete_read = asyncio.run(read_since("in,gb"))
+        assert not complete_read and ("gb", 3, "date") not in requested
+        print("  ✓ Running out of pages before the watermark is reported as incomplete")
+    finally:
+        (adzuna_service._fetch_jobs_sync, adzuna_service.SINCE_PAGE_SIZE, adzuna_service.SINCE_MAX_PAGES,
+         adzuna_service.ingest_soon) = saved
+
+    print("✅ All saved search tests passed!\n")
+
+def test_request_tracing():
+    """Test trace IDs, spans and the Server-Timing header."""
+    import asyncio
+    import logging
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from tracing import TraceIdFilter, TracingMiddleware, add_span, span
+
+    print("✓ Testing request tracing...")
+
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, timing_allow_origins=["http://localhost:5173"])
+    seen = {}
+
+    @app.get("/work")
+    async def work():
+        with span("prompt"):
+            pass
+        # Spans from worker threads land in the same trace
+        await asyncio.to_thread(add_span, "generation", 0.25)
+        await asyncio.to_thread(add_span, "generation", 0.25)
+        record = logging.makeLogRecord({"msg": "inside"})
+        TraceIdFilter().filter(record)
+        seen["trace_id"] = record.trace_id
+        return {"ok": True}
+
+    client = TestClient(app)
+    response = client.get("/work")
+    timing = response.headers["server-timing"]
+    assert "prompt;dur=" in timing and 'generation;dur=500.0;desc="2x"' in timing and "total;dur=" in timing
+    assert response.headers["x-trace-id"] == seen["trace_id"] and len(seen["trace_id"]) == 32
+    assert response.headers["timing-allow-origin"] == "http://localhost:5173"
+    print("  ✓ Spans from the loop and worker threads are summed into Server-Timing")
+
+    parent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    assert client.get("/work", headers={"traceparent": parent}).headers["x-trace-id"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert client.get("/work", headers={"X-Request-ID": "req-42"}).headers["x-trace-id"] == "req-42"
+    assert client.get("/work", headers={"X-Request-ID": "bad id\n"}).headers["x-trace-id"] != "bad id"
+    print("  ✓ Incoming traceparent / X-Request-ID become the trace ID")
+
+    with span("outside"):
+        add_span("outside", 1.0)  # no request: a no-op
+    print("  ✓ Spans outside a request are ignored")
+
+    from sqlalchemy import text
+    from database import engine
+    from tracing import Trace, current_trace
+
+    trace = Trace()
+    current_trace.set(trace)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        try:
+            conn.execute(text("SELECT * FROM no_such_table"))
+            assert False, "the statement should fail"
+        except Exception:
+            pass
+        assert not conn.info.get("query_start"), "failed statements leave nothing on the pooled connection"
+    current_trace.set(None)
+    assert trace.spans()["db"][1] == 2
+    print("  ✓ Queries are timed as a db span, failed ones included")
+
+    print("✅ All request tracing tests passed!\n")
+
+def test_request_profiling():
+    """Test the opt-in sampling profiler middleware."""
+    import asyncio
+    import tempfile
+    import time
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import profiling
+
+    print("✓ Testing request profiling...")
+
+    def busy_loop():
+        end = time.perf_counter() + 0.15
+        while time.perf_counter() < end:
+            sum(range(1000))
+
+    app = FastAPI()
+    async def authorize(headers):
+        return headers.get("x-profile") == "admin"
+
+    app.add_middleware(profiling.ProfilingMiddleware, authorize=authorize)
+
+    @app.get("/work")
+    def work():
+        busy_loop()
+        return {"ok": True}
+
+    original_dir = profiling.PROFILE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        profiling.PROFILE_DIR = tmp
+        try:
+            client = TestClient(app)
+            assert "x-profile-id" not in client.get("/work").headers
+            assert "x-profile-id" not in client.get("/work", headers={"X-Profile": "1"}).headers
+            assert profiling.list_profiles() == []
+            print("  ✓ Requests are not profiled without an authorized X-Profile header")
+
+            name = client.get("/work", headers={"X-Profile": "admin"}).headers["x-profile-id"]
+            assert [p["name"] for p in profiling.list_profiles()] == [name]
+            with open(profiling.profile_path(name)) as f:
+                lines = f.read().splitlines()
+            assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+            assert any("busy_loop (test_changes.py:" in line for line in lines), "the hot function shows up"
+            print("  ✓ Profiled requests are stored as folded stacks")
+
+            assert profiling.profile_path("../" + name) is None and profiling.profile_path("missing.folded") is None
+            print("  ✓ Only stored profile names can be downloaded")
+        finally:
+            profiling.PROFILE_DIR = original_dir
+
+    from starlette.datastructures import Headers
+    from database import SessionLocal, User, init_db, set_admin
+
+    init_db()
+    _, auth_routes = _import_with_jwt_secret("auth_routes")
+    email = f"ops-{os.urandom(4).hex()}@example.com"
+    headers = Headers({"authorization": "Bearer " + auth_routes.create_access_token(email)})
+
+    def is_admin(headers):
+        return asyncio.run(auth_routes.is_admin_request(headers))
+
+    assert not is_admin(headers), "an unregistered address is no admin"
+    db = SessionLocal()
+    assert not set_admin(db, email), "only registered accounts can be granted admin"
+    db.add(User(email=email, hashed_password="-"))
+    db.commit()
+    assert not is_admin(headers), "registering does not make an account admin"
+    assert set_admin(db, email)
+    assert is_admin(headers)
+    assert not is_admin(Headers({"authorization": "Bearer forged"}))
+    set_admin(db, email, False)
+    assert not is_admin(headers)
+    db.close()
+    print("  ✓ Only accounts granted admin rights may request profiles")
+
+    print("✅ All request profiling tests passed!\n")
+
+def test_startup_lifespan():
+    """Test lifespan-managed init, background warm-ups and the readiness report."""
+    import asyncio
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import adzuna_service
+    import llm_service
+    import startup
+
+    print("✓ Testing application startup...")
+
+    assert startup.parse_warm_searches(" data analyst@pune; python developer ;;") == [
+        ("data analyst", "pune"), ("python developer", "")]
+
+    def fake_load(url, model, timeout):
+        if "down" in url:
+            raise ConnectionError("refused")
+        return 0.25
+
+    original_load, original_backends = llm_service._load_model, llm_service.OLLAMA_POOL.backends
+    llm_service._load_model = fake_load
+    llm_service.OLLAMA_POOL.backends = [type("B", (), {"base_url": "http://gpu1"}), type("B", (), {"base_url": "http://down"})]
+    try:
+        loaded = asyncio.run(llm_service.warm_up_models())
+    finally:
+        llm_service._load_model, llm_service.OLLAMA_POOL.backends = original_load, original_backends
+    model = llm_service.DEFAULT_MODEL
+    assert loaded == {f"{model}@http://gpu1": 0.25, f"{model}@http://down": None}
+    print("  ✓ Models load on every host in parallel; a failing host is reported, not raised")
+
+    release = asyncio.Event()
+    prefetched = []
+
+    async def slow_fetch(role, location, last_24, experience_level, countries=None, max_days_old=None):
+        prefetched.append((role, location))
+        await release.wait()
+        return []
+
+    app = FastAPI(lifespan=startup.lifespan)
+
+    @app.get("/ready")
+    async def ready():
+        return startup.REPORT.as_dict()
+
+    original_fetch = adzuna_service.fetch_jobs
+    saved = startup.REPORT, startup.STARTUP_WARM_MODELS, startup.STARTUP_WARM_SEARCHES
+    startup.REPORT = startup.StartupReport()
+    startup.STARTUP_WARM_MODELS, startup.STARTUP_WARM_SEARCHES = False, "analyst@pune"
+    adzuna_service.fetch_jobs = slow_fetch
+    try:
+        with TestClient(app) as client:
+            report = client.get("/ready").json()
+            assert not report["ready"], "warm-ups run in the background, after the app starts serving"
+            assert {"app:setup", "init:schema", "init:http_pools", "init:cache"} <= set(report["phases_ms"])
+            print("  ✓ Schema, pools and cache are set up before serving; warm-ups do not block it")
+
+            client.portal.call(release.set)
+            for _ in range(50):
+                report = client.get("/ready").json()
+                if report["ready"]:
+                    break
+                client.portal.call(asyncio.sleep, 0.02)
+            assert report["ready"] and prefetched == [("analyst", "pune")]
+            assert report["warmup"]["jobs:analyst@pune"] is not None and "warmup" in report["phases_ms"]
+            print("  ✓ Ready once the warm-ups finish, with a per-phase time report")
+    finally:
+        adzuna_service.fetch_jobs = original_fetch
+        startup.REPORT, startup.STARTUP_WARM_MODELS, startup.STARTUP_WARM_SEARCHES = saved
+
+    print("✅ All startup tests passed!\n")
+
+def test_ws_channel():
+    """Test the multiplexed WebSocket channel: ids, partials, push order, limits and cancel."""
+    import asyncio
+    from fastapi import FastAPI, HTTPException, WebSocket
+    from fastapi.testclient import TestClient
+    from ws_session import Channel, Operation
+
+    print("✓ Testing WebSocket channel...")
+
+    async def slow(params, emit):
+        await asyncio.sleep(params.get("delay", 0))
+        return {"echo": params.get("value")}
+
+    async def stream(params, emit):
+        for i in range(3):
+            await emit({"n": i})
+        return {"count": 3}
+
+    async def fail(params, emit):
+        raise HTTPException(status_code=503, detail="busy")
+
+    admitted = []
+
+    def admit(cost):
+        admitted.append(cost)
+        return 7.2 if len(admitted) > 1 else None
+
+    ops = {"slow": Operation(slow), "stream": Operation(stream), "fail": Operation(fail),
+           "llm": Operation(slow, budget=150, cost=1)}
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def channel(websocket: WebSocket):
+        await websocket.accept()
+        await Channel(websocket, ops, admit=admit, max_in_flight=2).run()
+
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_json({"id": "a", "op": "slow", "params": {"delay": 0.2, "value": 1}})
+        ws.send_json({"id": "b", "op": "stream"})
+        frames = [ws.receive_json() for _ in range(5)]
+        assert [(f["id"], f["type"]) for f in frames] == [("b", "partial")] * 3 + [("b", "result"), ("a", "result")]
+        assert [f["data"]["n"] for f in frames[:3]] == [0, 1, 2] and frames[4]["data"] == {"echo": 1}
+        print("  ✓ Operations run concurrently; partials and results are pushed as they complete, by id")
+
+        ws.send_json({"id": 1, "op": "slow", "params": {"delay": 5}})
+        ws.send_json({"id": 2, "op": "slow", "params": {"delay": 5}})
+        ws.send_json({"id": 3, "op": "slow"})
+        assert ws.receive_json() == {"id": 3, "type": "error", "status": 429,
+                                     "detail": "At most 2 operations in flight per connection"}
+        ws.send_json({"id": 1, "op": "cancel"})
+        ws.send_json({"id": 2, "op": "cancel"})
+        assert [ws.receive_json()["status"] for _ in range(2)] == [499, 499]
+        print("  ✓ In-flight operations are capped per connection and can be cancelled")
+
+        ws.send_json({"id": "c", "op": "fail"})
+        assert ws.receive_json() == {"id": "c", "type": "error", "status": 503, "detail": "busy"}
+        ws.send_json({"id": "d", "op": "nope"})
+        assert ws.receive_json()["status"] == 400
+        ws.send_text("not json")
+        assert ws.receive_json() == {"id": None, "type": "error", "status": 400, "detail": "Expected a JSON object with an id"}
+        ws.send_json({"id": "e", "op": "llm", "params": {"value": 2}})
+        assert ws.receive_json()["data"] == {"echo": 2}
+        ws.send_json({"id": "f", "op": "llm"})
+        assert ws.receive_json() == {"id": "f", "type": "error", "status": 429,
+                                     "detail": "Too many AI requests. Please slow down.", "retry_after": 7}
+        assert admitted == [1, 1], "only LLM operations are charged"
+        print("  ✓ Errors, unknown ops and rate limits answer the request they belong to")
+
+    async def backpressure():
+        channel = Channel(websocket=None, operations={}, send_queue=2)
+        await channel.send({"n": 1})
+        await channel.send({"n": 2})
+        try:
+            await asyncio.wait_for(channel.send({"n": 3}), 0.05)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    assert asyncio.run(backpressure()), "a full send queue makes producers wait"
+    print("  ✓ A client that reads slowly pauses producers instead of growing a buffer")
+
+    class DeadSocket:
+        """Requests arrive, but every send fails as after a disconnect."""
+
+        def __init__(self, requests):
+            self.requests = asyncio.Queue()
+            for request in requests:
+                self.requests.put_nowait(request)
+            self.closed = None
+
+        async def receive_text(self):
+            return await self.requests.get()
+
+        async def send_text(self, text):
+            raise RuntimeError("Cannot call send once a close message has been sent")
+
+        async def close(self, code=1000, reason=None):
+            self.closed = code
+
+    held = []
+
+    async def hold(params, emit):
+        held.append("running")
+        try:
+            await emit({"n": 0})
+            await asyncio.sleep(60)
+        finally:
+            held.append("released")
+
+    async def dead_writer():
+        channel = Channel(DeadSocket(['{"id": 1, "op": "hold"}']), {"hold": Operation(hold)})
+        await asyncio.wait_for(channel.run(), 1)
+        return channel.in_flight
+
+    assert asyncio.run(dead_writer()) == 0 and held == ["running", "released"]
+    print("  ✓ A failed send ends the channel and cancels its operations")
+
+    async def not_reading():
+        websocket = DeadSocket(['{"id": %d, "op": "nope"}' % i for i in range(5)])
+        channel = Channel(websocket, {}, send_queue=2)
+        channel._write = lambda: asyncio.sleep(60)  # the client never reads
+        await asyncio.wait_for(channel.run(), 1)
+        return websocket.closed
+
+    assert asyncio.run(not_reading()) == 1008, "error replies never wait on a full queue"
+    print("  ✓ A client that sends requests without reading replies is disconnected")
+
+    print("✅ All WebSocket channel tests passed!\n")
+
+def test_semantic_search():
+    """Test the memory-mapped embedding matrix and semantic job search."""
+    import asyncio
+    import tempfile
+    import time
+    import embedding_store
+    import semantic_search
+    from database import init_db
+    from models import CleanedJob
+    from deadlines import deadline
+    from overload import client_key
+
+    if embedding_store.np is None:
+        print("⚠️  Skipping semantic search test (numpy not installed)\n")
+        return
+    np = embedding_store.np
+
+    print("✓ Testing semantic search...")
+    init_db()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(1000, 16)).astype(np.float32)
+        matrix = embedding_store.EmbeddingMatrix(os.path.join(tmp, "m.f32"), 16)
+        with matrix.locked():
+            assert matrix.append(vectors[:600]) == 0
+            assert matrix.append(vectors[600:]) == 600
+        query = rng.normal(size=16)
+        expected = np.argsort(-(embedding_store.normalize(vectors) @ embedding_store.normalize(query)[0]))[:5]
+
+        original_block = embedding_store.SEARCH_BLOCK
+        embedding_store.SEARCH_BLOCK = 128
+        try:
+            hits = matrix.search(query, 5)
+        finally:
+            embedding_store.SEARCH_BLOCK = original_block
+        assert [row for row, _ in hits] == list(expected) and hits[0][1] >= hits[-1][1]
+        print("  ✓ Blockwise top-K over the memory-mapped file matches a full sort")
+
+        with open(matrix.path, "ab") as f:
+            f.write(b"\0" * 10)  # a crashed append
+        assert matrix.rows() == 1000
+        with matrix.locked():
+            assert matrix.append(vectors[:1]) == 1000 and matrix.rows() == 1001
+        print("  ✓ Appends are row-aligned; a partial row is dropped")
+
+        # Bag-of-words embedding: jobs sharing words with the resume score higher
+        vocab = ["python", "sql", "dashboards", "nurse", "patients", "ward", "react", "css"]
+
+        contexts = []
+
+        async def fake_embed(texts):
+            contexts.append((client_key.get(), deadline.get()))
+            return embedding_store.normalize([[t.lower().count(w) + 0.01 for w in vocab] for t in texts])
+
+        def job(job_id, title, description):
+            return CleanedJob(title=title, company="Acme", location="Pune", description=description,
+                              apply_link="#", id=job_id, country="in")
+
+        jobs = [job("1", "Staff Nurse", "Care for patients on the ward"),
+                job("2", "Data Analyst", "Python and SQL dashboards"),
+                job("3", "Frontend Developer", "React and CSS")]
+        saved = semantic_search.EMBEDDING_DIR, semantic_search._embed, semantic_search.EMBED_MODEL, dict(semantic_search._matrices)
+        saved_pending = dict(semantic_search._pending)
+        semantic_search.EMBEDDING_DIR, semantic_search._embed = tmp, fake_embed
+        semantic_search.EMBED_MODEL = "test-embed-" + os.urandom(4).hex()
+        semantic_search._matrices.clear()
+        semantic_search._pending.clear()  # left over by earlier tests whose loop has closed
+        try:
+            async def ingest():
+                # Started from a request: its deadline and client must not carry over
+                client_key.set("user:1")
+                deadline.set(time.monotonic() + 5)
+                semantic_search.ingest_soon(jobs)
+                semantic_search.ingest_soon(jobs[1:])  # repeats are queued once
+                await semantic_search._ingest_task
+
+            asyncio.run(ingest())
+            assert semantic_search._matrix(len(vocab)).rows() == 3
+            asyncio.run(ingest())
+            assert semantic_search._matrix(len(vocab)).rows() == 3, "stored jobs are not embedded again"
+            assert contexts == [(semantic_search.INGEST_CLIENT, None)]
+            print("  ✓ Fetched jobs are embedded once, in the background, as their own client")
+
+            resume_id = asyncio.run(semantic_search.embed_resume("Analyst: Python, SQL, dashboards"))
+            hits = asyncio.run(semantic_search.search(resume_id, 2))
+            assert [j.title for j, _ in hits] == ["Data Analyst", "Frontend Developer"] and hits[0][1] > 0.9
+            assert asyncio.run(semantic_search.search("unknown", 2)) is None
+            print("  ✓ Stored jobs are ranked by cosine similarity to a stored resume")
+        finally:
+            semantic_search._matrices.clear()
+            semantic_search._matrices.update(saved[3])
+            semantic_search._pending.clear()
+            semantic_search._pending.update(saved_pending)
+            semantic_search.EMBEDDING_DIR, semantic_search._embed, semantic_search.EMBED_MODEL = saved[:3]
+
+    print("✅ All semantic search tests passed!\n")
+
 def test_api_structure():
     """Test that the API structure is correct."""
     from main import app
@@ -168,6 +1688,29 @@ def main():
         test_models()
         test_confidence_calculation()
         test_timestamp_filtering()
+        test_compact_tracked_jobs()
+        test_bulk_tracker_endpoints()
+        test_bulk_track_conflicts()
+        test_conditional_get_helpers()
+        test_response_compression()
+        test_metrics_rendering()
+        test_json_extract()
+        test_array_item_stream()
+        test_overload_protection()
+        test_ollama_pool_routing()
+        test_model_routing()
+        test_chat_prompts()
+        test_shared_cache()
+        test_deadlines()
+        test_section_optimization()
+        test_resume_digest()
+        test_multi_country_jobs()
+        test_saved_search_sync()
+        test_request_tracing()
+        test_request_profiling()
+        test_startup_lifespan()
+        test_ws_channel()
+        test_semantic_search()
         # Skip API test if JWT_SECRET not set (expected in dev)
         try:
             test_api_structure()